@@ -0,0 +1,113 @@
+"""Measures the cost of logging every artifact of a purge.
+
+Runs a dry run purge of generated artifacts, which sends no requests, once with
+a console line per artifact formatted by coloredlogs like ``lavatory`` does,
+and once for each kind of ``--artifact-log``. The console output goes to
+``/dev/null`` so only formatting and writing are measured.
+
+Usage: python benchmarks/logging_overhead.py [--artifacts 200000] [--json results.json]
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import coloredlogs
+
+from lavatory.utils.artifact_log import close_artifact_log, open_artifact_log
+from lavatory.utils.artifactory import Artifactory
+from lavatory.utils.log_context import RepoContextFilter
+
+REPO = 'bench-local'
+CREDENTIALS = {'artifactory_url': 'http://127.0.0.1:1/artifactory', 'artifactory_username': 'bench',
+               'artifactory_password': 'bench'}
+MODES = ('console', 'jsonl', 'jsonl.gz')
+
+
+def generate_artifacts(count):
+    """Artifacts spread over projects of 10 versions, as found by the default policy."""
+    return [{'path': 'group/project-{}'.format(number // 10), 'name': '1.{}'.format(number % 10)}
+            for number in range(count)]
+
+
+@contextlib.contextmanager
+def console_logging(stream):
+    """Installs the console handler of ``lavatory`` writing to ``stream``."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    coloredlogs.install(level=0, fmt='[%(levelname)s] %(name)s%(repo)s %(message)s', isatty=True, stream=stream)
+    for handler in root.handlers:
+        handler.addFilter(RepoContextFilter())
+    root.setLevel(logging.INFO)
+    try:
+        yield
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+
+def run_mode(mode, artifacts, directory):
+    """Purges ``artifacts`` in a dry run with one logging mode.
+
+    Returns:
+        dict: Seconds and CPU seconds taken, and bytes written.
+    """
+    client = Artifactory(repo_name=REPO, credentials=CREDENTIALS)
+    path = os.path.join(directory, 'artifacts.{}'.format(mode))
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, console_logging(devnull):
+        start, cpu_start = time.perf_counter(), time.process_time()
+        if mode != 'console':
+            open_artifact_log(path, progress_interval=0)
+        try:
+            client.purge(True, artifacts)
+        finally:
+            close_artifact_log()
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    return {
+        'mode': mode,
+        'artifacts': len(artifacts),
+        'seconds': round(elapsed, 4),
+        'cpu_seconds': round(cpu, 4),
+        'artifacts_per_second': round(len(artifacts) / elapsed, 1) if elapsed else None,
+        'bytes': os.path.getsize(path) if os.path.exists(path) else None,
+    }
+
+
+def run(artifacts=200000, modes=MODES):
+    """Runs every logging mode on the same artifacts.
+
+    Args:
+        artifacts (int): Number of artifacts purged.
+        modes (tuple): Modes to run, ``console`` and :class:`ArtifactLog` files.
+
+    Returns:
+        list: One result dict per mode.
+    """
+    generated = generate_artifacts(artifacts)
+    with tempfile.TemporaryDirectory() as directory:
+        return [run_mode(mode, generated, directory) for mode in modes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--artifacts', type=int, default=200000, help='Artifacts purged in each mode.')
+    parser.add_argument('--json', help='Also write the results to this file.')
+    args = parser.parse_args()
+
+    results = run(artifacts=args.artifacts)
+    print('{:<10} {:>9} {:>9} {:>9} {:>12} {:>12}'.format('mode', 'artifacts', 'seconds', 'cpu', 'artifacts/s',
+                                                         'bytes'))
+    for result in results:
+        print('{mode:<10} {artifacts:>9} {seconds:>9.3f} {cpu_seconds:>9.3f} {artifacts_per_second:>12} '
+              '{bytes!s:>12}'.format(**result))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'options': vars(args), 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
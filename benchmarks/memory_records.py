@@ -0,0 +1,51 @@
+"""Compares the memory held by a purge list of AQL dicts and of compact records.
+
+Usage: python benchmarks/memory_records.py [count]
+"""
+import gc
+import sys
+import tracemalloc
+
+from lavatory.utils.records import compact
+
+
+def aql_results(count):
+    """AQL results shaped like a large Docker or RPM repository."""
+    return [{
+        'repo': 'yum-local',
+        'path': 'group/project-{}/{}'.format(number % 500, number // 5000),
+        'name': 'project-{}.rpm'.format(number),
+        'type': 'file',
+        'size': 1024 * number,
+        'created': '2017-05-0{}T10:00:00.000Z'.format(number % 9 + 1),
+        'modified': '2017-05-0{}T10:00:00.000Z'.format(number % 9 + 1),
+        'updated': '2017-05-0{}T10:00:00.000Z'.format(number % 9 + 1),
+        'created_by': 'deployer',
+        'modified_by': 'deployer',
+    } for number in range(count)]
+
+
+def measure(build):
+    """Bytes still allocated after ``build`` returns, with its result alive."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    results, dict_bytes = measure(lambda: aql_results(count))
+    del results
+    records, record_bytes = measure(lambda: compact(aql_results(count)))
+    del records
+    print('{} artifacts'.format(count))
+    print('AQL dicts:       {:8.1f} MiB ({:.0f} bytes each)'.format(dict_bytes / 2**20, dict_bytes / count))
+    print('ArtifactRecord:  {:8.1f} MiB ({:.0f} bytes each)'.format(record_bytes / 2**20, record_bytes / count))
+    print('Reduction:       {:8.1f}%'.format(100 * (dict_bytes - record_bytes) / dict_bytes))
+
+
+if __name__ == '__main__':
+    main()
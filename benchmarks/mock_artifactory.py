@@ -0,0 +1,296 @@
+"""Local mock Artifactory for benchmarks.
+
+Serves the parts of the REST API lavatory uses from generated repositories:
+``storageinfo``, AQL searches, item properties, deletes and moves. AQL criteria
+are evaluated by :class:`lavatory.utils.offline.ArtifactIndex`, so the subset
+supported is the one policies can be tested offline with.
+
+Usage: python benchmarks/mock_artifactory.py [--port 8081] [--artifacts 10000] [--latency 0.005]
+"""
+import argparse
+import datetime
+import http.server
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import urllib.parse
+
+from lavatory.utils.offline import ArtifactIndex
+
+try:
+    from http.server import ThreadingHTTPServer
+except ImportError:  # Python < 3.7
+
+    class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+        """Handles each request in a thread."""
+
+        daemon_threads = True
+
+AQL_FIND = 'items.find('
+AQL_SORT = re.compile(r'\.sort\((\{.*?\})\)')
+AQL_OFFSET = re.compile(r'\.offset\((\d+)\)')
+AQL_LIMIT = re.compile(r'\.limit\((\d+)\)')
+EPOCH = datetime.datetime(2017, 1, 1)
+
+
+def generate_repository(repo, projects=100, versions=10, files=2):
+    """Records of a repository laid out as ``group/<project>/<version>/<file>``.
+
+    Projects sit at depth 2 and versions at depth 3, the layout the default
+    policy and ``count_based_retention`` expect. Versions are a day apart.
+
+    Args:
+        repo (str): Name of the repository.
+        projects (int): Number of projects.
+        versions (int): Versions per project.
+        files (int): Files per version.
+
+    Returns:
+        list: AQL records of every folder and file.
+    """
+    records = [_record(repo, '.', 'group', 'folder', EPOCH)]
+    for project in range(projects):
+        project_path = 'group/project-{}'.format(project)
+        records.append(_record(repo, 'group', 'project-{}'.format(project), 'folder', EPOCH))
+        for version in range(versions):
+            created = EPOCH + datetime.timedelta(days=version, minutes=project)
+            records.append(_record(repo, project_path, '1.{}'.format(version), 'folder', created))
+            for number in range(files):
+                record = _record(repo, '{}/1.{}'.format(project_path, version), 'file-{}.rpm'.format(number), 'file',
+                                 created)
+                record['size'] = 1024 * (number + 1)
+                record['properties'] = [{'key': 'deployed', 'value': 'prod' if version % 3 else 'dev'}]
+                records.append(record)
+    return records
+
+
+def _record(repo, path, name, item_type, created):
+    stamp = created.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    return {'repo': repo, 'path': path, 'name': name, 'type': item_type, 'size': 0, 'created': stamp,
+            'modified': stamp, 'updated': stamp}
+
+
+def parse_aql(query):
+    """Splits an AQL query as sent by lavatory into its parts.
+
+    Args:
+        query (str): ``items.find({...}).include(...).sort({...}).offset(n).limit(n)``.
+
+    Returns:
+        tuple: Criteria, sort, offset and limit, 0 when there is no limit.
+    """
+    start = query.index(AQL_FIND) + len(AQL_FIND)
+    criteria, _ = json.JSONDecoder().raw_decode(query, start)
+    sort = AQL_SORT.search(query)
+    offset = AQL_OFFSET.search(query)
+    limit = AQL_LIMIT.search(query)
+    return (criteria, json.loads(sort.group(1)) if sort else None, int(offset.group(1)) if offset else 0,
+            int(limit.group(1)) if limit else 0)
+
+
+class MockArtifactory(ThreadingHTTPServer):
+    """HTTP server answering like Artifactory from in-memory records.
+
+    Deleted and moved items, and everything below them, disappear from later
+    searches. Moved items are not added to the destination repository.
+
+    Args:
+        records (list): AQL records of every repository.
+        latency (float): Seconds every request waits before it is answered.
+        error_rate (float): Share of requests answered with 503 and ``Retry-After: 0``.
+        seed (int): Seed of the errors, so runs fail the same requests.
+        address (tuple): Host and port to listen on, port 0 picks a free one.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, records, latency=0.0, error_rate=0.0, seed=0, address=('127.0.0.1', 0)):
+        super().__init__(address, MockArtifactoryHandler)
+        self.index = ArtifactIndex(records)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = {}
+        self.removed = set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        """Artifactory URL of the server, as in ``ARTIFACTORY_URL``."""
+        host, port = self.server_address[:2]
+        return 'http://{}:{}/artifactory'.format(host, port)
+
+    def credentials(self):
+        """Credentials for :class:`lavatory.utils.artifactory.Artifactory`."""
+        return {'artifactory_url': self.url, 'artifactory_username': 'bench', 'artifactory_password': 'bench'}
+
+    def start(self):
+        """Serves requests in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving and closes the socket."""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count_request(self, method):
+        """Counts a request and decides whether it fails.
+
+        Returns:
+            bool: True if the request should be answered with an error.
+        """
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def remove(self, repo, key):
+        """Removes an item and everything below it.
+
+        Returns:
+            bool: False if the item does not exist.
+        """
+        if self.is_removed(repo, key) or self.index.find(repo, key) is None:
+            return False
+        with self._lock:
+            self.removed.add((repo, key))
+        return True
+
+    def is_removed(self, repo, key):
+        """Whether an item, or a folder holding it, was deleted or moved."""
+        parts = key.split('/')
+        return any((repo, '/'.join(parts[:depth])) in self.removed for depth in range(1, len(parts) + 1))
+
+    def search(self, query):
+        """Results of an AQL query that are still present."""
+        criteria, sort, offset, limit = parse_aql(query)
+        results = []
+        for record_id in self.index.search(criteria, sort=sort):
+            record = self.index.records[record_id]
+            key = record['name'] if record['path'] == '.' else '{}/{}'.format(record['path'], record['name'])
+            if not self.is_removed(record['repo'], key):
+                results.append(record)
+        return results[offset:offset + limit] if limit else results[offset:]
+
+    def storage_info(self):
+        """``storageinfo`` response summarizing every repository."""
+        summaries = []
+        for repo in self.index.repos():
+            records = self.search('items.find({"repo": {"$eq": "%s"}})' % repo)
+            files = sum(1 for record in records if record['type'] == 'file')
+            summaries.append({
+                'repoKey': repo,
+                'repoType': 'LOCAL',
+                'packageType': 'Generic',
+                'filesCount': files,
+                'foldersCount': len(records) - files,
+                'itemsCount': len(records),
+                'usedSpace': '{:,.2f} KB'.format(sum(record.get('size', 0) for record in records) / 1000),
+                'percentage': 'N/A',
+            })
+        return {'repositoriesSummaryList': summaries}
+
+
+class MockArtifactoryHandler(http.server.BaseHTTPRequestHandler):
+    """Routes requests to :class:`MockArtifactory`."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self._fail('GET'):
+            return
+        url = urllib.parse.urlsplit(self.path)
+        route = _route(url.path)
+        if route == ['api', 'storageinfo']:
+            self._reply(200, self.server.storage_info())
+        elif route[:2] == ['api', 'storage'] and url.query == 'properties':
+            record_id = self.server.index.find(route[2], '/'.join(route[3:]))
+            if record_id is None or self.server.is_removed(route[2], '/'.join(route[3:])):
+                self._reply(404, {'errors': [{'status': 404, 'message': 'Not found'}]})
+            else:
+                self._reply(200, {'properties': self.server.index.properties(record_id)})
+        else:
+            self._reply(404, {'errors': [{'status': 404, 'message': 'Unsupported'}]})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        if self._fail('POST'):
+            return
+        url = urllib.parse.urlsplit(self.path)
+        route = _route(url.path)
+        if route == ['api', 'search', 'aql']:
+            results = self.server.search(body)
+            self._reply(200, {'results': results, 'range': {'total': len(results)}})
+        elif route[:2] == ['api', 'move']:
+            moved = self.server.remove(route[2], '/'.join(route[3:]))
+            self._reply(200 if moved else 404, {'messages': []})
+        else:
+            self._reply(404, {'errors': [{'status': 404, 'message': 'Unsupported'}]})
+
+    def do_DELETE(self):
+        if self._fail('DELETE'):
+            return
+        route = _route(urllib.parse.urlsplit(self.path).path)
+        deleted = self.server.remove(route[0], '/'.join(route[1:]))
+        self._reply(204 if deleted else 404)
+
+    def _fail(self, method):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not self.server.count_request(method):
+            return False
+        self.send_response(503)
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return True
+
+    def _reply(self, status, data=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+def _route(path):
+    """Path segments after ``/artifactory``."""
+    segments = [urllib.parse.unquote(segment) for segment in path.strip('/').split('/')]
+    return segments[1:] if segments[0] == 'artifactory' else segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--repos', type=int, default=1)
+    parser.add_argument('--artifacts', type=int, default=10000, help='Files per repository.')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    records = []
+    for number in range(args.repos):
+        records.extend(generate_repository('bench-{}-local'.format(number), projects=max(args.artifacts // 20, 1)))
+    server = MockArtifactory(
+        records, latency=args.latency, error_rate=args.error_rate, address=('127.0.0.1', args.port))
+    print('Serving {} items at {}'.format(len(records), server.url))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
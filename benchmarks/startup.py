@@ -0,0 +1,65 @@
+"""Measures how long the ``lavatory`` entry point takes to import.
+
+Each run starts a fresh interpreter importing ``lavatory.__main__``, and the
+time of an interpreter doing nothing is subtracted. The median of the runs is
+reported and, with ``--budget``, the script fails when it is over budget.
+
+Usage: python benchmarks/startup.py [--runs 20] [--budget 0.25] [--json results.json]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def time_command(code, runs):
+    """Median seconds a fresh interpreter takes to run ``code``."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run(runs=20):
+    """Times the import of the entry point.
+
+    Args:
+        runs (int): Interpreters started for each measurement.
+
+    Returns:
+        dict: Median seconds of the interpreter alone and of the import.
+    """
+    interpreter = time_command('pass', runs)
+    entry_point = time_command('import lavatory.__main__', runs)
+    return {
+        'runs': runs,
+        'interpreter_seconds': round(interpreter, 4),
+        'import_seconds': round(max(entry_point - interpreter, 0.0), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20, help='Interpreters started for each measurement.')
+    parser.add_argument('--budget', type=float, help='Fails when the import takes longer, in seconds.')
+    parser.add_argument('--json', help='Also write the results to this file.')
+    args = parser.parse_args()
+
+    result = run(runs=args.runs)
+    print('interpreter {interpreter_seconds:.3f}s, import of lavatory.__main__ {import_seconds:.3f}s'.format(
+        **result))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'options': vars(args), 'results': result}, output, indent=2)
+    if args.budget is not None and result['import_seconds'] > args.budget:
+        print('Over the budget of {:.3f}s'.format(args.budget))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
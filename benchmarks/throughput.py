@@ -0,0 +1,174 @@
+"""Measures lavatory's throughput and memory against a local mock Artifactory.
+
+Every scenario runs against a fresh mock server in its own process, so deletes
+and moves of one scenario do not change the next and the server's memory is
+not counted. Each scenario is timed, then run again under tracemalloc for the
+peak memory of the client.
+
+Usage: python benchmarks/throughput.py [--artifacts 20000] [--latency 0.002] [--error-rate 0.01]
+                                       [--workers 1 8] [--json results.json]
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import sys
+import time
+import tracemalloc
+
+from mock_artifactory import MockArtifactory, generate_repository
+
+from lavatory.utils.artifactory import Artifactory
+from lavatory.utils.transport import configure_throttle
+
+REPO = 'bench-local'
+ARCHIVE = 'bench-archive'
+FILES_PER_VERSION = 2
+VERSIONS_PER_PROJECT = 10
+RETENTION_COUNT = 5
+
+
+def _serve(connection, records_options, server_options):
+    records = generate_repository(REPO, **records_options) + generate_repository(ARCHIVE, projects=1, versions=1)
+    server = MockArtifactory(records, **server_options)
+    connection.send(server.credentials())
+    server.serve_forever()
+
+
+class MockServerProcess:
+    """Mock Artifactory running in a child process.
+
+    Args:
+        projects (int): Number of projects of the benchmarked repository.
+        latency (float): Seconds every request waits before it is answered.
+        error_rate (float): Share of requests answered with 503.
+    """
+
+    def __init__(self, projects, latency=0.0, error_rate=0.0):
+        records_options = {'projects': projects, 'versions': VERSIONS_PER_PROJECT, 'files': FILES_PER_VERSION}
+        server_options = {'latency': latency, 'error_rate': error_rate}
+        parent, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child, records_options, server_options),
+                                               daemon=True)
+        self.process.start()
+        self.credentials = parent.recv()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.join()
+
+
+def filter_files(client, _workers):
+    """Every file of the repository in one search."""
+    return lambda: len(client.filter(item_type='file', depth=None))
+
+
+def count_based_retention(client, _workers):
+    """Default policy search, one query per project."""
+    return lambda: len(client.count_based_retention(retention_count=RETENTION_COUNT))
+
+
+def count_based_retention_single_query(client, _workers):
+    """Default policy search in one query."""
+    return lambda: len(client.count_based_retention(retention_count=RETENTION_COUNT, single_query=True))
+
+
+def purge(client, workers):
+    """Deletes the versions the default policy selects."""
+    artifacts = client.count_based_retention(retention_count=RETENTION_COUNT, single_query=True)
+    return lambda: client.purge(False, artifacts, workers=workers)
+
+
+def move_artifacts(client, workers):
+    """Moves the versions the default policy selects to another repository."""
+    artifacts = client.count_based_retention(retention_count=RETENTION_COUNT, single_query=True)
+    return lambda: len(client.move_artifacts(artifacts, ARCHIVE, workers=workers)['moved'])
+
+
+SCENARIOS = [filter_files, count_based_retention, count_based_retention_single_query, purge, move_artifacts]
+CONCURRENT_SCENARIOS = (purge, move_artifacts)
+
+
+def run_scenario(scenario, projects, workers=1, latency=0.0, error_rate=0.0, trace=False):
+    """Runs one scenario against a fresh mock server.
+
+    Returns:
+        tuple: Items processed, seconds taken and peak bytes allocated, None
+        unless ``trace``.
+    """
+    with MockServerProcess(projects, latency=latency, error_rate=error_rate) as server:
+        client = Artifactory(repo_name=REPO, credentials=server.credentials)
+        operation = scenario(client, workers)
+        gc.collect()
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        items = operation()
+        elapsed = time.perf_counter() - start
+        peak = None
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return items, elapsed, peak
+
+
+def run(artifacts=20000, workers=(1, 8), latency=0.0, error_rate=0.0, memory=True, scenarios=None):
+    """Runs the benchmark scenarios.
+
+    Args:
+        artifacts (int): Number of files in the benchmarked repository.
+        workers (tuple): Worker counts purges and moves are measured with.
+        latency (float): Seconds every request waits before it is answered.
+        error_rate (float): Share of requests answered with 503.
+        memory (bool): Also measure peak memory.
+        scenarios (list): Scenario functions, all of them by default.
+
+    Returns:
+        list: One result dict per scenario and worker count.
+    """
+    projects = max(artifacts // (VERSIONS_PER_PROJECT * FILES_PER_VERSION), 1)
+    configure_throttle(retries=5)
+    results = []
+    for scenario in scenarios or SCENARIOS:
+        for worker_count in workers if scenario in CONCURRENT_SCENARIOS else (1, ):
+            options = {'workers': worker_count, 'latency': latency, 'error_rate': error_rate}
+            items, elapsed, _ = run_scenario(scenario, projects, **options)
+            peak = run_scenario(scenario, projects, trace=True, **options)[2] if memory else None
+            results.append({
+                'scenario': scenario.__name__,
+                'workers': worker_count,
+                'items': items,
+                'seconds': round(elapsed, 4),
+                'items_per_second': round(items / elapsed, 1) if elapsed else None,
+                'peak_mib': round(peak / 2**20, 2) if peak is not None else None,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--artifacts', type=int, default=20000, help='Files in the benchmarked repository.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8], help='Worker counts of purges and moves.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503.')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='Skip the tracemalloc runs.')
+    parser.add_argument('--json', help='Also write the results to this file.')
+    args = parser.parse_args()
+
+    results = run(artifacts=args.artifacts, workers=args.workers, latency=args.latency, error_rate=args.error_rate,
+                  memory=args.memory)
+    print('{:<36} {:>7} {:>8} {:>9} {:>11} {:>9}'.format('scenario', 'workers', 'items', 'seconds', 'items/s',
+                                                        'peak MiB'))
+    for result in results:
+        print('{scenario:<36} {workers:>7} {items:>8} {seconds:>9.3f} {items_per_second:>11} {peak_mib!s:>9}'.format(
+            **result))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'options': vars(args), 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -32,6 +32,12 @@ setup(
     setup_requires=['setuptools_scm'],
     use_scm_version={'local_scheme': 'dirty-tag'},
     install_requires=REQUIREMENTS,
+    python_requires='>=3.5',
+    extras_require={
+        'async': ['aiohttp; python_version >= "3.7"'],
+        'columnar': ['numpy'],
+        'parquet': ['pyarrow'],
+    },
     include_package_data=True,
     keywords="gogo infrastructure python artifactory jfrog",
     url='https://github.com/gogoair/lavatory',
@@ -41,6 +47,7 @@ setup(
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Intended Audience :: Developers',
+        'Programming Language :: Python :: 3 :: Only',
         'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
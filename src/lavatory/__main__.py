@@ -1,23 +1,90 @@
-"""Main entry point."""
+"""Main entry point.
+
+Commands are imported when they are invoked, so ``version`` and the lighter
+commands do not pay for importing the clients and policies ``purge`` needs.
+"""
+import importlib
 import logging
 
 import click
-import coloredlogs
 
-from .commands.policies import policies
-from .commands.purge import purge
-from .commands.stats import stats
+from .utils.artifact_log import DEFAULT_PROGRESS_INTERVAL
+from .utils.log_context import RepoContextFilter
+from .utils.snapshot_cache import DEFAULT_CACHE_PATH, DEFAULT_CACHE_TTL
 
 LOG = logging.getLogger(__name__)
 
+COMMANDS = {
+    'policies': 'lavatory.commands.policies:policies',
+    'purge': 'lavatory.commands.purge:purge',
+    'stats': 'lavatory.commands.stats:stats',
+}
+
+
+class LazyGroup(click.Group):
+    """Group importing the modules of its ``lazy_commands`` on first use.
+
+    Args:
+        lazy_commands (dict): Import paths, ``module:attribute``, of commands by name.
+    """
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = dict(lazy_commands or {})
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            module_name, attribute = self.lazy_commands[cmd_name].split(':')
+            self.add_command(getattr(importlib.import_module(module_name), attribute), cmd_name)
+        return super().get_command(ctx, cmd_name)
 
-@click.group()
+
+@click.group(cls=LazyGroup, lazy_commands=COMMANDS)
 @click.option('-v', '--verbose', count=True, help='Increases logging level.')
+@click.option(
+    '--cache/--no-cache',
+    default=False,
+    is_flag=True,
+    help='Reuses search results of recent runs from a local snapshot.',
+    show_default=True)
+@click.option(
+    '--cache-path',
+    default=DEFAULT_CACHE_PATH,
+    type=click.Path(dir_okay=False),
+    show_default=True,
+    help='File holding the --cache snapshot.')
+@click.option(
+    '--cache-ttl',
+    default=DEFAULT_CACHE_TTL,
+    type=click.IntRange(min=0),
+    show_default=True,
+    help='Seconds cached search results are reused for.')
+@click.option(
+    '--artifact-log',
+    default=None,
+    type=click.Path(dir_okay=False),
+    help='Writes a JSON line per artifact purged or moved to this file, gzipped if it ends in .gz, '
+    'instead of logging each one.')
+@click.option(
+    '--progress-interval',
+    default=DEFAULT_PROGRESS_INTERVAL,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help='Seconds between progress summaries while writing --artifact-log.')
 @click.pass_context
-def root(ctx, verbose):
+def root(ctx, verbose, cache, cache_path, cache_ttl, artifact_log, progress_interval):
     """Lavatory is a tool for managing Artifactory Retention Policies."""
-    LOG.debug('Passed args: %s, %s', ctx, verbose)
-    coloredlogs.install(level=0, fmt='[%(levelname)s] %(name)s %(message)s', isatty=True)
+    # pylint: disable=import-outside-toplevel
+    import coloredlogs
+
+    LOG.debug('Passed args: %s, %s, %s, %s, %s, %s, %s', ctx, verbose, cache, cache_path, cache_ttl, artifact_log,
+              progress_interval)
+    coloredlogs.install(level=0, fmt='[%(levelname)s] %(name)s%(repo)s %(message)s', isatty=True)
+    for handler in logging.root.handlers:
+        handler.addFilter(RepoContextFilter())
     logging.root.setLevel(logging.INFO)  # colored logs likes to change root level
     verbosity = logging.root.getEffectiveLevel() - 10 * verbose or 1
     logging.getLogger(__package__).setLevel(verbosity)
@@ -25,19 +92,34 @@ def root(ctx, verbose):
     if verbosity < logging.DEBUG:
         logging.root.setLevel(verbosity)
 
+    if cache:
+        from .utils.run_context import RunContext
+        from .utils.snapshot_cache import SnapshotCache
+
+        snapshot = SnapshotCache(cache_path, ttl=cache_ttl)
+        ctx.call_on_close(snapshot.close)
+        ctx.obj = RunContext(cache=snapshot)
+
+    if artifact_log:
+        from .utils.artifact_log import close_artifact_log, open_artifact_log
+
+        open_artifact_log(artifact_log, progress_interval=progress_interval)
+        ctx.call_on_close(close_artifact_log)
+
 
 @root.command()
 def version():
     """Print version information."""
-    import pkg_resources
-    lavatory_version = pkg_resources.get_distribution('lavatory').version
+    try:
+        from importlib import metadata  # pylint: disable=import-outside-toplevel
+    except ImportError:  # pragma: no cover, Python < 3.8
+        import pkg_resources  # pylint: disable=import-outside-toplevel
+        lavatory_version = pkg_resources.get_distribution('lavatory').version
+    else:
+        lavatory_version = metadata.version('lavatory')
     click.echo(lavatory_version)
 
 
-root.add_command(policies)
-root.add_command(purge)
-root.add_command(stats)
-
 if __name__ == '__main__':
     # pylint: disable=no-value-for-parameter
     root()
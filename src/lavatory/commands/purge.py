@@ -1,14 +1,34 @@
 """Purges artifacts."""
+import asyncio
+import functools
 import inspect
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 import click
 
-from ..consts import REPO_TYPES
+from ..consts import DEFAULT_ASYNC_REQUESTS, REPO_TYPES
+from ..utils import metrics
+from ..utils.artifact_log import close_artifact_log, current_artifact_log, open_artifact_log
 from ..utils.artifactory import Artifactory
+from ..utils.compat import ASYNC_SUPPORTED, thread_pool
 from ..utils.get_artifactory_info import get_repos, get_storage
+from ..utils.journal import DEFAULT_JOURNAL_PATH, PurgeJournal
+from ..utils.log_context import repo_context
+from ..utils.offline import OfflineArtifactory
 from ..utils.performance import get_performance_report
+from ..utils.run_context import RunContext
 from ..utils.setup_pluginbase import get_policy, setup_pluginbase
+from ..utils.sharding import Shard
+from ..utils.throttle import DEFAULT_RETRIES
+from ..utils.transport import configure_throttle, connection_stats, reset_session, set_request_limit
+from ..utils.watermarks import DEFAULT_WATERMARK_PATH, WatermarkStore
+
+try:
+    import contextvars
+except ImportError:  # pragma: no cover, Python < 3.7 has no --async
+    contextvars = None
 
 LOG = logging.getLogger(__name__)
 
@@ -34,21 +54,274 @@ LOG = logging.getLogger(__name__)
     type=click.Choice(REPO_TYPES),
     show_default=True,
     help="The types of repositories to search for.")
-def purge(ctx, dryrun, policies_path, default, repo, repo_type):  # pylint: disable=too-many-arguments
+@click.option(
+    '--workers',
+    default=1,
+    required=False,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help='Number of concurrent delete workers per repository.')
+@click.option(
+    '--batch-folders/--no-batch-folders',
+    default=False,
+    is_flag=True,
+    help='Deletes a whole folder at once when all of its artifacts are purged.',
+    show_default=True)
+@click.option(
+    '--sort/--no-sort',
+    default=True,
+    is_flag=True,
+    help='Deletes artifacts in path order. Without it deletes start as soon as policies yield artifacts.',
+    show_default=True)
+@click.option(
+    '--parallel-repos',
+    default=1,
+    required=False,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help='Number of repositories to apply policies to concurrently.')
+@click.option(
+    '--max-requests',
+    default=0,
+    required=False,
+    type=click.IntRange(min=0),
+    show_default=True,
+    help='Maximum HTTP requests in flight across all repositories. 0 is unlimited.')
+@click.option(
+    '--rate-limit',
+    default=0.0,
+    required=False,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help='Maximum HTTP requests per second. 0 is unlimited.')
+@click.option(
+    '--retries',
+    default=DEFAULT_RETRIES,
+    required=False,
+    type=click.IntRange(min=0),
+    show_default=True,
+    help='Times a throttled or failed HTTP request is retried with exponential backoff.')
+@click.option(
+    '--adaptive-concurrency/--no-adaptive-concurrency',
+    default=False,
+    is_flag=True,
+    help='Adapts HTTP requests in flight to Artifactory errors and latency, up to --max-requests.',
+    show_default=True)
+@click.option(
+    '--journal',
+    default=None,
+    required=False,
+    type=click.Path(dir_okay=False),
+    help='File recording purge lists and completed deletes of --nodryrun runs, '
+    '{} with --resume. No journal is kept without either option.'.format(DEFAULT_JOURNAL_PATH))
+@click.option(
+    '--resume/--no-resume',
+    default=False,
+    is_flag=True,
+    help='Continues the run recorded in --journal, skipping finished repositories and deleted artifacts.',
+    show_default=True)
+@click.option(
+    '--incremental/--no-incremental',
+    default=False,
+    is_flag=True,
+    help='Retention helpers only search what changed since the last --nodryrun run.',
+    show_default=True)
+@click.option(
+    '--watermarks',
+    default=DEFAULT_WATERMARK_PATH,
+    required=False,
+    type=click.Path(dir_okay=False),
+    show_default=True,
+    help='File holding the state of --incremental runs.')
+@click.option(
+    '--offline',
+    default=None,
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    help='Evaluates policies against an AQL export (JSON, JSON lines or Parquet) instead of Artifactory. '
+    'Implies --dryrun.')
+@click.option(
+    '--async/--no-async',
+    'use_async',
+    default=False,
+    is_flag=True,
+    help='Deletes with an asyncio client, up to --max-requests (default {}) at once. Needs lavatory[async].'.format(
+        DEFAULT_ASYNC_REQUESTS),
+    show_default=True)
+@click.option(
+    '--shard',
+    default=None,
+    required=False,
+    callback=lambda ctx, param, value: _parse_shard(value),
+    help='Only processes shard i of N, written i/N. Work is split by repository and top-level folder, the same way '
+    'by every invocation.')
+@click.option(
+    '--processes',
+    default=1,
+    required=False,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help='Splits the run, or its --shard, into this many shards purged by separate processes.')
+@click.option(
+    '--metrics-json',
+    default=None,
+    required=False,
+    type=click.Path(dir_okay=False),
+    help='Writes timings and counters of every phase and repository to this JSON file.')
+@click.option(
+    '--metrics-prometheus',
+    default=None,
+    required=False,
+    type=click.Path(dir_okay=False),
+    help='Writes the metrics to this file in the Prometheus textfile collector format.')
+@click.option(
+    '--metrics-statsd',
+    default=None,
+    required=False,
+    metavar='HOST:PORT',
+    help='Sends the run totals to this StatsD server.')
+def purge(ctx, dryrun, policies_path, default, repo, repo_type, workers, batch_folders, sort, parallel_repos,
+          max_requests, rate_limit, retries, adaptive_concurrency, journal, resume, incremental, watermarks,
+          offline, use_async, shard, processes, metrics_json, metrics_prometheus,
+          metrics_statsd):  # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-locals
     """Deletes artifacts based on retention policies."""
-    LOG.debug('Passed args: %s, %s, %s, %s, %s, %s', ctx, dryrun, policies_path, default, repo, repo_type)
+    LOG.debug('Passed args: %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, '
+              '%s, %s, %s', ctx, dryrun, policies_path, default, repo, repo_type, workers, batch_folders, sort,
+              parallel_repos, max_requests, rate_limit, retries, adaptive_concurrency, journal, resume, incremental,
+              watermarks, offline, use_async, shard, processes, metrics_json, metrics_prometheus, metrics_statsd)
+    if processes > 1 and (offline or incremental or use_async):
+        raise click.UsageError('--processes cannot be combined with --offline, --incremental or --async.')
+    if use_async and (workers > 1 or parallel_repos > 1 or adaptive_concurrency):
+        raise click.UsageError('--async cannot be combined with --workers, --parallel-repos or '
+                               '--adaptive-concurrency, its requests in flight are set with --max-requests.')
+    if use_async and not ASYNC_SUPPORTED:
+        raise click.UsageError('--async needs Python 3.7 or newer.')
+
+    set_request_limit(max_requests)
+    adaptive_limit = (max_requests or workers * parallel_repos) if adaptive_concurrency else None
+    throttle_options = {'retries': retries, 'rate': rate_limit or None, 'adaptive_limit': adaptive_limit}
+    throttle = configure_throttle(**throttle_options)
+    run_metrics = metrics.enable_metrics() if metrics_json or metrics_prometheus or metrics_statsd else None
+    # failed and interrupted runs export their metrics too, they are the ones that need them most
+    try:
+        if offline:
+            artifactory = OfflineArtifactory.from_export(offline)
+            dryrun = True
+        else:
+            artifactory = ctx.ensure_object(RunContext).artifactory
+        if incremental:
+            artifactory.watermarks = WatermarkStore(watermarks)
 
-    storage_info = get_storage(repo_names=repo, repo_type=repo_type)
-    selected_repos = get_repos(repo_names=repo, repo_type=repo_type)
+        storage_info = get_storage(repo_names=repo, repo_type=repo_type, artifactory=artifactory)
+        selected_repos = get_repos(repo_names=repo, repo_type=repo_type, artifactory=artifactory)
 
-    apply_purge_policies(selected_repos, policies_path=policies_path, dryrun=dryrun, default=default)
-    generate_purge_report(selected_repos, storage_info)
+        if resume and not journal:
+            journal = DEFAULT_JOURNAL_PATH
+        if dryrun:
+            journal = None
+        # worker processes keep journals of their own
+        purge_journal = PurgeJournal(journal, resume=resume) if journal and processes == 1 else None
+        try:
+            if processes > 1:
+                apply_purge_policies_sharded(
+                    selected_repos,
+                    processes=processes,
+                    shard=shard,
+                    policies_path=policies_path,
+                    dryrun=dryrun,
+                    default=default,
+                    workers=workers,
+                    batch_folders=batch_folders,
+                    sort=sort,
+                    parallel_repos=parallel_repos,
+                    credentials=artifactory.credentials,
+                    journal=journal,
+                    resume=resume,
+                    max_requests=max_requests,
+                    throttle_options=throttle_options)
+            elif use_async and not offline:
+                apply_purge_policies_async(
+                    selected_repos,
+                    policies_path=policies_path,
+                    dryrun=dryrun,
+                    default=default,
+                    batch_folders=batch_folders,
+                    sort=sort,
+                    max_requests=max_requests or DEFAULT_ASYNC_REQUESTS,
+                    retries=retries,
+                    rate_limit=rate_limit or None,
+                    artifactory=artifactory,
+                    journal=purge_journal,
+                    shard=shard)
+            else:
+                apply_purge_policies(
+                    selected_repos,
+                    policies_path=policies_path,
+                    dryrun=dryrun,
+                    default=default,
+                    workers=workers,
+                    batch_folders=batch_folders,
+                    sort=sort,
+                    parallel_repos=parallel_repos,
+                    artifactory=artifactory,
+                    journal=purge_journal,
+                    shard=shard)
+        finally:
+            if purge_journal:
+                purge_journal.close()
+        if incremental and not dryrun:
+            artifactory.watermarks.save()
+        artifactory.invalidate_storage_info()
+        generate_purge_report(selected_repos, storage_info, artifactory=artifactory)
+        LOG.info("HTTP connections opened: %(opened)d, reused: %(reused)d", connection_stats())
+        if throttle.limiter:
+            LOG.info("Adaptive concurrency limit ended at %d", throttle.limiter.limit)
+    except BaseException:
+        metrics.count('runs_failed')
+        raise
+    finally:
+        if run_metrics:
+            metrics.disable_metrics()
+            export_metrics(run_metrics, json_path=metrics_json, prometheus_path=metrics_prometheus,
+                           statsd_address=metrics_statsd)
 
     LOG.info("Success.")
     return True
 
 
-def apply_purge_policies(selected_repos, policies_path=None, dryrun=True, default=True):
+def export_metrics(run_metrics, json_path=None, prometheus_path=None, statsd_address=None):
+    """Logs the time spent in each phase and writes the metrics of a run.
+
+    Args:
+        run_metrics (Metrics): Metrics of the run.
+        json_path (str): Writes the JSON summary to this file.
+        prometheus_path (str): Writes the Prometheus textfile to this file.
+        statsd_address (str): Sends the totals to this StatsD ``host:port``.
+    """
+    phases = run_metrics.summary()['total']['phases']
+    LOG.info("Time spent: %s", ', '.join(
+        '{} {:.2f}s'.format(phase, timing['seconds']) for phase, timing in sorted(phases.items())))
+    if json_path:
+        run_metrics.write_json(json_path)
+    if prometheus_path:
+        run_metrics.write_prometheus(prometheus_path)
+    if statsd_address:
+        run_metrics.send_statsd(statsd_address)
+
+
+def _parse_shard(value):
+    if value is None:
+        return None
+    try:
+        return Shard.parse(value)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+
+
+def apply_purge_policies(selected_repos, policies_path=None, dryrun=True, default=True, workers=1,
+                         batch_folders=False, sort=True, parallel_repos=1, artifactory=None, journal=None,
+                         shard=None):  # pylint: disable=too-many-arguments
     """Sets up the plugins to find purgable artifacts and delete them.
 
     Args:
@@ -56,32 +329,351 @@ def apply_purge_policies(selected_repos, policies_path=None, dryrun=True, defaul
         policies_path (str): Path to extra policies
         dryrun (bool): If true, will not actually delete artifacts.
         default (bool): If true, applies default policy to repos with no specific policy.
+        workers (int): Number of concurrent delete workers per repository.
+        batch_folders (bool): If true, deletes whole folders when all of their artifacts are purged.
+        sort (bool): If true, deletes listed artifacts in path order.
+        parallel_repos (int): Number of repositories to process concurrently.
+        artifactory (Artifactory): Client of the run, its credentials are reused for every repository.
+        journal (PurgeJournal): Records progress, and skips work recorded by an earlier run.
+        shard (Shard): Only purges the repositories and top-level folders of this shard.
+    """
+    _log_purge_summary(
+        _apply_purge_policies(
+            selected_repos,
+            policies_path=policies_path,
+            dryrun=dryrun,
+            default=default,
+            workers=workers,
+            batch_folders=batch_folders,
+            sort=sort,
+            parallel_repos=parallel_repos,
+            artifactory=artifactory,
+            journal=journal,
+            shard=shard))
+
+
+def _apply_purge_policies(selected_repos, policies_path=None, parallel_repos=1, **options):
+    """Applies policies as :func:`apply_purge_policies` does.
+
+    Returns:
+        dict: Count purged for each repository, None for skipped ones.
     """
     plugin_source = setup_pluginbase(extra_policies_path=policies_path)
     LOG.info("Applying retention policies to %s", ', '.join(selected_repos))
-    for repository in selected_repos:
+    purge_repository = functools.partial(_purge_repository, plugin_source, **options)
+
+    if parallel_repos > 1:
+        with thread_pool(parallel_repos, thread_name_prefix='repo') as executor:
+            return dict(zip(selected_repos, executor.map(purge_repository, selected_repos)))
+    return {repository: purge_repository(repository) for repository in selected_repos}
+
+
+def apply_purge_policies_sharded(selected_repos, processes=2, shard=None, credentials=None, journal=None,
+                                 resume=False, max_requests=None, throttle_options=None,
+                                 **options):  # pylint: disable=too-many-arguments
+    """Splits the policies of a run across processes, each with its own client.
+
+    The run, or the ``shard`` of it given, is split into ``processes`` shards. With
+    ``shard`` i/N, process p takes shard i + N * (p - 1) of N * processes, which
+    holds exactly the units of i/N that it owns, so invocations can be combined.
+
+    Args:
+        selected_repos (list): List of repos to run against.
+        processes (int): Number of processes.
+        shard (Shard): Part of the run to split, None for the whole run.
+        credentials (dict): Credentials of the clients in every process.
+        journal (str): Path of the journal, each process writes its own ``<journal>.<shard>``.
+        resume (bool): Continues the journals of an earlier run.
+        max_requests (int): Requests in flight in each process, None for no cap.
+        throttle_options (dict): Arguments of :func:`configure_throttle` in each process.
+        options: Arguments of :func:`apply_purge_policies`.
+    """
+    first, count = (shard.index - 1, shard.count) if shard else (0, 1)
+    shards = [Shard(first + count * number + 1, count * processes) for number in range(processes)]
+    LOG.info("Purging shards %s in %d processes", ', '.join(str(part) for part in shards), processes)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        results = executor.map(
+            functools.partial(
+                _purge_shard,
+                selected_repos,
+                credentials=credentials,
+                journal=journal,
+                resume=resume,
+                collect_metrics=metrics.current_metrics() is not None,
+                artifact_log=_artifact_log_options(),
+                max_requests=max_requests,
+                throttle_options=throttle_options,
+                options=options), shards)
+        purged = {}
+        for shard_purged, shard_metrics in results:
+            if shard_metrics:
+                metrics.current_metrics().merge(shard_metrics)
+            for repository, repo_count in shard_purged.items():
+                if repo_count is not None:
+                    purged[repository] = (purged.get(repository) or 0) + repo_count
+                else:
+                    purged.setdefault(repository, None)
+
+    _log_purge_summary(purged)
+
+
+def _init_shard_process(max_requests=None, throttle_options=None):
+    """Sets up the transport of a worker process before it purges a shard.
+
+    The settings are passed explicitly rather than inherited, so workers behave
+    the same whether they are forked or spawned.
+    """
+    reset_session()
+    set_request_limit(max_requests)
+    configure_throttle(**(throttle_options or {}))
+
+
+def _purge_shard(selected_repos, shard, credentials=None, journal=None, resume=False, collect_metrics=False,
+                 artifact_log=None, max_requests=None, throttle_options=None,
+                 options=None):  # pylint: disable=too-many-arguments
+    """Purges one shard in a worker process.
+
+    With the ``artifact_log`` options of the parent, the process writes its own
+    log next to the parent's, ``artifacts.jsonl`` becoming ``artifacts.<shard>.jsonl``.
+
+    Returns:
+        tuple: Count purged for each repository, None for skipped ones, and the
+        metrics of the process when ``collect_metrics``.
+    """
+    _init_shard_process(max_requests=max_requests, throttle_options=throttle_options)
+    # forked workers inherit the metrics and log of the parent, but not the log's writer thread
+    shard_metrics = metrics.enable_metrics() if collect_metrics else None
+    if artifact_log:
+        root, extension = os.path.splitext(artifact_log['path'])
+        open_artifact_log('{}.{}{}'.format(root, shard.index, extension),
+                          progress_interval=artifact_log['progress_interval'])
+    artifactory = Artifactory(repo_name=None, credentials=credentials)
+    purge_journal = PurgeJournal('{}.{}'.format(journal, shard.index), resume=resume) if journal else None
+    try:
+        purged = _apply_purge_policies(
+            selected_repos, artifactory=artifactory, journal=purge_journal, shard=shard, **options)
+        return purged, shard_metrics
+    finally:
+        if purge_journal:
+            purge_journal.close()
+        close_artifact_log()
+
+
+def _artifact_log_options():
+    """Path and progress interval of the open artifact log, None without one."""
+    artifact_log = current_artifact_log()
+    if artifact_log is None:
+        return None
+    return {'path': artifact_log.path, 'progress_interval': artifact_log.progress_interval}
+
+
+def _purge_repository(plugin_source, repository, artifactory=None, dryrun=True, default=True, workers=1,
+                      batch_folders=False, sort=True, journal=None, shard=None):  # pylint: disable=too-many-arguments
+    """Applies the policy of a single repository and purges its artifacts.
+
+    Args:
+        plugin_source (PluginBase): The source of plugins from PluginBase.
+        repository (str): Name of the repository.
+        artifactory (Artifactory): Client of the run, its credentials are reused.
+        dryrun (bool): If true, will not actually delete artifacts.
+        default (bool): If true, applies default policy to repos with no specific policy.
+        workers (int): Number of concurrent delete workers.
+        batch_folders (bool): If true, deletes whole folders when all of their artifacts are purged.
+        sort (bool): If true, deletes listed artifacts in path order.
+        journal (PurgeJournal): Records progress, and skips work recorded by an earlier run.
+        shard (Shard): Only purges the top-level folders of this shard.
+
+    Returns:
+        int: Count purged, None if no policy applied.
+    """
+    with repo_context(repository):
+        if journal and journal.completed(repository) is not None:
+            LOG.info("Skipping %s, already purged by the resumed run", repository)
+            return journal.completed(repository)
+        artifactory_repo = _repository_client(artifactory, repository, shard=shard)
+        if artifactory_repo is None:
+            return None
+        artifacts = _plan_repository(plugin_source, repository, artifactory_repo, default=default, journal=journal)
+        if artifacts is None:
+            return None
+        if artifactory_repo.watermarks and not dryrun:
+            artifacts = artifactory_repo.watermarks.track(repository, artifacts)
+        on_purged = functools.partial(journal.record_purged, repository) if journal else None
+        purged_count = artifactory_repo.purge(
+            dryrun, artifacts, workers=workers, batch_folders=batch_folders, sort=sort, on_purged=on_purged)
+        if journal:
+            journal.record_done(repository, purged_count)
+        if artifactory_repo.watermarks and not dryrun:
+            artifactory_repo.watermarks.commit(repository, purged_count)
+        LOG.info("Processed %s, Purged %s", repository, purged_count)
+    return purged_count
+
+
+def _repository_client(artifactory, repository, shard=None):
+    """Client for a repository, reusing the run's client when there is one.
+
+    With a ``shard`` its searches are limited to the folders of the shard, and
+    None is returned when the shard has nothing in the repository.
+    """
+    if artifactory:
+        artifactory_repo = artifactory.for_repo(repository)
+    else:
         artifactory_repo = Artifactory(repo_name=repository)
-        policy = get_policy(plugin_source, repository, default=default)
-        if not policy:
-            continue
-        LOG.info("Policy Docs: %s", inspect.getdoc(policy.purgelist))
+    if shard:
+        artifactory_repo.path_scope = shard.scope(artifactory_repo)
+        if not artifactory_repo.path_scope:
+            LOG.info("Skipping %s, nothing in shard %s", repository, shard)
+            return None
+    return artifactory_repo
+
+
+def _plan_repository(plugin_source, repository, artifactory_repo, default=True, journal=None):
+    """Lists the artifacts the policy of a repository purges.
+
+    Args:
+        plugin_source (PluginBase): The source of plugins from PluginBase.
+        repository (str): Name of the repository.
+        artifactory_repo (Artifactory): Client of the repository.
+        default (bool): If true, applies default policy to repos with no specific policy.
+        journal (PurgeJournal): Records the purge list, or provides the one of an earlier run.
+
+    Returns:
+        iterable: Artifacts to purge, None if no policy applied.
+    """
+    policy = get_policy(plugin_source, repository, default=default)
+    if not policy:
+        return None
+    LOG.info("Policy Docs: %s", inspect.getdoc(policy.purgelist))
+    artifacts = journal.planned(repository) if journal else None
+    if artifacts is not None:
+        LOG.info("Resuming recorded purge list, %d artifacts outstanding", len(artifacts))
+        return artifacts
+    with metrics.timer('policy'):
         artifacts = policy.purgelist(artifactory_repo)
-        purged_count = artifactory_repo.purge(dryrun, artifacts)
+    if journal:
+        artifacts = journal.outstanding(repository, journal.record_plan(repository, artifacts))
+    return artifacts
+
+
+def apply_purge_policies_async(selected_repos, policies_path=None, dryrun=True, default=True, batch_folders=False,
+                               sort=True, max_requests=DEFAULT_ASYNC_REQUESTS, retries=DEFAULT_RETRIES,
+                               rate_limit=None, artifactory=None, journal=None,
+                               shard=None):  # pylint: disable=too-many-arguments
+    """Applies policies like :func:`apply_purge_policies`, deleting with the asyncio client.
+
+    Policies of every repository run concurrently in threads, as they use the
+    synchronous client. Once a policy has listed its artifacts they are deleted
+    by one event loop with up to ``max_requests`` requests in flight.
+
+    Args:
+        selected_repos (list): List of repos to run against.
+        policies_path (str): Path to extra policies
+        dryrun (bool): If true, will not actually delete artifacts.
+        default (bool): If true, applies default policy to repos with no specific policy.
+        batch_folders (bool): If true, deletes whole folders when all of their artifacts are purged.
+        sort (bool): If true, deletes listed artifacts in path order.
+        max_requests (int): Maximum delete requests in flight.
+        retries (int): Times a throttled or failed request is retried.
+        rate_limit (float): Maximum requests per second of the asyncio client, None for unlimited.
+        artifactory (Artifactory): Client of the run, its credentials are reused for every repository.
+        journal (PurgeJournal): Records progress, and skips work recorded by an earlier run.
+        shard (Shard): Only purges the repositories and top-level folders of this shard.
+    """
+    # aiohttp is optional and slow to import, only load it for async runs
+    from ..utils.async_artifactory import AsyncArtifactory  # pylint: disable=import-outside-toplevel
+
+    plugin_source = setup_pluginbase(extra_policies_path=policies_path)
+    LOG.info("Applying retention policies to %s with up to %d requests in flight", ', '.join(selected_repos),
+             max_requests)
+    purge_repository = functools.partial(
+        _purge_repository_async,
+        plugin_source,
+        artifactory=artifactory,
+        dryrun=dryrun,
+        default=default,
+        batch_folders=batch_folders,
+        sort=sort,
+        journal=journal,
+        shard=shard)
+
+    async def _purge_all():
+        credentials = artifactory.credentials if artifactory else None
+        async with AsyncArtifactory(credentials=credentials, max_requests=max_requests, retries=retries,
+                                    rate=rate_limit) as client:
+            counts = await asyncio.gather(*(purge_repository(repository, client) for repository in selected_repos))
+        return dict(zip(selected_repos, counts))
+
+    _log_purge_summary(asyncio.run(_purge_all()))
+
+
+async def _purge_repository_async(plugin_source, repository, client, artifactory=None, dryrun=True, default=True,
+                                  batch_folders=False, sort=True, journal=None,
+                                  shard=None):  # pylint: disable=too-many-arguments
+    """Applies the policy of a single repository in a thread and purges its artifacts with ``client``.
+
+    Returns:
+        int: Count purged, None if no policy applied.
+    """
+    with repo_context(repository):
+        if journal and journal.completed(repository) is not None:
+            LOG.info("Skipping %s, already purged by the resumed run", repository)
+            return journal.completed(repository)
+
+        def _plan():
+            artifactory_repo = _repository_client(artifactory, repository, shard=shard)
+            if artifactory_repo is None:
+                return None
+            artifacts = _plan_repository(plugin_source, repository, artifactory_repo, default=default, journal=journal)
+            if artifacts is None:
+                return None
+            if artifactory_repo.watermarks and not dryrun:
+                artifacts = artifactory_repo.watermarks.track(repository, artifacts)
+            if batch_folders:
+                return artifactory_repo.collapse_folders(artifacts)
+            artifacts = list(artifacts)
+            if sort:
+                artifacts.sort(key=lambda k: k['path'])
+            return artifacts
+
+        loop = asyncio.get_running_loop()
+        artifacts = await loop.run_in_executor(None, contextvars.copy_context().run, _plan)
+        if artifacts is None:
+            return None
+        on_purged = functools.partial(journal.record_purged, repository) if journal else None
+        purged_count = await client.for_repo(repository).purge(dryrun, artifacts, on_purged=on_purged)
+        if journal:
+            journal.record_done(repository, purged_count)
+        if artifactory and artifactory.watermarks and not dryrun:
+            artifactory.watermarks.commit(repository, purged_count)
         LOG.info("Processed %s, Purged %s", repository, purged_count)
+    return purged_count
+
+
+def _log_purge_summary(purged):
+    """Logs the aggregated result of applying policies.
+
+    Args:
+        purged (dict): Count purged for each repository, None for skipped ones.
+    """
+    applied = {repo: count for repo, count in purged.items() if count is not None}
+    LOG.info("Purge summary: %d repositories processed, %d skipped, %s artifacts purged", len(applied),
+             len(purged) - len(applied), sum(applied.values()))
 
 
-def generate_purge_report(purged_repos, before_purge_data):
+def generate_purge_report(purged_repos, before_purge_data, artifactory=None):
     """Generates a performance report based on deleted artifacts.
 
     Args:
         purged_repos (list): List of repos that had policy applied.
         before_purge_data (dict): Data on the state of Artifactory before purged artifacts
+        artifactory (Artifactory): Client of the run. Its storage info must be invalidated after purging.
     """
     if not before_purge_data:
         LOG.info('User does not have "Admin Privileges" to generate performance details.')
         return
     LOG.info("Purging Performance:")
-    artifactory = Artifactory(repo_name=None)
+    if not artifactory:
+        artifactory = Artifactory(repo_name=None)
     after_purge_data = artifactory.repos()
 
     for repo, info in after_purge_data.items():
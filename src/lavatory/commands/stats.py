@@ -4,6 +4,7 @@ import logging
 import click
 
 from ..utils.get_artifactory_info import get_repos, get_storage
+from ..utils.run_context import RunContext
 
 LOG = logging.getLogger(__name__)
 
@@ -20,12 +21,13 @@ def stats(ctx, repo):
     """Get statistics of repos."""
     LOG.debug('Passed args: %s, %s.', ctx, repo)
 
-    storage = get_storage(repo_names=repo, repo_type='any')
+    artifactory = ctx.ensure_object(RunContext).artifactory
+    storage = get_storage(repo_names=repo, repo_type='any', artifactory=artifactory)
     if not storage:
         LOG.info('User does not have "Admin Privileges" to generate statistics.')
         return
 
-    repositories = get_repos(repo_names=repo, repo_type='any')
+    repositories = get_repos(repo_names=repo, repo_type='any', artifactory=artifactory)
     for repository in repositories:
         repo = storage.get(repository)
         if repo is None:
@@ -1 +1,2 @@
 REPO_TYPES = ['local', 'virtual', 'cache', 'any']
+DEFAULT_ASYNC_REQUESTS = 100
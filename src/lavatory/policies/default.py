@@ -1,4 +1,4 @@
 def purgelist(artifactory):
     """Default Policy. Keeps the last 5 artifacts from each project"""
-    purgable = artifactory.count_based_retention(retention_count=5)
+    purgable = artifactory.count_based_retention(retention_count=5, compact=True)
     return purgable
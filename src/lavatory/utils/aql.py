@@ -0,0 +1,238 @@
+"""Composable AQL criteria for policies.
+
+Conditions build :class:`Predicate` objects that combine with ``&`` and ``|``
+into one AQL query, so Artifactory does the filtering instead of the policy::
+
+    from lavatory.utils import aql
+
+    stale = aql.older_than(90) & aql.not_downloaded_since(30)
+    unused = stale & (aql.property_matches('deployed', 'dev') | aql.larger_than('1 GB'))
+    purgeable = artifactory.time_based_retention(where=unused)
+
+Ages use AQL's relative time operators, so the query text does not change from
+one run to the next and cached results and watermarks keep matching it.
+"""
+from humanfriendly import parse_size
+
+from ..exceptions import LavatoryError
+
+DATE_FIELDS = ('created', 'modified', 'updated', 'stat.downloaded')
+SEARCH_FIELDS = ('repo', 'path', 'name', 'type')
+
+
+class Predicate:
+    """AQL criteria that combine with ``&`` (``$and``) and ``|`` (``$or``).
+
+    Args:
+        term (dict): AQL criteria, such as ``{"size": {"$gt": 1024}}``.
+    """
+
+    __slots__ = ('term', )
+
+    def __init__(self, term):
+        self.term = term
+
+    def __and__(self, other):
+        return all_of(self, other)
+
+    def __or__(self, other):
+        return any_of(self, other)
+
+    def __eq__(self, other):
+        return isinstance(other, Predicate) and self.term == other.term
+
+    def __hash__(self):
+        return hash(repr(self.term))
+
+    def __repr__(self):
+        return 'Predicate({!r})'.format(self.term)
+
+    def terms(self):
+        """AQL terms to AND together, as taken by :meth:`Artifactory.filter`.
+
+        Returns:
+            list: The terms of a top-level ``$and``, or this predicate alone.
+        """
+        if list(self.term) == ['$and']:
+            return list(self.term['$and'])
+        return [self.term]
+
+
+def all_of(*predicates):
+    """Matches items meeting every condition, nested ``$and`` groups are flattened.
+
+    Args:
+        predicates: :class:`Predicate` objects or AQL criteria dicts.
+
+    Returns:
+        Predicate: ``$and`` of the conditions.
+    """
+    return _group('$and', predicates)
+
+
+def any_of(*predicates):
+    """Matches items meeting at least one condition, nested ``$or`` groups are flattened.
+
+    Args:
+        predicates: :class:`Predicate` objects or AQL criteria dicts.
+
+    Returns:
+        Predicate: ``$or`` of the conditions.
+    """
+    return _group('$or', predicates)
+
+
+def older_than(days, field='created'):
+    """Matches items whose ``field`` is more than ``days`` ago.
+
+    Args:
+        days (int): Age in days.
+        field (str): Date field, one of created, modified, updated or stat.downloaded.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({_date_field(field): {"$before": "{}d".format(days)}})
+
+
+def newer_than(days, field='created'):
+    """Matches items whose ``field`` is within the last ``days``.
+
+    Args:
+        days (int): Age in days.
+        field (str): Date field, one of created, modified, updated or stat.downloaded.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({_date_field(field): {"$last": "{}d".format(days)}})
+
+
+def not_downloaded_since(days):
+    """Matches files last downloaded more than ``days`` ago, or never downloaded.
+
+    Args:
+        days (int): Days since the last download.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return any_of(older_than(days, field='stat.downloaded'), never_downloaded())
+
+
+def never_downloaded():
+    """Matches files that were never downloaded.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({"stat.downloads": {"$eq": None}})
+
+
+def larger_than(size):
+    """Matches files larger than ``size``.
+
+    Args:
+        size (int or str): Bytes, or a size such as ``'500 MB'``.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({"size": {"$gt": _bytes(size)}})
+
+
+def smaller_than(size):
+    """Matches files smaller than ``size``.
+
+    Args:
+        size (int or str): Bytes, or a size such as ``'500 MB'``.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({"size": {"$lt": _bytes(size)}})
+
+
+def property_equals(key, value):
+    """Matches items with property ``key`` set to ``value``.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({"@{}".format(key): {"$eq": value}})
+
+
+def property_matches(key, pattern='*'):
+    """Matches items with a value of property ``key`` matching a wildcard pattern.
+
+    Args:
+        key (str): Name of the property.
+        pattern (str): Pattern with ``*`` and ``?`` wildcards, any value by default.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({"@{}".format(key): {"$match": pattern}})
+
+
+def property_not_matches(key, pattern='*'):
+    """Matches items without a value of property ``key`` matching a wildcard pattern.
+
+    Args:
+        key (str): Name of the property.
+        pattern (str): Pattern with ``*`` and ``?`` wildcards, any value by default.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({"@{}".format(key): {"$nmatch": pattern}})
+
+
+def path_matches(pattern):
+    """Matches items in folders matching a wildcard pattern, such as ``'com/example/*'``.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({"path": {"$match": pattern}})
+
+
+def path_not_matches(pattern):
+    """Matches items in folders not matching a wildcard pattern.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({"path": {"$nmatch": pattern}})
+
+
+def name_matches(pattern):
+    """Matches items named like a wildcard pattern, such as ``'*.rpm'``.
+
+    Returns:
+        Predicate: The condition.
+    """
+    return Predicate({"name": {"$match": pattern}})
+
+
+def _group(operator, predicates):
+    terms = []
+    for predicate in predicates:
+        term = predicate.term if isinstance(predicate, Predicate) else predicate
+        if list(term) == [operator]:
+            terms.extend(term[operator])
+        else:
+            terms.append(term)
+    if len(terms) == 1:
+        return Predicate(terms[0])
+    return Predicate({operator: terms})
+
+
+def _date_field(field):
+    if field not in DATE_FIELDS:
+        raise LavatoryError('Unknown time field {}'.format(field))
+    return field
+
+
+def _bytes(size):
+    return parse_size(size) if isinstance(size, str) else int(size)
@@ -0,0 +1,152 @@
+"""Machine readable log of every artifact purged or moved, written in the background.
+
+With an artifact log open, purges and moves no longer log a console line per
+artifact. They queue a tuple, and a writer thread formats the records as JSON
+lines, writes them in batches and logs a progress summary every
+``progress_interval`` seconds.
+"""
+import collections
+import gzip
+import json
+import logging
+import queue
+import threading
+import time
+
+from .compat import SimpleQueue
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_PROGRESS_INTERVAL = 10.0
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 1000
+GZIP_LEVEL = 6
+
+_STOP = object()
+_RECORD = '{"time": %.3f, "action": "%s", "repo": %s, "path": %s, "name": %s, "dry_run": %s, "ok": %s}'
+_BOOLEANS = {True: 'true', False: 'false'}
+_quote = json.encoder.encode_basestring  # pylint: disable=invalid-name
+_ARTIFACT_LOG = None
+
+
+class ArtifactLog:
+    """Buffered JSON lines file of artifact outcomes.
+
+    Each line holds the time, ``action`` (purge or move), ``repo``, ``path``,
+    ``name``, ``dry_run`` and ``ok``, plus ``dest`` for moves. Files ending in
+    ``.gz`` are gzip compressed. Records are appended, so resumed runs add to
+    the same file.
+
+    Args:
+        path (str): Path of the log file.
+        progress_interval (float): Seconds between progress summaries, 0 for none.
+    """
+
+    def __init__(self, path, progress_interval=DEFAULT_PROGRESS_INTERVAL):
+        self.path = path
+        self.progress_interval = progress_interval
+        if path.endswith('.gz'):
+            self._file = gzip.open(path, 'at', compresslevel=GZIP_LEVEL, encoding='utf-8')
+        else:
+            self._file = open(path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+        self._queue = SimpleQueue()
+        self._counts = collections.Counter()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._write, name='artifact-log', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, action, repo, artifact, dry_run, ok=True, dest=None):  # pylint: disable=too-many-arguments
+        """Queues the outcome of one artifact, formatting happens in the writer thread.
+
+        Args:
+            action (str): purge or move.
+            repo (str): Name of the repository.
+            artifact (dict): Artifact. Needs artifact['name'] and ['path'].
+            dry_run (bool): Whether the action was only logged.
+            ok (bool): Whether the action succeeded.
+            dest (str): Destination repository of moves.
+        """
+        self._queue.put((time.time(), action, repo, artifact['path'], artifact['name'], dry_run, ok, dest))
+
+    def close(self):
+        """Writes the queued records, logs the final summary and closes the file."""
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+        self._log_progress('Artifact log {} written'.format(self.path))
+
+    def _write(self):
+        last_progress = time.monotonic()
+        while True:
+            try:
+                batch = [self._queue.get(timeout=FLUSH_INTERVAL)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < BATCH_SIZE and batch[-1] is not _STOP:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = bool(batch) and batch[-1] is _STOP
+            lines = [self._format(entry) for entry in batch if entry is not _STOP]
+            if lines:
+                self._file.write('\n'.join(lines) + '\n')
+            if stopping:
+                return
+            if not batch:
+                self._file.flush()
+            if self.progress_interval and time.monotonic() - last_progress >= self.progress_interval:
+                last_progress = time.monotonic()
+                self._log_progress('Progress')
+
+    def _format(self, entry):
+        stamp, action, repo, path, name, dry_run, ok, dest = entry
+        self._counts[repo, action, ok] += 1
+        line = _RECORD % (stamp, action, _quote(repo), _quote(path), _quote(name), _BOOLEANS[dry_run], _BOOLEANS[ok])
+        if dest is not None:
+            line = '%s, "dest": %s}' % (line[:-1], _quote(dest))
+        return line
+
+    def _log_progress(self, title):
+        elapsed = time.monotonic() - self._started
+        totals = collections.OrderedDict()
+        for (repo, action, ok), count in sorted(self._counts.items()):
+            done = totals.setdefault((repo, action), {True: 0, False: 0})
+            done[ok] += count
+        for (repo, action), done in totals.items():
+            LOG.info('%s: %s %s %d ok, %d failed (%.0f/s)', title, repo, action, done[True], done[False],
+                     (done[True] + done[False]) / elapsed if elapsed else 0)
+
+
+def open_artifact_log(path, progress_interval=DEFAULT_PROGRESS_INTERVAL):
+    """Opens the artifact log used by every client in the process.
+
+    Args:
+        path (str): Path of the log file, compressed if it ends in ``.gz``.
+        progress_interval (float): Seconds between progress summaries, 0 for none.
+
+    Returns:
+        ArtifactLog: The open log.
+    """
+    global _ARTIFACT_LOG  # pylint: disable=global-statement
+    _ARTIFACT_LOG = ArtifactLog(path, progress_interval=progress_interval)
+    return _ARTIFACT_LOG
+
+
+def close_artifact_log():
+    """Closes the artifact log, per artifact lines go to the console again."""
+    global _ARTIFACT_LOG  # pylint: disable=global-statement
+    artifact_log, _ARTIFACT_LOG = _ARTIFACT_LOG, None
+    if artifact_log:
+        artifact_log.close()
+
+
+def current_artifact_log():
+    """The open artifact log, None when per artifact lines go to the console."""
+    return _ARTIFACT_LOG
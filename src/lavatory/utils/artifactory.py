@@ -1,28 +1,70 @@
 """Artifactory purger module."""
 import os
 import base64
+import collections
+import contextlib
 import datetime
+import fnmatch
 import logging
+import queue
+import threading
+import time
 
 import certifi
-import party
 
 # pylint: disable=redefined-builtin
 from requests.exceptions import (BaseHTTPError, ConnectionError, HTTPError, InvalidURL, RequestException)
 
 from ..credentials import load_credentials
+from ..exceptions import LavatoryError
+from . import metrics
+from .aql import SEARCH_FIELDS
+from .artifact_log import current_artifact_log
+from .compat import thread_pool
+from .log_context import repo_context
+from .records import compact as compact_records
+from .sharding import scope_term
+from .transport import SessionParty
+from .watermarks import SAFETY_MARGIN, search_key
 
 LOG = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 1000
+PURGE_QUEUE_PER_WORKER = 50
+FOLDER_LOOKUP_CHUNK = 100
+PROPERTY_LOOKUP_CHUNK = 100
+AQL_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+STORAGE_INFO_QUERY = {'api': 'storageinfo'}
+
 
 class Artifactory:
-    """Artifactory purger class."""
+    """Artifactory purger class.
+
+    Args:
+        repo_name (str): Name of the repository.
+        credentials (dict): Credentials, loaded from the environment if not given.
+        watermarks (WatermarkStore): Makes retention searches incremental, only
+            looking at what changed since the previous run.
+        cache (SnapshotCache): Serves repeated searches from a local snapshot.
+
+    Attributes:
+        path_scope (list): Top-level folders searches are limited to, see
+            :meth:`Shard.scope`. None searches the whole repository.
+    """
 
-    def __init__(self, repo_name=None):
+    transport_class = SessionParty
+
+    def __init__(self, repo_name=None, credentials=None, watermarks=None, cache=None):
         self.repo_name = repo_name
-        self.credentials = load_credentials()
+        self.credentials = credentials or load_credentials()
+        self.watermarks = watermarks
+        self.cache = cache
+        self.path_scope = None
+        self._storage_info = None
+        self._property_cache = {}
+        self._settle_removed = None
         self.base_url = self.credentials['artifactory_url']
-        self.artifactory = party.Party()
+        self.artifactory = self.transport_class()
         if not self.base_url.endswith('/api'):
             self.api_url = '/'.join([self.base_url, 'api'])
         else:
@@ -32,6 +74,41 @@ class Artifactory:
         self.artifactory.password = base64.encodebytes(bytes(self.credentials['artifactory_password'], 'utf-8'))
         self.artifactory.certbundle = os.getenv('LAVATORY_CERTBUNDLE_PATH', certifi.where())
 
+    def for_repo(self, repo_name):
+        """Returns a client for another repository reusing this client's credentials.
+
+        Args:
+            repo_name (str): Name of the repository.
+
+        Returns:
+            Artifactory: Client for ``repo_name``.
+        """
+        return Artifactory(
+            repo_name=repo_name, credentials=self.credentials, watermarks=self.watermarks, cache=self.cache)
+
+    def storage_info(self):
+        """Returns the ``storageinfo`` API response, fetched once and cached until invalidated.
+
+        Returns:
+            dict: Storage info data.
+        """
+        if self._storage_info is None and self.cache:
+            self._storage_info = self.cache.get('', STORAGE_INFO_QUERY)
+        if self._storage_info is None:
+            with metrics.timer('storage_info'):
+                raw_data = self.artifactory.get('storageinfo')
+            self._storage_info = raw_data.json()
+            LOG.debug('Storage info data: %s', self._storage_info)
+            if self.cache:
+                self.cache.put('', STORAGE_INFO_QUERY, self._storage_info)
+        return self._storage_info
+
+    def invalidate_storage_info(self):
+        """Drops the cached ``storageinfo`` so the next lookup fetches it again."""
+        self._storage_info = None
+        if self.cache:
+            self.cache.invalidate('')
+
     def repos(self, repo_type='local'):
         """
         Return a dictionary of repos with basic info about each.
@@ -44,9 +121,7 @@ class Artifactory:
         """
         repos = {}
 
-        raw_data = self.artifactory.get('storageinfo')
-        data = raw_data.json()
-        LOG.debug('Storage info data: %s', data)
+        data = self.storage_info()
         for repo in data["repositoriesSummaryList"]:
             if repo['repoKey'] == "TOTAL":
                 continue
@@ -58,56 +133,357 @@ class Artifactory:
 
         return repos
 
-    def purge(self, dry_run, artifacts):
+    # pylint: disable-msg=too-many-arguments
+    def purge(self, dry_run, artifacts, workers=1, batch_folders=False, sort=True, on_purged=None):
         """ Purge artifacts from the specified repo.
 
+        Lists are sorted by path in place unless ``sort`` is False. Any other iterable,
+        such as a generator returned by a policy or the pages of :meth:`iter_filter`,
+        is purged lazily in the order it is produced, with deletes starting while
+        the rest is still being discovered.
+
+        With ``batch_folders`` a folder is deleted with a single request when every
+        item in it is being purged, see :meth:`collapse_folders`. This needs the
+        whole list of artifacts up front.
+
         Args:
             dry_run (bool): Dry run mode True/False
-            artifacts (list): Artifacts.
+            artifacts (iterable): Artifacts.
+            workers (int): Number of concurrent delete workers. 1 deletes serially.
+            batch_folders (bool): Delete whole folders when all of their items are purged.
+            sort (bool): Purge lists in path order.
+            on_purged (func): Called with each artifact or folder once it is deleted.
 
         Returns:
             purged (int): Count purged.
         """
-        purged = 0
         mode = 'DRYRUN' if dry_run else 'LIVE'
         LOG.info('Running mode: %s', mode)
 
-        artifacts = sorted(artifacts, key=lambda k: k['path'])
-        for artifact in artifacts:
-            artifact_path = '{}/{}/{}'.format(self.repo_name, artifact['path'], artifact['name'])
-            LOG.info('%s purge %s', mode, artifact_path)
-            full_artifact_url = '{}/{}'.format(self.base_url, artifact_path)
-            if dry_run:
-                purged += 1
-            else:
-                try:
-                    self.artifactory.query_artifactory(full_artifact_url, query_type='delete')
-                    purged += 1
-                except (BaseHTTPError, HTTPError, InvalidURL, RequestException, ConnectionError) as error:
-                    LOG.error(str(error))
+        if batch_folders:
+            artifacts = self.collapse_folders(artifacts)
+        if sort and isinstance(artifacts, list):
+            artifacts.sort(key=lambda k: k['path'])
+        try:
+            with metrics.timer('purge', repo=self.repo_name):
+                if dry_run or workers <= 1:
+                    purged = self._purge_serially(artifacts, dry_run, on_purged=on_purged)
+                else:
+                    purged = self._purge_concurrently(artifacts, workers, on_purged=on_purged)
+            metrics.count('artifacts_purged', purged, repo=self.repo_name)
+            return purged
+        finally:
+            if self.cache and not dry_run:
+                self.cache.invalidate(self.repo_name)
+
+    def _purge_serially(self, artifacts, dry_run, on_purged=None):
+        """Purge artifacts one at a time.
+
+        Args:
+            artifacts (iterable): Artifacts.
+            dry_run (bool): Dry run mode True/False
+            on_purged (func): Called with each artifact once it is deleted.
+
+        Returns:
+            purged (int): Count purged.
+        """
+        totals = {'purged': 0, 'settled': 0}
+
+        def _settle():
+            removed = totals['purged'] - totals['settled']
+            totals['settled'] = totals['purged']
+            return removed
+
+        with self._reporting_removals(None if dry_run else _settle):
+            for artifact in artifacts:
+                totals['purged'] += self._purge_artifact(artifact, dry_run, on_purged=on_purged)
+        return totals['purged']
+
+    @contextlib.contextmanager
+    def _reporting_removals(self, settle):
+        """Lets :meth:`iter_filter` pages account for artifacts removed while iterating.
+
+        Args:
+            settle (func): Waits for pending deletes and returns the number of
+                artifacts removed since its last call. None when nothing is removed.
+        """
+        self._settle_removed = settle
+        try:
+            yield
+        finally:
+            self._settle_removed = None
+
+    def _purge_artifact(self, artifact, dry_run, on_purged=None):
+        """Purge a single artifact.
+
+        Args:
+            artifact (dict): Artifact to purge. Needs artifact['name'] and ['path'].
+            dry_run (bool): Dry run mode True/False
+            on_purged (func): Called with the artifact once it is deleted.
+
+        Returns:
+            int: Number of items purged, 0 on failure. Folders from :meth:`collapse_folders` count their contents.
+        """
+        artifact_log = current_artifact_log()
+        if artifact_log is None:
+            LOG.info('%s purge %s/%s/%s', 'DRYRUN' if dry_run else 'LIVE', self.repo_name, artifact['path'],
+                     artifact['name'])
+        purged = dry_run or self._delete(artifact)
+        if artifact_log is not None:
+            artifact_log.record('purge', self.repo_name, artifact, dry_run, ok=purged)
+        if not purged:
+            return 0
+        if on_purged and not dry_run:
+            on_purged(artifact)
+        return artifact.get('purge_count', 1)
+
+    def _delete(self, artifact):
+        """Sends the delete request of an artifact.
 
+        Returns:
+            bool: False if the request failed or Artifactory did not answer with a good status.
+        """
+        full_artifact_url = '{}/{}/{}/{}'.format(self.base_url, self.repo_name, artifact['path'], artifact['name'])
+        try:
+            response = self.artifactory.query_artifactory(full_artifact_url, query_type='delete')
+        except (BaseHTTPError, HTTPError, InvalidURL, RequestException, ConnectionError) as error:
+            LOG.error(str(error))
+            return False
+        if response is None:
+            LOG.error('Failed to purge %s/%s/%s', self.repo_name, artifact['path'], artifact['name'])
+            return False
+        return True
+
+    def _purge_concurrently(self, artifacts, workers, on_purged=None):
+        """Purge artifacts with a bounded pool of delete workers.
+
+        Artifacts are pulled in this thread and handed to the workers through a
+        bounded queue, so deletes start while artifacts are still being discovered
+        and only a bounded number of them are held at once.
+
+        Args:
+            artifacts (iterable): Artifacts.
+            workers (int): Number of concurrent delete workers.
+            on_purged (func): Called with each artifact once it is deleted, from the worker threads.
+
+        Returns:
+            purged (int): Count purged.
+        """
+        pending = queue.Queue(maxsize=workers * PURGE_QUEUE_PER_WORKER)
+        lock = threading.Lock()
+        worker_counts = collections.Counter()
+        totals = {'purged': 0, 'settled': 0}
+
+        def _worker():
+            name = threading.current_thread().name
+            with repo_context(self.repo_name):
+                for artifact in iter(pending.get, None):
+                    try:
+                        purged = self._purge_artifact(artifact, dry_run=False, on_purged=on_purged)
+                    except Exception:  # pylint: disable=broad-except
+                        LOG.exception('Failed to purge %s', artifact)
+                        purged = 0
+                    with lock:
+                        worker_counts[name] += purged
+                        totals['purged'] += purged
+                    pending.task_done()
+                pending.task_done()
+
+        def _settle():
+            pending.join()
+            with lock:
+                removed = totals['purged'] - totals['settled']
+                totals['settled'] = totals['purged']
+            return removed
+
+        threads = [
+            threading.Thread(target=_worker, name='purge_{}'.format(number), daemon=True)
+            for number in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        start = time.monotonic()
+        try:
+            with self._reporting_removals(_settle):
+                for artifact in artifacts:
+                    pending.put(artifact)
+        finally:
+            for _ in threads:
+                pending.put(None)
+            for thread in threads:
+                thread.join()
+        elapsed = time.monotonic() - start
+
+        purged = totals['purged']
+        for worker, count in sorted(worker_counts.items()):
+            LOG.info('Worker %s purged %d artifacts (%.1f/s)', worker, count, count / elapsed if elapsed else count)
+        LOG.info('Purged %d artifacts with %d workers in %.1fs', purged, workers, elapsed)
         return purged
 
-    def move_artifacts(self, artifacts=None, dest_repository=None):
+    def collapse_folders(self, artifacts):
+        """Replaces artifacts with their parent folder when every item in the folder is purgeable.
+
+        Children of the candidate folders are listed with batched AQL queries, and
+        collapsing repeats upwards so the highest fully purgeable folder is used.
+        Artifacts nested under another purgeable artifact are dropped. Collapsed folders
+        carry the number of artifacts they replace in ``purge_count``.
+
+        Args:
+            artifacts (iterable): Artifacts.
+
+        Returns:
+            list: Artifacts and folders to delete.
+        """
+        purgeable = {_artifact_key(artifact): artifact for artifact in artifacts}
+        total = len(purgeable)
+        counts = dict.fromkeys(purgeable, 1)
+
+        candidates = {_parent_key(key) for key in purgeable}
+        while candidates:
+            candidates.discard('')
+            collapsed = set()
+            for folder, children in self._folder_children(sorted(candidates)).items():
+                if not children or folder in purgeable or not children.issubset(purgeable):
+                    continue
+                path, _, name = folder.rpartition('/')
+                purgeable[folder] = {'repo': self.repo_name, 'path': path or '.', 'name': name, 'type': 'folder'}
+                counts[folder] = sum(counts.pop(child) for child in children)
+                for child in children:
+                    del purgeable[child]
+                collapsed.add(folder)
+            candidates = {_parent_key(folder) for folder in collapsed}
+
+        batched_counts = collections.OrderedDict()
+        for key in purgeable:
+            top = key
+            for ancestor in _ancestor_keys(key):
+                if ancestor in purgeable:
+                    top = ancestor
+            batched_counts[top] = batched_counts.get(top, 0) + counts[key]
+
+        batched = []
+        for key, count in batched_counts.items():
+            artifact = purgeable[key]
+            if count > 1:
+                artifact = dict(artifact, purge_count=count)
+            batched.append(artifact)
+        LOG.info("Batched %d artifacts into %d deletes", total, len(batched))
+        return batched
+
+    def _folder_children(self, folders):
+        """Lists the direct children of folders with batched AQL queries.
+
+        Never served from :attr:`cache`, a stale listing could delete a whole
+        folder that got new artifacts since.
+
+        Args:
+            folders (list): Folder keys as path/name.
+
+        Returns:
+            dict: Folder key mapped to the set of its children keys.
+        """
+        children = {folder: set() for folder in folders}
+        for start in range(0, len(folders), FOLDER_LOOKUP_CHUNK):
+            chunk = folders[start:start + FOLDER_LOOKUP_CHUNK]
+            terms = [{"$or": [{"path": {"$eq": folder}} for folder in chunk]}]
+            for child in self.filter(terms=terms, depth=None, item_type='any', cached=False):
+                children[child['path']].add(_artifact_key(child))
+        return children
+
+    # pylint: disable-msg=too-many-arguments
+    def move_artifacts(self, artifacts=None, dest_repository=None, dry_run=False, workers=1, batch_folders=False):
         """Moves a list of artifacts to dest_repository.
 
+        Artifacts inside another listed folder are skipped, they move with it. With
+        ``batch_folders`` whole folders are moved at once when all of their items are
+        listed, see :meth:`collapse_folders`.
+
         Args:
             artifacts (list): List of artifacts to move.
             dest_repository (str): The name of the destination repo.
+            dry_run (bool): Only log what would be moved.
+            workers (int): Number of concurrent move workers. 1 moves serially.
+            batch_folders (bool): Move whole folders when all of their items are moved.
+
+        Returns:
+            dict: Paths of the artifacts and folders ``moved``, ``failed`` and ``skipped``.
         """
-        base_endpoint = "move/{}".format(self.repo_name)
-        dest_prefix = "?to=/{}".format(dest_repository)
-        artifacts = sorted(artifacts, key=lambda k: k['path'])
-        for artifact in artifacts:
-            move_url = "{0}/{1}/{2}{3}/{1}/{2}".format(base_endpoint, artifact['path'], artifact['name'], dest_prefix)
-            LOG.info("Moving %s to repository %s", artifact['name'], dest_repository)
+        mode = 'DRYRUN' if dry_run else 'LIVE'
+        listed = {_artifact_key(artifact): artifact for artifact in artifacts}
+        results = {'moved': [], 'failed': [], 'skipped': []}
+
+        to_move = []
+        for key, artifact in listed.items():
+            if any(ancestor in listed for ancestor in _ancestor_keys(key)):
+                results['skipped'].append(key)
+            else:
+                to_move.append(artifact)
+        if batch_folders:
+            to_move = self.collapse_folders(to_move)
+
+        def _move(artifact):
+            with repo_context(self.repo_name):
+                return self._move_artifact(artifact, dest_repository, dry_run)
+
+        with metrics.timer('move', repo=self.repo_name):
+            if workers > 1:
+                with thread_pool(workers, thread_name_prefix='move') as executor:
+                    outcomes = list(executor.map(_move, to_move))
+            else:
+                outcomes = [_move(artifact) for artifact in to_move]
+
+        for artifact, moved in zip(to_move, outcomes):
+            results['moved' if moved else 'failed'].append(_artifact_key(artifact))
+        metrics.count('artifacts_moved', len(results['moved']), repo=self.repo_name)
+        if self.cache and not dry_run:
+            self.cache.invalidate(self.repo_name)
+            self.cache.invalidate(dest_repository)
+        LOG.info('%s moved %d, failed %d, skipped %d to repository %s', mode, len(results['moved']),
+                 len(results['failed']), len(results['skipped']), dest_repository)
+        return results
+
+    def _move_artifact(self, artifact, dest_repository, dry_run):
+        """Moves a single artifact or folder to dest_repository.
+
+        Args:
+            artifact (dict): Artifact to move. Needs artifact['name'] and ['path'].
+            dest_repository (str): The name of the destination repo.
+            dry_run (bool): Only log what would be moved.
+
+        Returns:
+            bool: True if the artifact was moved.
+        """
+        key = _artifact_key(artifact)
+        artifact_log = current_artifact_log()
+        if artifact_log is None:
+            LOG.info("%s move %s/%s to repository %s", 'DRYRUN' if dry_run else 'LIVE', self.repo_name, key,
+                     dest_repository)
+        moved = dry_run or self._move(key, dest_repository)
+        if artifact_log is not None:
+            artifact_log.record('move', self.repo_name, artifact, dry_run, ok=moved, dest=dest_repository)
+        return moved
+
+    def _move(self, key, dest_repository):
+        """Sends the move request of an artifact.
+
+        Returns:
+            bool: False if the request failed.
+        """
+        move_url = "move/{0}/{1}?to=/{2}/{1}".format(self.repo_name, key, dest_repository)
+        try:
             request = self.artifactory.post(move_url)
-            if not request.ok:
-                LOG.warning("error moving artifact %s: %s", artifact['name'], request.text)
+        except (BaseHTTPError, HTTPError, InvalidURL, RequestException, ConnectionError) as error:
+            LOG.warning("error moving artifact %s: %s", key, error)
+            return False
+        if request is None or not request.ok:
+            LOG.warning("error moving artifact %s: %s", key, request.text if request is not None else 'no response')
+            return False
         return True
 
     # pylint: disable-msg=too-many-arguments
-    def filter(self, terms=None, depth=3, sort=None, offset=0, limit=0, fields=None, item_type="folder"):
+    def filter(self, terms=None, depth=3, sort=None, offset=0, limit=0, fields=None, item_type="folder",
+               compact=False, cached=True):
         """Get a subset of artifacts from the specified repo.
         This looks at the project level, but actually need to iterate lower at project level
 
@@ -115,6 +491,11 @@ class Artifactory:
         will be called on a repo sufficiently frequently that removing just
         the default n items will be enough.
 
+        With :attr:`cache`, results of queries without a ``limit`` are served from
+        the local snapshot while it is fresh. Pages are always fetched, as their
+        offsets shift while artifacts are purged. Searches whose results decide
+        what gets deleted beyond what a policy listed pass ``cached=False``.
+
         Args:
             terms (list): an array of jql snippets that will be ANDed together
             depth (int, optional): how far down the folder hierarchy to look
@@ -123,10 +504,13 @@ class Artifactory:
             offset (int): how many items from the beginning of the list should be skipped (optional)
             limit (int): the maximum number of entries to return (optional)
             item_type (str): The item type to search for (file/folder/any).
+            compact (bool): Return :class:`ArtifactRecord` with only repo, path, name and type.
+            cached (bool): Use and update :attr:`cache`.
 
         Returns:
             list: List of artifacts returned from query
         """
+        cache = self.cache if cached and not limit else None
 
         if sort is None:
             sort = {}
@@ -140,75 +524,263 @@ class Artifactory:
         terms.append({"type": {"$eq": item_type}})
         if depth:
             terms.append({"depth": {"$eq": depth}})
+        if self.path_scope is not None:
+            terms.append(scope_term(self.path_scope))
 
         aql = {"$and": terms}
 
         LOG.debug("AQL: %s", aql)
-        response = self.artifactory.find_by_aql(
-            fields=fields, criteria=aql, order_and_fields=sort, offset_records=offset, num_records=limit)
+        query = {'aql': aql, 'fields': fields, 'sort': sort, 'offset': offset}
+        if cache:
+            results = cache.get(self.repo_name, query)
+            if results is not None:
+                metrics.count('aql_cache_hits', repo=self.repo_name)
+                return compact_records(results) if compact else results
+        with metrics.timer('aql', repo=self.repo_name):
+            response = self.artifactory.find_by_aql(
+                fields=fields, criteria=aql, order_and_fields=sort, offset_records=offset, num_records=limit)
 
         results = response['results']
+        metrics.count('aql_results', len(results), repo=self.repo_name)
+        if cache:
+            cache.put(self.repo_name, query, results)
+        if compact:
+            return compact_records(results)
 
         return results
 
+    # pylint: disable-msg=too-many-arguments
+    def iter_filter(self, terms=None, depth=3, sort=None, fields=None, item_type="folder",
+                    page_size=DEFAULT_PAGE_SIZE, compact=False):
+        """Lazily iterate a subset of artifacts from the specified repo, one page at a time.
+
+        Same query as :meth:`filter`, but results are requested ``page_size`` records
+        at a time with AQL offset/limit, so at most one page is held in memory.
+        Results are sorted by path and name unless ``sort`` is given, to keep pages stable.
+
+        Deleting yielded artifacts shifts the offset of later pages. While
+        :meth:`purge` of this client consumes the pages, directly or through other
+        generators, pending deletes are finished before the next page is fetched
+        and its offset accounts for the artifacts removed.
+
+        Args:
+            terms (list): an array of jql snippets that will be ANDed together
+            depth (int, optional): how far down the folder hierarchy to look
+            sort (dict): How to sort Artifactory results
+            fields (list): Fields
+            item_type (str): The item type to search for (file/folder/any).
+            page_size (int): Number of records requested per AQL query.
+            compact (bool): Yield :class:`ArtifactRecord` with only repo, path, name and type.
+
+        Yields:
+            dict: Artifacts returned from query
+        """
+        if sort is None:
+            sort = {"$asc": ["path", "name"]}
+        terms = terms or []
+
+        self._removed_while_paging()
+        offset = 0
+        while True:
+            page = self.filter(
+                terms=list(terms),
+                depth=depth,
+                sort=sort,
+                offset=offset,
+                limit=page_size,
+                fields=fields,
+                item_type=item_type,
+                compact=compact)
+            LOG.debug("Fetched %d artifacts at offset %d", len(page), offset)
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += len(page) - self._removed_while_paging()
+
+    def _removed_while_paging(self):
+        """Number of artifacts purged since the last call, 0 when not purging."""
+        settle = self._settle_removed
+        return settle() if settle else 0
+
     def get_artifact_properties(self, artifact):
         """Given an artifact, queries for properties from artifact URL
 
+        Properties already loaded by :meth:`get_artifacts_properties` are served from cache.
+
         Args:
             artifact (dict): Dictionary of artifact info. Needs artifact['name'] and ['path'].
 
         Returns:
             dict: Dictionary of all properties on specific artifact
         """
+        key = _artifact_key(artifact)
+        if key in self._property_cache:
+            return self._property_cache[key]
         artifact_url = "{0}/{1}/{2}/{3}".format(self.base_url, self.repo_name, artifact['path'], artifact['name'])
         LOG.debug("Getting properties for %s", artifact_url)
         self.artifactory.get_properties(artifact_url)
-        return self.artifactory.properties  # pylint: disable=no-member
+        self._property_cache[key] = self.artifactory.properties  # pylint: disable=no-member
+        return self._property_cache[key]
 
-    def get_all_repo_artifacts(self, depth=None, item_type='file', with_properties=True):
+    def get_artifacts_properties(self, artifacts, chunk_size=PROPERTY_LOOKUP_CHUNK):
+        """Loads properties of many artifacts with batched AQL queries.
+
+        Artifacts are grouped by path and looked up ``chunk_size`` at a time with
+        ``property.*`` included, instead of one properties request per artifact.
+        Results are cached for the lifetime of this client.
+
+        Args:
+            artifacts (iterable): Artifacts. Need artifact['name'] and ['path'].
+            chunk_size (int): Number of artifacts looked up per AQL query.
+
+        Returns:
+            dict: Properties of every artifact keyed by its path/name, in the same
+            format as :meth:`get_artifact_properties`.
+        """
+        keys = {_artifact_key(artifact): artifact for artifact in artifacts}
+        missing = [artifact for key, artifact in keys.items() if key not in self._property_cache]
+        missing.sort(key=lambda artifact: artifact['path'])
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            names_by_path = collections.OrderedDict()
+            for artifact in chunk:
+                names_by_path.setdefault(artifact['path'], []).append(artifact['name'])
+                self._property_cache[_artifact_key(artifact)] = {}
+            terms = [{
+                "$or": [{
+                    "$and": [{"path": {"$eq": path}}, {"$or": [{"name": {"$eq": name}} for name in names]}]
+                } for path, names in names_by_path.items()]
+            }]
+            LOG.debug("Loading properties of %d artifacts", len(chunk))
+            results = self.filter(
+                terms=terms, depth=None, item_type='any', fields=['repo', 'path', 'name', 'property.*'])
+            for result in results:
+                properties = collections.OrderedDict()
+                for prop in result.get('properties', []):
+                    properties.setdefault(prop['key'], []).append(prop.get('value', ''))
+                self._property_cache[_artifact_key(result)] = properties
+        return {key: self._property_cache[key] for key in keys}
+
+    def get_all_repo_artifacts(self, depth=None, item_type='file', with_properties=True, page_size=None):
         """returns all artifacts in a repo with metadata
 
         Args:
             depth (int): How far down Artifactory folder to look. None will go to bottom of folder.
             item_type (str): The item type to search for (file/folder/any).
             with_properties (bool): Include artifact properties or not.
+            page_size (int): If set, lazily page through artifacts with :meth:`iter_filter`.
 
         Returns:
-            list: List of all artifacts in a repository.
+            list: List of all artifacts in a repository, or a generator of them if paging.
         """
         LOG.info("Searching for all artifacts in %s.", self.repo_name)
         if with_properties:
             fields = ['stat', 'property.*']
         else:
             fields = []
+        if page_size:
+            return self.iter_filter(item_type=item_type, depth=depth, fields=fields, page_size=page_size)
         artifacts = self.filter(item_type=item_type, depth=depth, fields=fields)
         return artifacts
 
-    def time_based_retention(self, keep_days=None, time_field='created', item_type='file', extra_aql=None):
+    def artifact_table(self, depth=None, item_type='file', with_properties=False):
+        """Returns all artifacts in a repo as columns for vectorized retention rules.
+
+        Args:
+            depth (int): How far down Artifactory folder to look. None will go to bottom of folder.
+            item_type (str): The item type to search for (file/folder/any).
+            with_properties (bool): Include artifact properties or not.
+
+        Returns:
+            ArtifactTable: Artifacts of the repository, see :mod:`lavatory.utils.columnar`.
+        """
+        from .columnar import ArtifactTable  # pylint: disable=import-outside-toplevel
+        artifacts = self.filter(
+            item_type=item_type, depth=depth, fields=['stat', 'property.*'] if with_properties else ['stat'])
+        return ArtifactTable(artifacts)
+
+    # pylint: disable-msg=too-many-arguments
+    def time_based_retention(self, keep_days=None, time_field='created', item_type='file', extra_aql=None,
+                             page_size=None, compact=False, where=None, fields=None):
         """Retains artifacts based on number of days since creation.
 
             extra_aql example: [{"@deployed": {"$match": "dev"}}, {"@deployed": {"$nmatch": "prod"}}]
             This would search for artifacts that were created after <keep_days> with
             property "deployed" equal to dev and not equal to prod.
 
+        ``where`` takes conditions built with :mod:`lavatory.utils.aql` and adds them
+        to the same query, so downloads, sizes or properties are filtered by
+        Artifactory. Searches with ``where`` only return the repo, path, name and
+        type of each artifact unless ``fields`` asks for more, and need no
+        ``keep_days`` when ``where`` holds the age.
+
+        With :attr:`watermarks`, a search that ran before only looks for artifacts
+        that crossed the cutoff since then, or were created or modified since then,
+        with a safety margin of :data:`~.watermarks.SAFETY_MARGIN` for clock skew
+        and indexing lag. Searches with ``where`` always search everything, as
+        downloads, properties or a relative age can make an artifact match without
+        it being created or modified.
+
+        The cutoff is rounded down to the hour, so repeated searches send the same
+        query and can be served from :attr:`cache`.
+
         Args:
             keep_days (int): Number of days to keep an artifact.
             time_field (str): The field of time to look at (created, modified, stat.downloaded).
             item_type (str): The item type to search for (file/folder/any).
             extra_aql (list). List of extra AQL terms to apply to search
+            page_size (int): If set, lazily page through artifacts with :meth:`iter_filter`.
+            compact (bool): Return :class:`ArtifactRecord` with only repo, path, name and type.
+            where (Predicate): Further conditions, see :mod:`lavatory.utils.aql`.
+            fields (list): Fields to include in the results, all default fields without ``where``.
 
         Return:
-            list: List of artifacts matching retention policy
+            list: List of artifacts matching retention policy, or a generator of them if paging.
+
+        Raises:
+            LavatoryError: Neither ``keep_days`` nor ``where`` is given, which would match every artifact.
         """
+        if keep_days is None and where is None:
+            raise LavatoryError('time_based_retention needs keep_days or where, it would match every artifact')
         if extra_aql is None:
             extra_aql = []
-
-        now = datetime.datetime.now()
-        before = now - datetime.timedelta(days=keep_days)
-        created_before = before.strftime("%Y-%m-%dT%H:%M:%SZ")
-        aql_terms = [{time_field: {"$lt": created_before}}]
-        aql_terms.extend(extra_aql)
-        purgeable_artifacts = self.filter(item_type=item_type, depth=None, terms=aql_terms)
+        if where is not None:
+            extra_aql = extra_aql + where.terms()
+            fields = list(SEARCH_FIELDS) + [field for field in fields or [] if field not in SEARCH_FIELDS]
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        aql_terms = list(extra_aql)
+        search = None
+        if keep_days is not None:
+            before = (now - datetime.timedelta(days=keep_days)).replace(minute=0, second=0, microsecond=0)
+            aql_terms.insert(0, {time_field: {"$lt": before.strftime(AQL_TIME_FORMAT)}})
+        if self.watermarks and where is not None:
+            LOG.info("Searching all of %s, incremental searches do not support where", self.repo_name)
+        elif self.watermarks and keep_days is not None:
+            search = search_key(
+                'time_based_retention', keep_days=keep_days, time_field=time_field, item_type=item_type,
+                extra_aql=extra_aql)
+            previous = self.watermarks.get(self.repo_name, search)
+            if previous:
+                LOG.info("Searching for artifacts changed since %s in %s", previous['since'], self.repo_name)
+                aql_terms.append({
+                    "$or": [
+                        {time_field: {"$gte": previous['cutoff']}},
+                        {"created": {"$gte": previous['since']}},
+                        {"modified": {"$gte": previous['since']}},
+                    ]
+                })
+            self.watermarks.update(
+                self.repo_name,
+                search,
+                since=(now - SAFETY_MARGIN).strftime(AQL_TIME_FORMAT),
+                cutoff=(before - SAFETY_MARGIN).strftime(AQL_TIME_FORMAT))
+        if page_size:
+            pages = self.iter_filter(
+                item_type=item_type, depth=None, terms=aql_terms, fields=fields, page_size=page_size, compact=compact)
+            return pages
+        purgeable_artifacts = self.filter(
+            item_type=item_type, depth=None, terms=aql_terms, fields=fields, compact=compact)
         return purgeable_artifacts
 
     def count_based_retention(self,
@@ -216,27 +788,56 @@ class Artifactory:
                               project_depth=2,
                               artifact_depth=3,
                               item_type='folder',
-                              extra_aql=None):
+                              extra_aql=None,
+                              single_query=False,
+                              compact=False):
         """Return all artifacts except the <count> most recent.
 
+        With ``single_query`` all artifacts at ``artifact_depth`` are fetched in one
+        AQL query sorted by creation date and the most recent ``retention_count`` of
+        each project are kept locally, instead of one query per project. This only
+        applies when artifacts live directly under their project folder
+        (``artifact_depth == project_depth + 1``).
+
+        With :attr:`watermarks`, a search that ran before only looks at the projects
+        that got new artifacts since then, as no other project's result can change.
+
         Args:
             retention_count (int): Number of artifacts to keep.
             project_depth (int):  how far down the Artifactory folder hierarchy to look for projects.
             artifact_depth (int):  how far down the Artifactory folder hierarchy to look for specific artifacts.
             item_type (str): The item type to search for (file/folder/any).
             extra_aql (list). List of extra AQL terms to apply to search
+            single_query (bool): Fetch all projects' artifacts in one query.
+            compact (bool): Return :class:`ArtifactRecord` with only repo, path, name and type.
 
         Returns:
             list: List of all artifacts to delete.
         """
-        purgeable_artifacts = []
         LOG.info("Searching for purgable artifacts with count based retention in %s.", self.repo_name)
-        for project in self.filter(depth=project_depth):
-            LOG.debug("Processing artifacts for project %s", project)
-            if project['path'] == '.':
-                path = "{}".format(project["name"])
-            else:
-                path = "{}/{}".format(project["path"], project["name"])
+        projects = None
+        if self.watermarks:
+            projects = self._changed_projects(
+                search_key(
+                    'count_based_retention', retention_count=retention_count, project_depth=project_depth,
+                    artifact_depth=artifact_depth, item_type=item_type, extra_aql=extra_aql),
+                artifact_depth=artifact_depth,
+                item_type=item_type,
+                extra_aql=extra_aql)
+        if projects is None and single_query and artifact_depth == project_depth + 1:
+            purgeable_artifacts = self._grouped_count_based_retention(
+                retention_count=retention_count,
+                artifact_depth=artifact_depth,
+                item_type=item_type,
+                extra_aql=extra_aql,
+                compact=compact)
+            return purgeable_artifacts
+        if projects is None:
+            projects = (_artifact_key(project) for project in self.filter(depth=project_depth))
+
+        purgeable_artifacts = []
+        for path in projects:
+            LOG.debug("Processing artifacts for project %s", path)
             terms = [{"path": path}]
             if extra_aql:
                 terms += extra_aql
@@ -246,6 +847,85 @@ class Artifactory:
                     item_type=item_type,
                     depth=artifact_depth,
                     terms=terms,
-                    sort={"$desc": ["created"]}))
+                    sort={"$desc": ["created"]},
+                    compact=compact))
 
         return purgeable_artifacts
+
+    def _changed_projects(self, search, artifact_depth=3, item_type='folder', extra_aql=None):
+        """Projects that got new artifacts since the previous run of a count based search.
+
+        Args:
+            search (str): Key of the search, see :func:`search_key`.
+            artifact_depth (int):  how far down the Artifactory folder hierarchy to look for specific artifacts.
+            item_type (str): The item type to search for (file/folder/any).
+            extra_aql (list). List of extra AQL terms to apply to search
+
+        Returns:
+            list: Paths of the changed projects, None if the search did not run before.
+        """
+        previous = self.watermarks.get(self.repo_name, search)
+        since = datetime.datetime.now(datetime.timezone.utc) - SAFETY_MARGIN
+        self.watermarks.update(self.repo_name, search, since=since.strftime(AQL_TIME_FORMAT))
+        if not previous:
+            return None
+
+        terms = [{"created": {"$gte": previous['since']}}]
+        if extra_aql:
+            terms += extra_aql
+        changed = self.filter(item_type=item_type, depth=artifact_depth, terms=terms, fields=['path'], cached=False)
+        projects = sorted({artifact['path'] for artifact in changed})
+        LOG.info("%d projects changed since %s in %s", len(projects), previous['since'], self.repo_name)
+        return projects
+
+    def _grouped_count_based_retention(self, retention_count=None, artifact_depth=3, item_type='folder',
+                                       extra_aql=None, compact=False):
+        """Count based retention computed locally from a single AQL query.
+
+        Args:
+            retention_count (int): Number of artifacts to keep.
+            artifact_depth (int):  how far down the Artifactory folder hierarchy to look for specific artifacts.
+            item_type (str): The item type to search for (file/folder/any).
+            extra_aql (list). List of extra AQL terms to apply to search
+            compact (bool): Return :class:`ArtifactRecord` with only repo, path, name and type.
+
+        Returns:
+            list: List of all artifacts to delete.
+        """
+        terms = list(extra_aql) if extra_aql else []
+        artifacts = self.filter(
+            item_type=item_type, depth=artifact_depth, terms=terms, sort={"$desc": ["created"]}, compact=compact)
+
+        purgeable_artifacts = []
+        kept = collections.Counter()
+        for artifact in artifacts:
+            project = artifact['path']
+            # Projects under repodata are skipped by the per project lookup as well
+            if fnmatch.fnmatchcase(project.rpartition('/')[0], '*/repodata'):
+                continue
+            kept[project] += 1
+            if kept[project] > (retention_count or 0):
+                purgeable_artifacts.append(artifact)
+
+        LOG.debug("Processed artifacts for %d projects", len(kept))
+        return purgeable_artifacts
+
+
+def _artifact_key(artifact):
+    """Full path of an artifact inside its repository."""
+    if artifact['path'] == '.':
+        return artifact['name']
+    return '{}/{}'.format(artifact['path'], artifact['name'])
+
+
+def _parent_key(key):
+    """Full path of the folder containing ``key``, '' for the repository root."""
+    return key.rpartition('/')[0]
+
+
+def _ancestor_keys(key):
+    """Full paths of every folder containing ``key``."""
+    parent = _parent_key(key)
+    while parent:
+        yield parent
+        parent = _parent_key(parent)
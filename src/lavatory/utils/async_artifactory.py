@@ -0,0 +1,345 @@
+"""asyncio Artifactory client, for purging with many requests in flight from one thread.
+
+Needs ``aiohttp``, installed with ``pip install lavatory[async]``.
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import ssl
+import time
+
+import certifi
+from party.aql import Aql
+
+from ..consts import DEFAULT_ASYNC_REQUESTS
+from ..credentials import load_credentials
+from ..exceptions import LavatoryError
+from . import metrics
+from .artifact_log import current_artifact_log
+from .artifactory import _artifact_key
+from .throttle import DEFAULT_RETRIES, TokenBucket, backoff_delay, is_idempotent, should_retry
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+LOG = logging.getLogger(__name__)
+
+
+class ArtifactoryRequestError(LavatoryError):
+    """Artifactory answered a request with an error status"""
+
+    def __init__(self, method, url, status, body):
+        self.status = status
+        super().__init__('{} {} failed with status {}: {}'.format(method, url, status, body[:200]))
+
+
+class AsyncArtifactory:
+    """asyncio counterpart of :class:`Artifactory`.
+
+    Clients created with :meth:`for_repo` share one aiohttp connection pool and
+    one semaphore capping the requests in flight. Use it as an async context
+    manager so the pool is closed::
+
+        async with AsyncArtifactory(max_requests=500) as client:
+            await client.for_repo('yum-local').purge(False, artifacts)
+
+    Args:
+        repo_name (str): Name of the repository.
+        credentials (dict): Credentials, loaded from the environment if not given.
+        max_requests (int): Maximum requests in flight across every shared client.
+        retries (int): Times a throttled, unavailable or failed request is retried.
+        rate (float): Maximum requests per second across every shared client, None for unlimited.
+    """
+
+    def __init__(self, repo_name=None, credentials=None, max_requests=DEFAULT_ASYNC_REQUESTS,
+                 retries=DEFAULT_RETRIES, rate=None, _pool=None):  # pylint: disable=too-many-arguments
+        if aiohttp is None:
+            raise LavatoryError('AsyncArtifactory needs aiohttp, pip install lavatory[async]')
+        self.repo_name = repo_name
+        self.credentials = credentials or load_credentials()
+        self.max_requests = max_requests
+        self.retries = retries
+        self.rate = rate
+        self.base_url = self.credentials['artifactory_url']
+        if not self.base_url.endswith('/api'):
+            self.api_url = '/'.join([self.base_url, 'api'])
+        else:
+            self.api_url = self.base_url
+        self._pool = _pool if _pool is not None else {
+            'session': None, 'slots': None, 'bucket': TokenBucket(rate) if rate else None}
+        self._storage_info = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def for_repo(self, repo_name):
+        """Returns a client for another repository sharing this client's connections.
+
+        Args:
+            repo_name (str): Name of the repository.
+
+        Returns:
+            AsyncArtifactory: Client for ``repo_name``.
+        """
+        return AsyncArtifactory(repo_name=repo_name, credentials=self.credentials, max_requests=self.max_requests,
+                                retries=self.retries, rate=self.rate, _pool=self._pool)
+
+    def _session(self):
+        if self._pool['session'] is None:
+            cafile = os.getenv('LAVATORY_CERTBUNDLE_PATH', certifi.where())
+            connector = aiohttp.TCPConnector(limit=self.max_requests, ssl=ssl.create_default_context(cafile=cafile))
+            login = '{artifactory_username}:{artifactory_password}'.format(**self.credentials)
+            headers = {'Authorization': 'Basic {}'.format(base64.b64encode(login.encode('utf-8')).decode('ascii'))}
+            self._pool['session'] = aiohttp.ClientSession(connector=connector, headers=headers)
+            self._pool['slots'] = asyncio.Semaphore(self.max_requests)
+        return self._pool['session']
+
+    async def close(self):
+        """Closes the shared connection pool."""
+        if self._pool['session'] is not None:
+            await self._pool['session'].close()
+            self._pool['session'] = None
+
+    async def _request(self, method, url, **kwargs):
+        """Sends a request, retrying with backoff while it is throttled or fails to connect.
+
+        Returns:
+            tuple: Status code and body of the last response.
+        """
+        session = self._session()
+        idempotent = is_idempotent(method, url)
+        attempt = 0
+        while True:
+            await self._wait_for_rate_limit()
+            try:
+                async with self._pool['slots']:
+                    start = time.perf_counter()
+                    async with session.request(method, url, **kwargs) as response:
+                        status, body = response.status, await response.read()
+                        retry_after = response.headers.get('Retry-After')
+                    if metrics.current_metrics() is not None:
+                        metrics.observe('request_seconds', time.perf_counter() - start)
+                        metrics.count('requests_{}'.format(method.lower()))
+                        metrics.count('responses_{}xx'.format(status // 100))
+                        metrics.count('response_bytes', len(body))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                if attempt >= self.retries or not (idempotent or isinstance(error, aiohttp.ClientConnectorError)):
+                    raise
+                reason, retry_after = str(error) or type(error).__name__, None
+            else:
+                if attempt >= self.retries or not should_retry(status, retry_after, idempotent):
+                    return status, body
+                reason = 'status {}'.format(status)
+
+            delay = backoff_delay(attempt, retry_after=retry_after)
+            LOG.warning('Artifactory request failed with %s, retrying in %.1fs', reason, delay)
+            metrics.count('retries')
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _wait_for_rate_limit(self):
+        bucket = self._pool['bucket']
+        wait = bucket.take() if bucket else 0
+        while wait:
+            await asyncio.sleep(wait)
+            wait = bucket.take()
+
+    async def _json(self, method, path, **kwargs):
+        url = '/'.join([self.api_url, path])
+        status, body = await self._request(method, url, **kwargs)
+        if status >= 400:
+            raise ArtifactoryRequestError(method, url, status, body.decode('utf-8', 'replace'))
+        return json.loads(body.decode('utf-8'))
+
+    async def storage_info(self):
+        """Returns the ``storageinfo`` API response, fetched once per client.
+
+        Returns:
+            dict: Storage info data.
+        """
+        if self._storage_info is None:
+            with metrics.timer('storage_info'):
+                self._storage_info = await self._json('GET', 'storageinfo')
+        return self._storage_info
+
+    async def repos(self, repo_type='local'):
+        """Return a dictionary of repos with basic info about each.
+
+        Args:
+            repo_type (str): Type of repository to list. (local/virtual/cache/any)
+
+        Returns:
+            repos (dict): Dictionary of repos.
+        """
+        data = await self.storage_info()
+        return {
+            repo['repoKey']: repo
+            for repo in data["repositoriesSummaryList"]
+            if repo['repoKey'] != "TOTAL" and repo_type in (repo['repoType'].lower(), 'any')
+        }
+
+    async def filter(self, terms=None, depth=3, sort=None, offset=0, limit=0, fields=None, item_type="folder"):
+        """Get a subset of artifacts from the specified repo, see :meth:`Artifactory.filter`.
+
+        Args:
+            terms (list): an array of jql snippets that will be ANDed together
+            depth (int, optional): how far down the folder hierarchy to look
+            sort (dict): How to sort Artifactory results
+            offset (int): how many items from the beginning of the list should be skipped (optional)
+            limit (int): the maximum number of entries to return (optional)
+            fields (list): Fields
+            item_type (str): The item type to search for (file/folder/any).
+
+        Returns:
+            list: List of artifacts returned from query
+        """
+        terms = list(terms or [])
+        terms.append({"path": {"$nmatch": "*/repodata"}})
+        terms.append({"repo": {"$eq": self.repo_name}})
+        terms.append({"type": {"$eq": item_type}})
+        if depth:
+            terms.append({"depth": {"$eq": depth}})
+        aql = Aql(fields=fields or [], criteria={"$and": terms}, order_and_fields=sort or {}, offset_records=offset,
+                  num_records=limit)
+        LOG.debug("AQL: %s", aql.aql)
+        with metrics.timer('aql', repo=self.repo_name):
+            response = await self._json('POST', 'search/aql', data=aql.aql, headers={'Content-Type': 'text/plain'})
+        metrics.count('aql_results', len(response['results']), repo=self.repo_name)
+        return response['results']
+
+    async def get_artifact_properties(self, artifact):
+        """Given an artifact, queries for properties from artifact URL
+
+        Args:
+            artifact (dict): Dictionary of artifact info. Needs artifact['name'] and ['path'].
+
+        Returns:
+            dict: Dictionary of all properties on specific artifact
+        """
+        path = 'storage/{}/{}?properties'.format(self.repo_name, _artifact_key(artifact))
+        try:
+            response = await self._json('GET', path)
+        except ArtifactoryRequestError as error:
+            if error.status == 404:
+                return {}
+            raise
+        return response.get('properties', {})
+
+    async def purge(self, dry_run, artifacts, on_purged=None):
+        """Purge artifacts from the specified repo with up to ``max_requests`` deletes in flight.
+
+        Args:
+            dry_run (bool): Dry run mode True/False
+            artifacts (iterable): Artifacts.
+            on_purged (func): Called with each artifact or folder once it is deleted.
+
+        Returns:
+            purged (int): Count purged.
+        """
+        LOG.info('Running mode: %s', 'DRYRUN' if dry_run else 'LIVE')
+        with metrics.timer('purge', repo=self.repo_name):
+            counts = await self._for_each(artifacts,
+                                          lambda artifact: self._purge_artifact(artifact, dry_run, on_purged))
+        metrics.count('artifacts_purged', sum(counts), repo=self.repo_name)
+        return sum(counts)
+
+    async def _purge_artifact(self, artifact, dry_run, on_purged):
+        artifact_log = current_artifact_log()
+        if artifact_log is None:
+            LOG.info('%s purge %s/%s/%s', 'DRYRUN' if dry_run else 'LIVE', self.repo_name, artifact['path'],
+                     artifact['name'])
+        purged = dry_run or await self._delete(artifact)
+        if artifact_log is not None:
+            artifact_log.record('purge', self.repo_name, artifact, dry_run, ok=purged)
+        if not purged:
+            return 0
+        if on_purged and not dry_run:
+            on_purged(artifact)
+        return artifact.get('purge_count', 1)
+
+    async def _delete(self, artifact):
+        artifact_path = '{}/{}/{}'.format(self.repo_name, artifact['path'], artifact['name'])
+        url = '{}/{}'.format(self.base_url, artifact_path)
+        try:
+            status, body = await self._request('DELETE', url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            LOG.error('Failed to purge %s: %s', artifact_path, error)
+            return False
+        if status >= 400:
+            LOG.error('Failed to purge %s: status %d %s', artifact_path, status, body[:200])
+            return False
+        return True
+
+    async def move_artifacts(self, artifacts=None, dest_repository=None, dry_run=False):
+        """Moves a list of artifacts to dest_repository, see :meth:`Artifactory.move_artifacts`.
+
+        Args:
+            artifacts (list): List of artifacts to move.
+            dest_repository (str): The name of the destination repo.
+            dry_run (bool): Only log what would be moved.
+
+        Returns:
+            dict: Paths of the artifacts ``moved`` and ``failed``.
+        """
+        artifacts = list(artifacts)
+        outcomes = await self._for_each(artifacts,
+                                        lambda artifact: self._move_artifact(artifact, dest_repository, dry_run))
+        results = {'moved': [], 'failed': []}
+        for artifact, moved in zip(artifacts, outcomes):
+            results['moved' if moved else 'failed'].append(_artifact_key(artifact))
+        LOG.info('%s moved %d, failed %d to repository %s', 'DRYRUN' if dry_run else 'LIVE', len(results['moved']),
+                 len(results['failed']), dest_repository)
+        return results
+
+    async def _move_artifact(self, artifact, dest_repository, dry_run):
+        key = _artifact_key(artifact)
+        artifact_log = current_artifact_log()
+        if artifact_log is None:
+            LOG.info("%s move %s/%s to repository %s", 'DRYRUN' if dry_run else 'LIVE', self.repo_name, key,
+                     dest_repository)
+        moved = dry_run or await self._move(key, dest_repository)
+        if artifact_log is not None:
+            artifact_log.record('move', self.repo_name, artifact, dry_run, ok=moved, dest=dest_repository)
+        return moved
+
+    async def _move(self, key, dest_repository):
+        url = '{}/move/{}/{}?to=/{}/{}'.format(self.api_url, self.repo_name, key, dest_repository, key)
+        try:
+            status, body = await self._request('POST', url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            LOG.warning("error moving artifact %s: %s", key, error)
+            return False
+        if status >= 400:
+            LOG.warning("error moving artifact %s: %s", key, body[:200])
+            return False
+        return True
+
+    async def _for_each(self, artifacts, operation):
+        """Runs ``operation`` for every artifact, holding at most twice ``max_requests`` pending.
+
+        Returns:
+            list: Results in the order of ``artifacts``.
+        """
+        results = {}
+        pending = set()
+
+        async def _run(position, artifact):
+            results[position] = await operation(artifact)
+
+        for position, artifact in enumerate(artifacts):
+            if len(pending) >= 2 * self.max_requests:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            pending.add(asyncio.ensure_future(_run(position, artifact)))
+        if pending:
+            await asyncio.gather(*pending)
+        return [results[position] for position in range(len(results))]
+
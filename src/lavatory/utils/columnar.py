@@ -0,0 +1,191 @@
+"""Vectorized retention rules over artifacts held in columns.
+
+Needs ``numpy``, installed with ``pip install lavatory[columnar]``.
+"""
+import fnmatch
+import logging
+import time
+
+from ..exceptions import LavatoryError
+from .offline import parse_time
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+LOG = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+TIME_FIELDS = {
+    'created': 'created',
+    'modified': 'modified',
+    'updated': 'updated',
+    'stat.downloaded': 'downloaded',
+}
+
+
+class ArtifactTable:
+    """Artifacts as NumPy columns, with rules returning boolean masks.
+
+    Masks combine with ``&``, ``|`` and ``~`` and :meth:`select` turns them back
+    into artifacts that can be passed to :meth:`Artifactory.purge`::
+
+        table = artifactory.artifact_table()
+        return table.select(table.older_than(30) & ~table.newest_per_group(5))
+
+    Dates missing from an artifact are ``NaN``, so they never pass an age cutoff
+    and count as the oldest when ranking.
+
+    Args:
+        artifacts (iterable): Artifacts as returned by :meth:`Artifactory.filter`.
+    """
+
+    def __init__(self, artifacts):
+        if numpy is None:
+            raise LavatoryError('ArtifactTable needs numpy, pip install lavatory[columnar]')
+        self.artifacts = list(artifacts)
+        paths = [artifact['path'] for artifact in self.artifacts]
+        self.paths, self.path_ids = numpy.unique(numpy.array(paths, dtype=object), return_inverse=True)
+        self.path_ids = self.path_ids.reshape(-1)
+        depths = numpy.array([1 if path == '.' else path.count('/') + 2 for path in self.paths], dtype=numpy.int16)
+        self.depth = depths[self.path_ids]
+        self.size = numpy.array([artifact.get('size', 0) for artifact in self.artifacts], dtype=numpy.int64)
+        self._times = {}
+        LOG.debug('Loaded %d artifacts in %d folders', len(self.artifacts), len(self.paths))
+
+    def __len__(self):
+        return len(self.artifacts)
+
+    def times(self, field='created'):
+        """Seconds since the epoch of a date field.
+
+        Args:
+            field (str): created, modified, updated or stat.downloaded.
+
+        Returns:
+            numpy.ndarray: One float per artifact, NaN when missing.
+        """
+        if field not in TIME_FIELDS:
+            raise LavatoryError('Unknown time field {}'.format(field))
+        if field not in self._times:
+            parsed = {}
+            column = numpy.empty(len(self.artifacts), dtype=numpy.float64)
+            for position, artifact in enumerate(self.artifacts):
+                value = _time_value(artifact, TIME_FIELDS[field])
+                if value not in parsed:
+                    parsed[value] = numpy.nan if value is None else parse_time(value)
+                column[position] = parsed[value]
+            self._times[field] = column
+        return self._times[field]
+
+    def older_than(self, days, field='created', now=None):
+        """Artifacts whose date is more than ``days`` ago.
+
+        Args:
+            days (float): Age in days.
+            field (str): created, modified, updated or stat.downloaded.
+            now (float): Current time in seconds since the epoch.
+
+        Returns:
+            numpy.ndarray: Boolean mask.
+        """
+        cutoff = (time.time() if now is None else now) - days * SECONDS_PER_DAY
+        with numpy.errstate(invalid='ignore'):
+            return self.times(field) < cutoff
+
+    def not_downloaded_since(self, days, include_never=True, now=None):
+        """Artifacts not downloaded in the last ``days``.
+
+        Args:
+            days (float): Age in days.
+            include_never (bool): Include artifacts that were never downloaded.
+            now (float): Current time in seconds since the epoch.
+
+        Returns:
+            numpy.ndarray: Boolean mask.
+        """
+        mask = self.older_than(days, field='stat.downloaded', now=now)
+        if include_never:
+            mask |= numpy.isnan(self.times('stat.downloaded'))
+        return mask
+
+    def newest_per_group(self, count, field='created', group_depth=None):
+        """The ``count`` most recent artifacts of every group.
+
+        Args:
+            count (int): Number of artifacts to mark per group.
+            field (str): created, modified, updated or stat.downloaded.
+            group_depth (int): Groups by the first ``group_depth`` folders of the
+                path. By default artifacts are grouped by the folder holding them.
+
+        Returns:
+            numpy.ndarray: Boolean mask.
+        """
+        groups = self.group_ids(group_depth)
+        # lexsort uses the last key first, NaN dates sort last so they rank as oldest
+        order = numpy.lexsort((-self.times(field), groups))
+        sorted_groups = groups[order]
+        starts = numpy.flatnonzero(numpy.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        sizes = numpy.diff(numpy.r_[starts, len(order)])
+        rank = numpy.arange(len(order)) - numpy.repeat(starts, sizes)
+        mask = numpy.zeros(len(order), dtype=bool)
+        mask[order] = rank < count
+        return mask
+
+    def group_ids(self, group_depth=None):
+        """Group of every artifact.
+
+        Args:
+            group_depth (int): Groups by the first ``group_depth`` folders of the
+                path. By default artifacts are grouped by the folder holding them.
+
+        Returns:
+            numpy.ndarray: Integer group id per artifact.
+        """
+        if group_depth is None:
+            return self.path_ids
+        prefixes = numpy.array(['/'.join(path.split('/')[:group_depth]) for path in self.paths], dtype=object)
+        _, prefix_ids = numpy.unique(prefixes, return_inverse=True)
+        return prefix_ids.reshape(-1)[self.path_ids]
+
+    def path_matches(self, pattern):
+        """Artifacts whose path matches a wildcard pattern, checked once per folder.
+
+        Args:
+            pattern (str): Pattern with ``*`` and ``?`` wildcards.
+
+        Returns:
+            numpy.ndarray: Boolean mask.
+        """
+        matching = numpy.array([fnmatch.fnmatchcase(path, pattern) for path in self.paths], dtype=bool)
+        return matching[self.path_ids]
+
+    def larger_than(self, size):
+        """Artifacts bigger than ``size`` bytes.
+
+        Args:
+            size (int): Size in bytes.
+
+        Returns:
+            numpy.ndarray: Boolean mask.
+        """
+        return self.size > size
+
+    def select(self, mask):
+        """Artifacts selected by a mask, in their original order.
+
+        Args:
+            mask (numpy.ndarray): Boolean mask.
+
+        Returns:
+            list: Artifacts.
+        """
+        return [self.artifacts[position] for position in numpy.flatnonzero(mask)]
+
+
+def _time_value(artifact, field):
+    if field == 'downloaded':
+        stats = artifact.get('stats') or [{}]
+        return stats[0].get('downloaded')
+    return artifact.get(field)
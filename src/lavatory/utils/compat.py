@@ -0,0 +1,79 @@
+"""Fallbacks for standard library features added after Python 3.5."""
+import contextlib
+import datetime
+import queue
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+ASYNC_SUPPORTED = sys.version_info >= (3, 7)
+
+_ISO_DATE = re.compile(r'(\d{4}-\d\d-\d\d)(?:[T ](\d\d:\d\d(?::\d\d)?)(\.\d+)?)?([+-]\d\d:?\d\d)?$')
+
+if hasattr(contextlib, 'nullcontext'):
+    nullcontext = contextlib.nullcontext  # pylint: disable=invalid-name
+else:  # pragma: no cover, Python < 3.7
+
+    class nullcontext:  # pylint: disable=invalid-name
+        """Reusable context manager that does nothing, see :func:`contextlib.nullcontext`."""
+
+        def __init__(self, enter_result=None):
+            self.enter_result = enter_result
+
+        def __enter__(self):
+            return self.enter_result
+
+        def __exit__(self, *exc_info):
+            return None
+
+
+if hasattr(queue, 'SimpleQueue'):
+    SimpleQueue = queue.SimpleQueue  # pylint: disable=invalid-name
+else:  # pragma: no cover, Python < 3.7
+    SimpleQueue = queue.Queue  # pylint: disable=invalid-name
+
+if hasattr(datetime.datetime, 'fromisoformat'):
+    fromisoformat = datetime.datetime.fromisoformat  # pylint: disable=invalid-name
+else:  # pragma: no cover, Python < 3.7
+
+    def fromisoformat(value):
+        """Parses an ISO 8601 date, see :meth:`datetime.datetime.fromisoformat`.
+
+        Args:
+            value (str): Date such as ``2017-01-01T00:00:00.000+00:00``.
+
+        Returns:
+            datetime.datetime: The date, naive without an offset.
+
+        Raises:
+            ValueError: ``value`` is not an ISO 8601 date.
+        """
+        match = _ISO_DATE.match(value)
+        if not match:
+            raise ValueError('Invalid isoformat string: {!r}'.format(value))
+        day, time_of_day, fraction, offset = match.groups()
+        time_of_day = time_of_day or '00:00'
+        if time_of_day.count(':') == 1:
+            time_of_day += ':00'
+        moment = datetime.datetime.strptime('{}T{}'.format(day, time_of_day), '%Y-%m-%dT%H:%M:%S')
+        if fraction:
+            moment = moment.replace(microsecond=int(fraction[1:7].ljust(6, '0')))
+        if offset is None:
+            return moment
+        delta = datetime.timedelta(hours=int(offset[1:3]), minutes=int(offset[-2:]))
+        return moment.replace(tzinfo=datetime.timezone(-delta if offset[0] == '-' else delta))
+
+
+def thread_pool(max_workers, thread_name_prefix=''):
+    """Creates a :class:`ThreadPoolExecutor`, naming its threads from Python 3.6 on.
+
+    Args:
+        max_workers (int): Number of threads.
+        thread_name_prefix (str): Prefix of the names of the threads.
+
+    Returns:
+        ThreadPoolExecutor: The executor.
+    """
+    if sys.version_info < (3, 6):  # pragma: no cover
+        return ThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
@@ -14,8 +14,8 @@ def _artifactory(artifactory=None, repo_names=None):
     return artifactory
 
 
-def get_storage(repo_names=None, repo_type=None):
-    artifactory = _artifactory(repo_names=repo_names)
+def get_storage(repo_names=None, repo_type=None, artifactory=None):
+    artifactory = _artifactory(artifactory=artifactory, repo_names=repo_names)
     storage_info = []
     try:
         storage_info = artifactory.repos(repo_type=repo_type)
@@ -25,27 +25,28 @@ def get_storage(repo_names=None, repo_type=None):
     return storage_info
 
 
-def get_repos(repo_names=None, repo_type='local'):
+def get_repos(repo_names=None, repo_type='local', artifactory=None):
     repos = []
     if repo_names:
         repos = repo_names
     else:
-        repos = get_storage(repo_names=repo_names, repo_type=repo_type)
+        repos = get_storage(repo_names=repo_names, repo_type=repo_type, artifactory=artifactory)
     return repos
 
 
-def get_artifactory_info(repo_names=None, repo_type='local'):
+def get_artifactory_info(repo_names=None, repo_type='local', artifactory=None):
     """Get storage info from Artifactory.
 
     Args:
         repo_names (tuple, optional): Name of artifactory repo.
         repo_type (str): Type of artifactory repo.
+        artifactory (Artifactory, optional): Client to use, a new one is created if missing.
 
     Returns:
          keys (dict, optional): Dictionary of repo data.
          storage_info (dict): Storage information api call.
     """
-    artifactory = Artifactory(repo_name=repo_names)
+    artifactory = _artifactory(artifactory=artifactory, repo_names=repo_names)
     storage_info = artifactory.repos(repo_type=repo_type)
 
     if repo_names:
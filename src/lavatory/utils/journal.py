@@ -0,0 +1,174 @@
+"""Append-only journal of purge progress, used to resume interrupted runs.
+
+Each line is a compact JSON array whose first item is the record type:
+
+* ``["planned", repo, path, name]``: artifact the policy of ``repo`` listed for purging.
+* ``["listed", repo]``: the whole purge list of ``repo`` has been recorded.
+* ``["purged", repo, key]``: artifact or folder ``key`` was deleted.
+* ``["done", repo, count]``: ``repo`` finished purging ``count`` artifacts.
+
+Lines are flushed as they are written, so a journal cut off by a crash is still
+usable up to its last complete line.
+"""
+import collections
+import json
+import logging
+import os
+import threading
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = '.lavatory-purge.journal'
+
+
+class PurgeJournal:
+    """Records purge lists and completed deletes, and replays them on resume.
+
+    Args:
+        path (str): Path of the journal file.
+        resume (bool): Load the existing journal and append to it. Otherwise any
+            existing journal is truncated.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._planned = collections.defaultdict(dict)
+        self._listed = set()
+        self._purged = collections.defaultdict(set)
+        self._done = {}
+        if resume and os.path.exists(path):
+            self._load()
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')  # pylint: disable=consider-using-with
+
+    def _load(self):
+        """Replays the records of an existing journal."""
+        with open(self.path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    LOG.warning('Ignoring incomplete journal line in %s', self.path)
+                    continue
+                kind, repo = record[0], record[1]
+                if kind == 'planned':
+                    artifact = {'repo': repo, 'path': record[2], 'name': record[3]}
+                    self._planned[repo][_key(artifact)] = artifact
+                elif kind == 'listed':
+                    self._listed.add(repo)
+                elif kind == 'purged':
+                    self._purged[repo].add(record[2])
+                elif kind == 'done':
+                    self._done[repo] = record[2]
+        LOG.info('Resuming from %s: %d repositories done, %d deletes recorded', self.path, len(self._done),
+                 sum(len(keys) for keys in self._purged.values()))
+
+    def _write(self, *record):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        """Closes the journal file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def completed(self, repo):
+        """Count purged by a finished repository.
+
+        Args:
+            repo (str): Name of the repository.
+
+        Returns:
+            int: Count purged, None if the repository has not finished.
+        """
+        return self._done.get(repo)
+
+    def planned(self, repo):
+        """Artifacts still to purge from a previously recorded purge list.
+
+        Args:
+            repo (str): Name of the repository.
+
+        Returns:
+            list: Outstanding artifacts, None if no complete purge list was recorded.
+        """
+        if repo not in self._listed:
+            return None
+        return self.outstanding(repo, list(self._planned[repo].values()))
+
+    def outstanding(self, repo, artifacts):
+        """Drops artifacts that were already purged, directly or with their folder.
+
+        Args:
+            repo (str): Name of the repository.
+            artifacts (iterable): Artifacts.
+
+        Returns:
+            list: Artifacts not purged yet, or a generator when ``artifacts`` is not a list.
+        """
+        purged = self._purged.get(repo)
+        if not purged:
+            return artifacts
+        remaining = (artifact for artifact in artifacts if not _is_purged(artifact, purged))
+        return list(remaining) if isinstance(artifacts, list) else remaining
+
+    def record_plan(self, repo, artifacts):
+        """Records the purge list of a repository as it is consumed.
+
+        Args:
+            repo (str): Name of the repository.
+            artifacts (iterable): Artifacts listed by the policy.
+
+        Returns:
+            list: ``artifacts`` itself for lists, otherwise a generator recording each
+            artifact as it is produced.
+        """
+        if isinstance(artifacts, list):
+            for artifact in artifacts:
+                self._write('planned', repo, artifact['path'], artifact['name'])
+            self._write('listed', repo)
+            return artifacts
+        return self._recording(repo, artifacts)
+
+    def _recording(self, repo, artifacts):
+        for artifact in artifacts:
+            self._write('planned', repo, artifact['path'], artifact['name'])
+            yield artifact
+        self._write('listed', repo)
+
+    def record_purged(self, repo, artifact):
+        """Records a completed delete.
+
+        Args:
+            repo (str): Name of the repository.
+            artifact (dict): Artifact or folder deleted.
+        """
+        self._write('purged', repo, _key(artifact))
+
+    def record_done(self, repo, count):
+        """Records that a repository finished purging.
+
+        Args:
+            repo (str): Name of the repository.
+            count (int): Count purged.
+        """
+        self._write('done', repo, count)
+
+
+def _key(artifact):
+    if artifact['path'] == '.':
+        return artifact['name']
+    return '{}/{}'.format(artifact['path'], artifact['name'])
+
+
+def _is_purged(artifact, purged):
+    key = _key(artifact)
+    parts = key.split('/')
+    return any('/'.join(parts[:end]) in purged for end in range(1, len(parts) + 1))
@@ -0,0 +1,56 @@
+"""Per repository logging context."""
+import contextlib
+import logging
+import threading
+
+try:
+    import contextvars
+except ImportError:  # pragma: no cover, Python < 3.7
+    contextvars = None
+
+
+class _ThreadRepo(threading.local):
+    """Stand-in for the context variable before Python 3.7, where asyncio tasks share their thread's value."""
+
+    value = None
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        previous, self.value = self.value, value
+        return previous
+
+    def reset(self, token):
+        self.value = token
+
+
+_REPO = contextvars.ContextVar('lavatory_repo', default=None) if contextvars else _ThreadRepo()
+
+
+@contextlib.contextmanager
+def repo_context(repo_name):
+    """Tags log records emitted by the current thread or asyncio task with a repository name.
+
+    Args:
+        repo_name (str): Name of the repository being processed.
+    """
+    token = _REPO.set(repo_name)
+    try:
+        yield
+    finally:
+        _REPO.reset(token)
+
+
+def current_repo():
+    """Returns the repository name of the current logging context, if any."""
+    return _REPO.get()
+
+
+class RepoContextFilter(logging.Filter):
+    """Adds ``%(repo)s`` to log records, formatted as `` [repo-name]`` or empty."""
+
+    def filter(self, record):
+        repo = current_repo()
+        record.repo = ' [{}]'.format(repo) if repo else ''
+        return True
@@ -0,0 +1,291 @@
+"""Per phase timers and counters of a run.
+
+Instrumentation is off unless :func:`enable_metrics` was called. While it is
+off, :func:`timer` returns a shared no-op context manager and the other helpers
+return at once, so instrumented code costs one global lookup.
+"""
+import bisect
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from .compat import nullcontext
+from .log_context import current_repo
+
+LOG = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOTAL = ''
+
+_METRICS = None
+_DISABLED = nullcontext()
+
+
+class Metrics:
+    """Timers, counters and latency histograms, each kept per repository.
+
+    Values recorded outside of a repository's :func:`~.log_context.repo_context`
+    are kept under the empty repository name. Run totals add up every repository.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def merge(self, other):
+        """Adds the values of another run, such as one of the processes of a sharded purge.
+
+        Args:
+            other (Metrics): Metrics to add.
+        """
+        with self._lock:
+            for key, timing in other._phases.items():  # pylint: disable=protected-access
+                merged = self._phases.setdefault(key, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+                merged['count'] += timing['count']
+                merged['seconds'] += timing['seconds']
+                merged['max_seconds'] = max(merged['max_seconds'], timing['max_seconds'])
+            for key, value in other._counters.items():  # pylint: disable=protected-access
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, histogram in other._histograms.items():  # pylint: disable=protected-access
+                merged = self._histograms.setdefault(
+                    key, {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'count': 0, 'seconds': 0.0})
+                merged['buckets'] = [mine + theirs for mine, theirs in zip(merged['buckets'], histogram['buckets'])]
+                merged['count'] += histogram['count']
+                merged['seconds'] += histogram['seconds']
+
+    def add_time(self, phase, seconds, repo=None):
+        """Records one run of a phase.
+
+        Args:
+            phase (str): Name of the phase, such as ``aql`` or ``purge``.
+            seconds (float): Time the phase took.
+            repo (str): Repository, the current logging context by default.
+        """
+        with self._lock:
+            timing = self._phases.setdefault(_key(phase, repo), {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            timing['count'] += 1
+            timing['seconds'] += seconds
+            timing['max_seconds'] = max(timing['max_seconds'], seconds)
+
+    def count(self, name, value=1, repo=None):
+        """Adds to a counter.
+
+        Args:
+            name (str): Name of the counter.
+            value (int): Amount to add.
+            repo (str): Repository, the current logging context by default.
+        """
+        key = _key(name, repo)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, repo=None):
+        """Adds a latency to a histogram with :data:`LATENCY_BUCKETS`.
+
+        Args:
+            name (str): Name of the histogram.
+            seconds (float): Observed latency.
+            repo (str): Repository, the current logging context by default.
+        """
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        key = _key(name, repo)
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                key, {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'count': 0, 'seconds': 0.0})
+            histogram['buckets'][bucket] += 1
+            histogram['count'] += 1
+            histogram['seconds'] += seconds
+
+    def summary(self):
+        """Everything recorded, by repository.
+
+        Returns:
+            dict: ``total`` and ``repositories``, each with ``phases``, ``counters``
+            and ``histograms``, plus ``artifacts_per_second`` of the purge phase.
+        """
+        with self._lock:
+            repos = {repo for _, repo in self._phases}
+            repos.update(repo for _, repo in self._counters)
+            repos.update(repo for _, repo in self._histograms)
+            by_repo = {repo: self._repo_summary(repo) for repo in sorted(repos - {TOTAL})}
+            total = self._repo_summary(None)
+        return {
+            'started': self.started,
+            'seconds': round(time.time() - self.started, 6),
+            'total': total,
+            'repositories': by_repo,
+        }
+
+    def _repo_summary(self, repo):
+        """Summary of one repository, or of all of them when ``repo`` is None."""
+        phases, counters, histograms = {}, {}, {}
+        for (name, key), timing in sorted(self._phases.items()):
+            if repo in (None, key):
+                merged = phases.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+                merged['count'] += timing['count']
+                merged['seconds'] += timing['seconds']
+                merged['max_seconds'] = max(merged['max_seconds'], timing['max_seconds'])
+        for (name, key), value in sorted(self._counters.items()):
+            if repo in (None, key):
+                counters[name] = counters.get(name, 0) + value
+        for (name, key), histogram in sorted(self._histograms.items()):
+            if repo in (None, key):
+                merged = histograms.setdefault(name, {'count': 0, 'seconds': 0.0, 'buckets': {}})
+                merged['count'] += histogram['count']
+                merged['seconds'] += histogram['seconds']
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf', ), histogram['buckets']):
+                    cumulative += count
+                    merged['buckets'][str(bound)] = merged['buckets'].get(str(bound), 0) + cumulative
+        summary = {'phases': phases, 'counters': counters, 'histograms': histograms}
+        purge_seconds = phases.get('purge', {}).get('seconds')
+        if purge_seconds:
+            summary['artifacts_per_second'] = round(counters.get('artifacts_purged', 0) / purge_seconds, 2)
+        return summary
+
+    def write_json(self, path):
+        """Writes :meth:`summary` to a JSON file."""
+        _write_atomically(path, json.dumps(self.summary(), indent=2))
+
+    def write_prometheus(self, path):
+        """Writes the metrics in the Prometheus text format, for the node exporter's textfile collector.
+
+        Series are labelled by repository, those without a ``repo`` label hold
+        what was recorded outside of a repository.
+        """
+        lines = []
+        with self._lock:
+            for (phase, repo), timing in sorted(self._phases.items()):
+                labels = _labels(phase=phase, repo=repo)
+                lines.append('lavatory_phase_seconds_total{} {}'.format(labels, timing['seconds']))
+                lines.append('lavatory_phase_runs_total{} {}'.format(labels, timing['count']))
+            for (name, repo), value in sorted(self._counters.items()):
+                lines.append('lavatory_{}_total{} {}'.format(name, _labels(repo=repo), value))
+            for (name, repo), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ('+Inf', ), histogram['buckets']):
+                    cumulative += count
+                    lines.append('lavatory_{}_bucket{} {}'.format(name, _labels(repo=repo, le=bound), cumulative))
+                lines.append('lavatory_{}_sum{} {}'.format(name, _labels(repo=repo), histogram['seconds']))
+                lines.append('lavatory_{}_count{} {}'.format(name, _labels(repo=repo), histogram['count']))
+        lines.append('lavatory_last_run_timestamp_seconds {}'.format(self.started))
+        _write_atomically(path, '\n'.join(lines) + '\n')
+
+    def send_statsd(self, address, prefix='lavatory'):
+        """Sends the run totals to StatsD over UDP, timers in milliseconds.
+
+        Args:
+            address (str): ``host:port`` of the StatsD server.
+            prefix (str): Prefix of every metric name.
+        """
+        host, _, port = address.rpartition(':')
+        summary = self.summary()['total']
+        packets = ['{}.phase.{}:{:.3f}|ms'.format(prefix, phase, timing['seconds'] * 1000)
+                   for phase, timing in summary['phases'].items()]
+        packets.extend('{}.{}:{}|c'.format(prefix, name, value) for name, value in summary['counters'].items())
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as connection:
+            for packet in packets:
+                connection.sendto(packet.encode('utf-8'), (host or 'localhost', int(port)))
+        LOG.debug('Sent %d metrics to StatsD at %s', len(packets), address)
+
+
+class _Timer:
+    """Context manager adding the time spent in its block to a phase."""
+
+    __slots__ = ('metrics', 'phase', 'repo', 'start')
+
+    def __init__(self, metrics, phase, repo):
+        self.metrics = metrics
+        self.phase = phase
+        self.repo = repo
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.phase, time.perf_counter() - self.start, repo=self.repo)
+
+
+def enable_metrics():
+    """Starts recording metrics for the rest of the process.
+
+    Returns:
+        Metrics: The new metrics.
+    """
+    global _METRICS  # pylint: disable=global-statement
+    _METRICS = Metrics()
+    return _METRICS
+
+
+def disable_metrics():
+    """Stops recording metrics."""
+    global _METRICS  # pylint: disable=global-statement
+    _METRICS = None
+
+
+def current_metrics():
+    """Metrics being recorded, None while disabled."""
+    return _METRICS
+
+
+def timer(phase, repo=None):
+    """Times a block as one run of ``phase``::
+
+        with timer('aql'):
+            response = artifactory.find_by_aql(...)
+
+    Args:
+        phase (str): Name of the phase.
+        repo (str): Repository, the current logging context by default.
+    """
+    if _METRICS is None:
+        return _DISABLED
+    return _Timer(_METRICS, phase, repo)
+
+
+def count(name, value=1, repo=None):
+    """Adds to a counter while metrics are enabled, see :meth:`Metrics.count`."""
+    if _METRICS is not None:
+        _METRICS.count(name, value, repo=repo)
+
+
+def observe(name, seconds, repo=None):
+    """Adds a latency while metrics are enabled, see :meth:`Metrics.observe`."""
+    if _METRICS is not None:
+        _METRICS.observe(name, seconds, repo=repo)
+
+
+def _key(name, repo):
+    if repo is None:
+        repo = current_repo() or TOTAL
+    return name, repo
+
+
+def _labels(**labels):
+    pairs = ['{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+             for key, value in labels.items() if value != TOTAL]
+    return '{{{}}}'.format(','.join(pairs)) if pairs else ''
+
+
+def _write_atomically(path, text):
+    temporary = '{}.tmp'.format(path)
+    with open(temporary, 'w', encoding='utf-8') as output:
+        output.write(text)
+    os.replace(temporary, path)
@@ -0,0 +1,445 @@
+"""Evaluates policies against exported repository metadata instead of a live Artifactory."""
+import bisect
+import collections
+import datetime
+import fnmatch
+import functools
+import json
+import logging
+import re
+
+from humanfriendly import format_size
+
+from ..exceptions import LavatoryError
+from .artifactory import Artifactory, _artifact_key
+from .compat import fromisoformat
+from .records import compact as compact_records
+from .sharding import scope_term
+
+LOG = logging.getLogger(__name__)
+
+DATE_FIELDS = ('created', 'modified', 'updated', 'stat.downloaded')
+INDEXED_FIELDS = ('repo', 'type', 'depth', 'path')
+OFFLINE_CREDENTIALS = {'artifactory_url': 'offline', 'artifactory_username': 'offline', 'artifactory_password': ''}
+RANGE_OPERATORS = ('$lt', '$lte', '$gt', '$gte')
+RELATIVE_TIME = re.compile(r'^(\d+)\s*(mo|ms|minutes|y|w|d|s)$')
+RELATIVE_UNITS = {
+    'y': datetime.timedelta(days=365),
+    'mo': datetime.timedelta(days=30),
+    'w': datetime.timedelta(weeks=1),
+    'd': datetime.timedelta(days=1),
+    'minutes': datetime.timedelta(minutes=1),
+    's': datetime.timedelta(seconds=1),
+    'ms': datetime.timedelta(milliseconds=1),
+}
+
+
+class OfflineQueryError(LavatoryError):
+    """AQL criteria that cannot be evaluated offline"""
+
+
+def load_export(path):
+    """Loads artifact records from an AQL export.
+
+    JSON files may hold an AQL response, ``{"results": [...]}``, or a list of
+    records. Parquet files need ``pyarrow``. Any other file is read as JSON lines,
+    one record per line.
+
+    Args:
+        path (str): Path of the export.
+
+    Returns:
+        list: Artifact records.
+    """
+    if path.endswith('.parquet'):
+        try:
+            from pyarrow import parquet  # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise LavatoryError('Reading {} needs pyarrow, pip install lavatory[parquet]'.format(path)) from error
+        return parquet.read_table(path).to_pylist()
+
+    with open(path, encoding='utf-8') as export:
+        if path.endswith('.json'):
+            data = json.load(export)
+            return data['results'] if isinstance(data, dict) else data
+        return [json.loads(line) for line in export if line.strip()]
+
+
+class ArtifactIndex:
+    """In-memory artifact records indexed for AQL criteria.
+
+    Equality terms on repo, type, depth and path and range terms on dates narrow
+    the candidates through indexes before the remaining terms are checked.
+
+    Args:
+        records (list): Artifact records as returned by AQL.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self._depths = [_depth(record) for record in records]
+        self._indexes = {field: collections.defaultdict(list) for field in INDEXED_FIELDS}
+        for record_id, record in enumerate(records):
+            for field in INDEXED_FIELDS:
+                self._indexes[field][self._value(record_id, field)].append(record_id)
+        self._times = {}
+        self._sorted_times = {}
+        self._properties = {}
+        LOG.info('Indexed %d artifacts', len(records))
+
+    def repos(self):
+        """Names of the repositories in the records.
+
+        Returns:
+            list: Repository names.
+        """
+        return sorted(self._indexes['repo'])
+
+    def properties(self, record_id):
+        """Properties of a record.
+
+        Args:
+            record_id (int): Position of the record.
+
+        Returns:
+            dict: Property values keyed by property name.
+        """
+        if record_id not in self._properties:
+            self._properties[record_id] = _properties(self.records[record_id])
+        return self._properties[record_id]
+
+    def find(self, repo, key):
+        """Position of an artifact.
+
+        Args:
+            repo (str): Name of the repository.
+            key (str): Path of the artifact inside the repository.
+
+        Returns:
+            int: Position of the record, None if it is not in the index.
+        """
+        path, _, name = key.rpartition('/')
+        for record_id in self._indexes['path'].get(path or '.', ()):
+            record = self.records[record_id]
+            if record['name'] == name and record.get('repo') == repo:
+                return record_id
+        return None
+
+    def search(self, criteria, sort=None):
+        """Records matching AQL criteria.
+
+        Args:
+            criteria (dict): AQL criteria, as passed to ``find_by_aql``.
+            sort (dict): ``{"$asc": [fields]}`` or ``{"$desc": [fields]}``.
+
+        Returns:
+            list: Positions of the matching records.
+        """
+        terms = criteria.get('$and', [criteria]) if len(criteria) == 1 else [criteria]
+        record_ids, remaining = self._candidates(terms)
+        matching = [record_id for record_id in record_ids if all(self._matches(record_id, term) for term in remaining)]
+        if sort:
+            for direction in ('$asc', '$desc'):
+                if direction in sort:
+                    matching.sort(key=lambda record_id: self._sort_key(record_id, sort[direction]),
+                                  reverse=direction == '$desc')
+        return matching
+
+    def _candidates(self, terms):
+        """Narrows the records through the indexes.
+
+        Returns:
+            tuple: Candidate record positions, and the terms the indexes did not answer.
+        """
+        candidates = []
+        remaining = []
+        for term in terms:
+            field, condition = next(iter(term.items())) if len(term) == 1 else (None, None)
+            if field in INDEXED_FIELDS:
+                candidates.append(self._indexed_matches(field, condition))
+                continue
+            if field in DATE_FIELDS and isinstance(condition, dict) and set(condition) <= set(RANGE_OPERATORS):
+                candidates.append(self._date_range(field, condition))
+                continue
+            remaining.append(term)
+        if not candidates:
+            return range(len(self.records)), remaining
+        if len(candidates) == 1:
+            return candidates[0], remaining
+        candidates.sort(key=len)
+        selected = set(candidates[0])
+        for ids in candidates[1:]:
+            selected.intersection_update(ids)
+        return sorted(selected), remaining
+
+    def _indexed_matches(self, field, condition):
+        """Records whose indexed field meets the condition, checking each distinct value once."""
+        index = self._indexes[field]
+        if not isinstance(condition, dict):
+            return index.get(condition, [])
+        if list(condition) == ['$eq']:
+            return index.get(condition['$eq'], [])
+        matching = []
+        for value, record_ids in index.items():
+            if self._matches_values([] if value is None else [value], condition):
+                matching.extend(record_ids)
+        return sorted(matching)
+
+    def _date_range(self, field, condition):
+        times, record_ids = self._sorted_time_index(field)
+        low, high = 0, len(times)
+        for operator, value in condition.items():
+            moment = parse_time(value)
+            if operator == '$lt':
+                high = min(high, bisect.bisect_left(times, moment))
+            elif operator == '$lte':
+                high = min(high, bisect.bisect_right(times, moment))
+            elif operator == '$gt':
+                low = max(low, bisect.bisect_right(times, moment))
+            else:
+                low = max(low, bisect.bisect_left(times, moment))
+        return sorted(record_ids[low:high])
+
+    def _sorted_time_index(self, field):
+        if field not in self._sorted_times:
+            pairs = sorted((moment, record_id) for record_id, moment in enumerate(self._time_column(field))
+                           if moment is not None)
+            self._sorted_times[field] = ([moment for moment, _ in pairs], [record_id for _, record_id in pairs])
+        return self._sorted_times[field]
+
+    def _time_column(self, field):
+        if field not in self._times:
+            self._times[field] = [parse_time(_raw_value(record, field)) for record in self.records]
+        return self._times[field]
+
+    def _value(self, record_id, field):
+        if field == 'depth':
+            return self._depths[record_id]
+        if field in DATE_FIELDS:
+            return self._time_column(field)[record_id]
+        return _raw_value(self.records[record_id], field)
+
+    def _sort_key(self, record_id, fields):
+        values = (self._value(record_id, field) for field in fields)
+        return tuple((value is None, value if value is not None else 0) for value in values)
+
+    def _matches(self, record_id, term):
+        for field, condition in term.items():
+            if field == '$and':
+                matched = all(self._matches(record_id, nested) for nested in condition)
+            elif field == '$or':
+                matched = any(self._matches(record_id, nested) for nested in condition)
+            elif field.startswith('@'):
+                matched = self._matches_values(self.properties(record_id).get(field[1:], []), condition)
+            else:
+                value = self._value(record_id, field)
+                matched = self._matches_values([] if value is None else [value], condition, date=field in DATE_FIELDS)
+            if not matched:
+                return False
+        return True
+
+    @staticmethod
+    def _matches_values(values, condition, date=False):
+        """Whether any of the values of a field meets the condition, none for negated operators."""
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for operator, expected in condition.items():
+            if expected is None and operator in ('$eq', '$ne'):
+                # null stands for a missing field, such as stat.downloads of files never downloaded
+                if bool(values) != (operator == '$ne'):
+                    return False
+            elif operator in ('$ne', '$nmatch'):
+                positive = '$eq' if operator == '$ne' else '$match'
+                if any(_compare(value, positive, expected, date) for value in values):
+                    return False
+            elif not any(_compare(value, operator, expected, date) for value in values):
+                return False
+        return True
+
+
+class OfflineParty:
+    """Transport of offline clients, every request to Artifactory is an error."""
+
+    def __getattr__(self, name):
+        raise OfflineQueryError('{} needs a live Artifactory'.format(name))
+
+
+class OfflineArtifactory(Artifactory):
+    """Artifactory client answering searches from an :class:`ArtifactIndex`.
+
+    Policies get the same helpers as with a live client. Nothing is deleted or
+    moved, purges and moves always run as a dry run.
+
+    Args:
+        index (ArtifactIndex): Exported artifacts.
+        repo_name (str): Name of the repository.
+    """
+
+    transport_class = OfflineParty
+
+    def __init__(self, index, repo_name=None):
+        super().__init__(repo_name=repo_name, credentials=OFFLINE_CREDENTIALS)
+        self.index = index
+
+    @classmethod
+    def from_export(cls, path, repo_name=None):
+        """Creates a client from an AQL export, see :func:`load_export`.
+
+        Args:
+            path (str): Path of the export.
+            repo_name (str): Name of the repository.
+
+        Returns:
+            OfflineArtifactory: Client over the exported artifacts.
+        """
+        return cls(ArtifactIndex(load_export(path)), repo_name=repo_name)
+
+    def for_repo(self, repo_name):
+        return OfflineArtifactory(self.index, repo_name=repo_name)
+
+    def storage_info(self):
+        """Summary of the exported repositories in the format of the ``storageinfo`` API.
+
+        Returns:
+            dict: Storage info data.
+        """
+        if self._storage_info is None:
+            summaries = []
+            for repo in self.index.repos():
+                records = [self.index.records[record_id] for record_id in self.index.search({'repo': repo})]
+                files = sum(1 for record in records if record.get('type') == 'file')
+                summaries.append({
+                    'repoKey': repo,
+                    'repoType': 'LOCAL',
+                    'packageType': 'Offline',
+                    'filesCount': files,
+                    'foldersCount': len(records) - files,
+                    'itemsCount': len(records),
+                    'usedSpace': format_size(sum(record.get('size', 0) for record in records)),
+                    'percentage': 'N/A',
+                })
+            self._storage_info = {'repositoriesSummaryList': summaries}
+        return self._storage_info
+
+    def purge(self, dry_run, artifacts, workers=1, batch_folders=False, sort=True, on_purged=None):
+        if not dry_run:
+            LOG.warning('Offline evaluation does not delete artifacts, running as dry run')
+        return super().purge(True, artifacts, workers=workers, batch_folders=batch_folders, sort=sort)
+
+    def move_artifacts(self, artifacts=None, dest_repository=None, dry_run=False, workers=1, batch_folders=False):
+        if not dry_run:
+            LOG.warning('Offline evaluation does not move artifacts, running as dry run')
+        return super().move_artifacts(
+            artifacts, dest_repository=dest_repository, dry_run=True, workers=workers, batch_folders=batch_folders)
+
+    def filter(self, terms=None, depth=3, sort=None, offset=0, limit=0, fields=None, item_type="folder",
+               compact=False, cached=True):
+        terms = list(terms or [])
+        terms.append({"path": {"$nmatch": "*/repodata"}})
+        terms.append({"repo": {"$eq": self.repo_name}})
+        if item_type != 'any':
+            # Artifactory matches every item type for "any"
+            terms.append({"type": {"$eq": item_type}})
+        if depth:
+            terms.append({"depth": {"$eq": depth}})
+        if self.path_scope is not None:
+            terms.append(scope_term(self.path_scope))
+        LOG.debug("Offline AQL: %s", terms)
+
+        record_ids = self.index.search({"$and": terms}, sort=sort)
+        record_ids = record_ids[offset:offset + limit] if limit else record_ids[offset:]
+        results = [self.index.records[record_id] for record_id in record_ids]
+        return compact_records(results) if compact else results
+
+    def get_artifact_properties(self, artifact):
+        record_id = self.index.find(self.repo_name, _artifact_key(artifact))
+        if record_id is None:
+            return {}
+        return self.index.properties(record_id)
+
+    def get_artifacts_properties(self, artifacts, chunk_size=None):
+        return {_artifact_key(artifact): self.get_artifact_properties(artifact) for artifact in artifacts}
+
+
+def _depth(record):
+    """Depth of an artifact as AQL counts it, 1 for items at the repository root."""
+    if 'depth' in record:
+        return record['depth']
+    path = record.get('path', '.')
+    return 1 if path == '.' else path.count('/') + 2
+
+
+def _raw_value(record, field):
+    if field.startswith('stat.'):
+        stats = record.get('stats') or [{}]
+        return stats[0].get(field[len('stat.'):])
+    return record.get(field)
+
+
+def _properties(record):
+    """Properties of a record as ``{key: [values]}``, from AQL or property API formats."""
+    raw = record.get('properties') or []
+    if isinstance(raw, dict):
+        return {key: value if isinstance(value, list) else [value] for key, value in raw.items()}
+    properties = collections.defaultdict(list)
+    for prop in raw:
+        properties[prop['key']].append(prop.get('value', ''))
+    return dict(properties)
+
+
+def parse_time(value):
+    """Seconds since the epoch of an AQL date, naive dates are taken as UTC.
+
+    Args:
+        value (str): AQL date such as ``2017-01-01T00:00:00.000Z``. Datetimes and
+            numbers are accepted as well, numbers and None are returned as is.
+
+    Returns:
+        float: Seconds since the epoch.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime.datetime):
+        moment = value
+    else:
+        moment = fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+@functools.lru_cache(maxsize=256)
+def _wildcard(pattern):
+    return re.compile(fnmatch.translate(pattern))
+
+
+def _relative_time(value):
+    match = RELATIVE_TIME.match(str(value))
+    if not match:
+        raise OfflineQueryError('Unsupported relative time {}'.format(value))
+    amount, unit = match.groups()
+    moment = datetime.datetime.now(datetime.timezone.utc) - int(amount) * RELATIVE_UNITS[unit]
+    return moment.timestamp()
+
+
+def _compare(value, operator, expected, date=False):
+    # pylint: disable=too-many-return-statements
+    if operator == '$before':
+        return value < _relative_time(expected)
+    if operator == '$last':
+        return value >= _relative_time(expected)
+    if date:
+        expected = parse_time(expected)
+    if operator == '$eq':
+        return value == expected
+    if operator == '$match':
+        return _wildcard(str(expected)).match(str(value)) is not None
+    if operator == '$lt':
+        return value < expected
+    if operator == '$lte':
+        return value <= expected
+    if operator == '$gt':
+        return value > expected
+    if operator == '$gte':
+        return value >= expected
+    raise OfflineQueryError('Unsupported AQL operator {}'.format(operator))
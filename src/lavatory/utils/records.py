@@ -0,0 +1,75 @@
+"""Compact artifact records for large purge lists."""
+import sys
+from collections.abc import Mapping
+
+
+class ArtifactRecord(Mapping):
+    """Artifact holding only what purging and moving need.
+
+    Records read like the AQL result dicts they replace, ``record['path']`` and
+    ``record.get('purge_count', 1)`` work the same, but use slots instead of a
+    dict per artifact and share one string per repository, path and type.
+
+    Args:
+        repo (str): Name of the repository.
+        path (str): Path of the folder holding the artifact.
+        name (str): Name of the artifact.
+        type (str): file or folder.
+    """
+
+    __slots__ = ('repo', 'path', 'name', 'type', 'purge_count')
+
+    def __init__(self, repo, path, name, type='file'):  # pylint: disable=redefined-builtin
+        if repo is not None:
+            self.repo = sys.intern(repo)
+        self.path = sys.intern(path)
+        self.name = name
+        if type is not None:
+            self.type = sys.intern(type)
+
+    @classmethod
+    def from_dict(cls, artifact):
+        """Creates a record from an AQL result.
+
+        Args:
+            artifact (dict): Artifact. Needs artifact['name'] and ['path'].
+
+        Returns:
+            ArtifactRecord: Record of the artifact.
+        """
+        record = cls(artifact.get('repo'), artifact['path'], artifact['name'], type=artifact.get('type'))
+        if 'purge_count' in artifact:
+            record.purge_count = artifact['purge_count']
+        return record
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return (key for key in self.__slots__ if hasattr(self, key))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return 'ArtifactRecord({})'.format(dict(self))
+
+
+def compact(artifacts):
+    """Converts AQL results to :class:`ArtifactRecord`.
+
+    Args:
+        artifacts (iterable): Artifacts.
+
+    Returns:
+        list: Records.
+    """
+    return [ArtifactRecord.from_dict(artifact) for artifact in artifacts]
@@ -0,0 +1,30 @@
+"""State shared by the commands of a single run."""
+import logging
+
+from .artifactory import Artifactory
+
+LOG = logging.getLogger(__name__)
+
+
+class RunContext:
+    """Holds the Artifactory client shared by every command and helper of a run.
+
+    The client is created on first use, so commands that never talk to
+    Artifactory do not need credentials. Commands get it with
+    ``ctx.ensure_object(RunContext)``.
+
+    Args:
+        cache (SnapshotCache): Local snapshot of search results used by the client.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._artifactory = None
+
+    @property
+    def artifactory(self):
+        """Artifactory: Client not bound to a repository, created on first use."""
+        if self._artifactory is None:
+            LOG.debug('Creating Artifactory client for this run')
+            self._artifactory = Artifactory(repo_name=None, cache=self.cache)
+        return self._artifactory
@@ -1,6 +1,12 @@
+import ast
+import fnmatch
 import logging
 import os
 import pathlib
+import re
+import threading
+import weakref
+from importlib.machinery import PathFinder
 
 from pluginbase import PluginBase
 
@@ -8,10 +14,19 @@ from ..exceptions import InvalidPoliciesDirectory
 
 LOG = logging.getLogger(__name__)
 
+DEFAULT_POLICY = 'default'
+PATTERNS_NAME = 'REPO_PATTERNS'
+
+_REGISTRIES = weakref.WeakKeyDictionary()
+_LOCK = threading.RLock()
+
 
 def setup_pluginbase(extra_policies_path=None):
     """Sets up plugin base with default path and provided path
 
+    Each call scans the search paths again. Policies are found and loaded once
+    per source, see :class:`PolicyRegistry`.
+
     Args:
         extra_policies_path (str): Extra path to find plugins in
 
@@ -48,17 +63,177 @@ def get_policy(plugin_source, repository, default=True):
     Returns:
         policy (func): The policy python module.
     """
-    policy_name = repository.replace("-", "_")
-    try:
-        policy = plugin_source.load_plugin(policy_name)
-    except ImportError:
+    with _LOCK:
+        registry = _REGISTRIES.get(plugin_source)
+        if registry is None:
+            registry = _REGISTRIES[plugin_source] = PolicyRegistry(plugin_source)
+    return registry.get(repository, default=default)
+
+
+class PolicyRegistry:
+    """Resolves repositories to policies, scanning the search paths once.
+
+    A repository uses the policy named after it, with ``-`` replaced by ``_``.
+    Otherwise it uses the first policy, by name, with a ``REPO_PATTERNS`` entry
+    matching it. Strings in ``REPO_PATTERNS`` are globs and compiled regular
+    expressions are searched in the name::
+
+        REPO_PATTERNS = ['docker-*-local', re.compile(r'^yum-\\d+$')]
+
+    Patterns are read from the source of the policies without running them, so
+    only the policies repositories actually use are imported. Policies are
+    loaded once and repositories are resolved once.
+
+    Args:
+        plugin_source (PluginSource): Source of the policies.
+    """
+
+    def __init__(self, plugin_source):
+        self.plugin_source = plugin_source
+        self.names = frozenset(plugin_source.list_plugins())
+        self._policies = {}
+        self._resolved = {}
+        self._patterns = None
+
+    def load(self, policy_name):
+        """Loads a policy module once.
+
+        Args:
+            policy_name (str): Name of the policy.
+
+        Returns:
+            module: The policy python module.
+        """
+        with _LOCK:
+            if policy_name not in self._policies:
+                self._policies[policy_name] = self.plugin_source.load_plugin(policy_name)
+            return self._policies[policy_name]
+
+    def patterns(self):
+        """Repository patterns declared by the policies, read on first use.
+
+        Returns:
+            list: Tuples of a pattern and the name of its policy.
+        """
+        with _LOCK:
+            if self._patterns is None:
+                self._patterns = []
+                for policy_name in sorted(self.names - {DEFAULT_POLICY}):
+                    for pattern in self._policy_patterns(policy_name):
+                        self._patterns.append((pattern, policy_name))
+                LOG.debug("Policy patterns: %s", self._patterns)
+            return self._patterns
+
+    def _policy_patterns(self, policy_name):
+        """``REPO_PATTERNS`` of a policy, read from its source when it is a literal.
+
+        Policies building their patterns in code are imported instead. A policy
+        that fails to import is left out, so it only breaks its own repositories.
+
+        Returns:
+            list: Patterns of the policy.
+        """
+        spec = PathFinder.find_spec(policy_name, self.plugin_source.mod.__path__)
+        try:
+            with open(spec.origin, 'rb') as policy_file:
+                return read_patterns(policy_file.read())
+        except (AttributeError, OSError, SyntaxError, TypeError, ValueError) as error:
+            LOG.debug("Importing policy %s to read %s: %s", policy_name, PATTERNS_NAME, error)
+        try:
+            return list(getattr(self.load(policy_name), PATTERNS_NAME, ()))
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception("Ignoring %s of policy %s, it failed to load", PATTERNS_NAME, policy_name)
+            return []
+
+    def resolve(self, repository):
+        """Name of the policy of a repository.
+
+        Args:
+            repository (str): Name of repository.
+
+        Returns:
+            str: Name of the policy, None if only the default applies.
+        """
+        if repository not in self._resolved:
+            policy_name = repository.replace("-", "_")
+            if policy_name not in self.names:
+                policy_name = next(
+                    (name for pattern, name in self.patterns() if _matches(pattern, repository)), None)
+            self._resolved[repository] = policy_name
+        return self._resolved[repository]
+
+    def get(self, repository, default=True):
+        """Gets the policy of a repository.
+
+        Args:
+            repository (str): Name of repository.
+            default (bool): If to load the default policy.
+
+        Returns:
+            policy (func): The policy python module.
+        """
+        policy_name = self.resolve(repository)
+        if policy_name is not None:
+            return self.load(policy_name)
         if default:
             LOG.info("No policy found for %s. Applying Default", repository)
-            policy = plugin_source.load_plugin('default')
-        else:
-            LOG.info("No policy found for %s. Skipping Default", repository)
-            policy = None
-    return policy
+            return self.load(DEFAULT_POLICY)
+        LOG.info("No policy found for %s. Skipping Default", repository)
+        return None
+
+
+def read_patterns(source):
+    """Reads a literal ``REPO_PATTERNS`` from the source of a policy without running it.
+
+    Supported items are strings and ``re.compile()`` calls with literal arguments
+    and ``re`` flags.
+
+    Args:
+        source (bytes): Source of the policy module.
+
+    Returns:
+        list: Patterns, empty if the policy declares none.
+
+    Raises:
+        ValueError: ``REPO_PATTERNS`` is not built from supported literals.
+    """
+    patterns = []
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == PATTERNS_NAME for target in node.targets):
+            if not isinstance(node.value, (ast.List, ast.Tuple)):
+                raise ValueError('{} is not a list'.format(PATTERNS_NAME))
+            patterns = [_literal_pattern(item) for item in node.value.elts]
+    return patterns
+
+
+def _literal_pattern(node):
+    if not isinstance(node, ast.Call):
+        pattern = ast.literal_eval(node)
+        if not isinstance(pattern, str):
+            raise ValueError('Unsupported pattern {!r}'.format(pattern))
+        return pattern
+    if not (isinstance(node.func, ast.Attribute) and node.func.attr == 'compile' and
+            isinstance(node.func.value, ast.Name) and node.func.value.id == 're') or node.keywords:
+        raise ValueError('Unsupported pattern call')
+    return re.compile(*[_literal_argument(argument) for argument in node.args])
+
+
+def _literal_argument(node):
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return _literal_argument(node.left) | _literal_argument(node.right)
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 're':
+        flag = getattr(re, node.attr, None)
+        if not isinstance(flag, int):
+            raise ValueError('Unsupported flag re.{}'.format(node.attr))
+        return flag
+    return ast.literal_eval(node)
+
+
+def _matches(pattern, repository):
+    if isinstance(pattern, str):
+        return fnmatch.fnmatchcase(repository, pattern)
+    return pattern.search(repository) is not None
 
 
 def get_directory_path(directory):
@@ -0,0 +1,93 @@
+"""Deterministic partitioning of purge work across processes and invocations."""
+import logging
+import zlib
+
+LOG = logging.getLogger(__name__)
+
+ROOT_FILES = '.'
+
+
+class Shard:
+    """One of ``count`` shards, numbered from 1.
+
+    Work is split into units of a repository and one of its top-level folders,
+    with the files at the root of a repository as one more unit. A unit belongs
+    to the shard selected by a CRC32 of its name, so every invocation with the
+    same ``count`` agrees on the split without coordinating.
+
+    Args:
+        index (int): Number of this shard, from 1 to ``count``.
+        count (int): Total number of shards.
+    """
+
+    def __init__(self, index, count):
+        if not 1 <= index <= count:
+            raise ValueError('Shard {}/{} is out of range'.format(index, count))
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, text):
+        """Parses a shard written as ``i/N``.
+
+        Args:
+            text (str): Shard, such as ``2/4``.
+
+        Returns:
+            Shard: The shard.
+        """
+        try:
+            index, count = (int(part) for part in text.split('/'))
+        except ValueError:
+            raise ValueError('Shard must be written as i/N, got {}'.format(text)) from None
+        return cls(index, count)
+
+    def __str__(self):
+        return '{}/{}'.format(self.index, self.count)
+
+    def owns(self, unit):
+        """Whether a unit of work belongs to this shard.
+
+        Args:
+            unit (str): Name of the unit, ``repo/top-level-folder``.
+
+        Returns:
+            bool: True if this shard processes the unit.
+        """
+        return zlib.crc32(unit.encode('utf-8')) % self.count == self.index - 1
+
+    def scope(self, artifactory):
+        """Top-level folders of a repository that belong to this shard.
+
+        Args:
+            artifactory (Artifactory): Client of the repository.
+
+        Returns:
+            list: Names of the owned top-level folders, ``.`` standing for the files
+            at the root. Empty when this shard has nothing in the repository.
+        """
+        top_level = artifactory.filter(depth=1, item_type='any')
+        units = {ROOT_FILES if item['type'] == 'file' else item['name'] for item in top_level}
+        owned = sorted(unit for unit in units if self.owns('{}/{}'.format(artifactory.repo_name, unit)))
+        LOG.info('Shard %s owns %d of %d top-level folders', self, len(owned), len(units))
+        return owned
+
+
+def scope_term(folders):
+    """AQL term limiting a search to items inside some top-level folders.
+
+    Args:
+        folders (list): Names of top-level folders, ``.`` for the files at the root.
+
+    Returns:
+        dict: AQL term.
+    """
+    conditions = []
+    for folder in folders:
+        if folder == ROOT_FILES:
+            conditions.append({"$and": [{"path": {"$eq": "."}}, {"type": {"$eq": "file"}}]})
+            continue
+        conditions.append({"$and": [{"path": {"$eq": "."}}, {"name": {"$eq": folder}}]})
+        conditions.append({"path": {"$eq": folder}})
+        conditions.append({"path": {"$match": "{}/*".format(folder)}})
+    return {"$or": conditions}
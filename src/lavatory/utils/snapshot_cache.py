@@ -0,0 +1,85 @@
+"""Local snapshot of Artifactory metadata shared by consecutive runs."""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = '.lavatory-cache.sqlite'
+DEFAULT_CACHE_TTL = 3600
+
+
+class SnapshotCache:
+    """SQLite cache of query results, keyed by repository and query.
+
+    Results older than ``ttl`` seconds are fetched again. Live purges drop the
+    snapshots of the repositories they change.
+
+    Args:
+        path (str): Path of the SQLite database.
+        ttl (int): Seconds a snapshot is used for.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS snapshots '
+                                     '(repo TEXT, query TEXT, fetched REAL, results TEXT, PRIMARY KEY (repo, query))')
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, repo, query):
+        """Cached results of a query.
+
+        Args:
+            repo (str): Name of the repository, '' for instance wide queries.
+            query (dict): The query, including everything that changes its results.
+
+        Returns:
+            Results of the query, None if there is no fresh snapshot.
+        """
+        with self._lock:
+            row = self._connection.execute('SELECT fetched, results FROM snapshots WHERE repo = ? AND query = ?',
+                                           (repo, _query_key(query))).fetchone()
+            if row is None or time.time() - row[0] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+        LOG.debug('Using cached results of %s', query)
+        return json.loads(row[1])
+
+    def put(self, repo, query, results):
+        """Stores the results of a query.
+
+        Args:
+            repo (str): Name of the repository, '' for instance wide queries.
+            query (dict): The query, including everything that changes its results.
+            results: JSON serializable results.
+        """
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)',
+                                     (repo, _query_key(query), time.time(), json.dumps(results)))
+
+    def invalidate(self, repo):
+        """Drops every snapshot of a repository.
+
+        Args:
+            repo (str): Name of the repository, '' for instance wide queries.
+        """
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM snapshots WHERE repo = ?', (repo, ))
+        LOG.debug('Dropped cached results of %s', repo or 'the instance')
+
+    def close(self):
+        """Closes the database."""
+        LOG.debug('Cached queries: %d hits, %d misses', self.hits, self.misses)
+        self._connection.close()
+
+
+def _query_key(query):
+    return json.dumps(query, sort_keys=True, separators=(',', ':'))
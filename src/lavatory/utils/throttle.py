@@ -0,0 +1,240 @@
+"""Client side rate limiting, retries and adaptive concurrency for Artifactory requests."""
+import contextlib
+import logging
+import random
+import threading
+import time
+
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout  # pylint: disable=redefined-builtin
+
+from . import metrics
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 30.0
+DEFAULT_TARGET_LATENCY = 2.0
+RETRY_STATUSES = (429, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+READ_ONLY_ENDPOINTS = ('api/search/aql', )
+
+
+class TokenBucket:
+    """Token bucket allowing ``rate`` requests per second with bursts of up to ``burst``.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): Bucket capacity, defaults to one second worth of tokens.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        wait = self.take()
+        while wait:
+            time.sleep(wait)
+            wait = self.take()
+
+    def take(self):
+        """Takes a token if one is available, without blocking.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until the next one.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1 - 1e-9:  # tolerate float rounding after refills
+                self.tokens = max(0.0, self.tokens - 1)
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class AdaptiveLimiter:
+    """Concurrency limit adjusted with additive increase, multiplicative decrease (AIMD).
+
+    Every fast, successful request raises the limit by ``1 / limit``, so about one
+    per round of requests. Throttled, failed or slow requests cut it by
+    ``decrease_factor``, at most once per ``target_latency`` so a burst of
+    errors from the same round only counts once.
+
+    Args:
+        maximum (int): Highest limit.
+        minimum (int): Lowest limit.
+        initial (int): Starting limit, defaults to half of ``maximum``.
+        target_latency (float): Seconds above which a response counts as congestion.
+        decrease_factor (float): Multiplier applied to the limit on congestion.
+    """
+
+    def __init__(self, maximum, minimum=1, initial=None, target_latency=DEFAULT_TARGET_LATENCY,
+                 decrease_factor=0.5):  # pylint: disable=too-many-arguments
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(initial or max(minimum, maximum // 2))
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Waits for room under the current limit, yields a dict to record the outcome into.
+
+        Set ``congested`` in the yielded dict when the request was throttled or failed.
+        """
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+        outcome = {'congested': True}
+        start = time.monotonic()
+        try:
+            yield outcome
+        finally:
+            self.release(time.monotonic() - start, outcome['congested'])
+
+    def release(self, latency, congested=False):
+        """Frees a slot and adjusts the limit from the request outcome.
+
+        Args:
+            latency (float): Seconds the request took.
+            congested (bool): Request was throttled or failed.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            if congested or latency > self.target_latency:
+                self._decrease()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self.last_decrease < self.target_latency:
+            return
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        LOG.debug('Reduced concurrency limit to %d', self.limit)
+
+
+def is_idempotent(method, url):
+    """Whether a request can be sent again without changing its outcome.
+
+    AQL searches are sent with POST but only read. Deletes and moves are not
+    repeatable: a retry after the first attempt reached Artifactory fails or
+    reports the wrong result.
+
+    Args:
+        method (str): HTTP method.
+        url (str): Full URL.
+
+    Returns:
+        bool: True for reads.
+    """
+    return method.upper() in IDEMPOTENT_METHODS or url.split('?', 1)[0].endswith(READ_ONLY_ENDPOINTS)
+
+
+def should_retry(status, retry_after=None, idempotent=True):
+    """Whether a response is retried.
+
+    Requests that are not idempotent are only retried when Artifactory turned
+    them away without acting on them: 429, or 503 with ``Retry-After``. Gateway
+    errors may come after the request was carried out.
+
+    Args:
+        status (int): Status code of the response.
+        retry_after (str): ``Retry-After`` header of the response.
+        idempotent (bool): The request can be sent again, see :func:`is_idempotent`.
+
+    Returns:
+        bool: True to retry.
+    """
+    if idempotent:
+        return status in RETRY_STATUSES
+    return status == 429 or (status == 503 and retry_after is not None)
+
+
+def backoff_delay(attempt, base=DEFAULT_BACKOFF_BASE, cap=DEFAULT_BACKOFF_CAP, retry_after=None):
+    """Seconds to wait before retrying, exponential with full jitter.
+
+    Args:
+        attempt (int): Number of attempts already retried.
+        base (float): Delay ceiling of the first retry.
+        cap (float): Highest delay.
+        retry_after (str): ``Retry-After`` header of the response, used when it is in seconds.
+
+    Returns:
+        float: Seconds to wait.
+    """
+    if retry_after:
+        try:
+            return min(cap, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class Throttle:
+    """Applies rate limiting, adaptive concurrency and retries to requests.
+
+    Args:
+        retries (int): Times a throttled, unavailable or failed request is retried.
+        rate (float): Maximum requests per second, None for unlimited.
+        adaptive_limit (int): Highest concurrency for :class:`AdaptiveLimiter`, None to disable it.
+    """
+
+    def __init__(self, retries=DEFAULT_RETRIES, rate=None, adaptive_limit=None):
+        self.retries = retries
+        self.bucket = TokenBucket(rate) if rate else None
+        self.limiter = AdaptiveLimiter(adaptive_limit) if adaptive_limit else None
+
+    def request(self, send_once, idempotent=True):
+        """Sends a request, retrying with backoff while it is throttled or fails to connect.
+
+        Args:
+            send_once (func): Sends the request once and returns the response.
+            idempotent (bool): The request can be sent again, otherwise it is only
+                retried as allowed by :func:`should_retry` or when it could not connect.
+
+        Returns:
+            requests.models.Response: The last response.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self._send(send_once)
+            except (ConnectionError, Timeout) as error:
+                if attempt >= self.retries or not (idempotent or isinstance(error, ConnectTimeout)):
+                    raise
+                reason, retry_after = str(error), None
+            else:
+                retry_after = response.headers.get('Retry-After')
+                if attempt >= self.retries or not should_retry(response.status_code, retry_after, idempotent):
+                    return response
+                reason = 'status {}'.format(response.status_code)
+
+            delay = backoff_delay(attempt, retry_after=retry_after)
+            LOG.warning('Artifactory request failed with %s, retrying in %.1fs', reason, delay)
+            metrics.count('retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, send_once):
+        if self.bucket:
+            self.bucket.acquire()
+        if not self.limiter:
+            return send_once()
+        with self.limiter.slot() as outcome:
+            response = send_once()
+            outcome['congested'] = response.status_code in THROTTLE_STATUSES
+            return response
@@ -0,0 +1,198 @@
+"""Shared HTTP transport for Artifactory connections."""
+import base64
+import logging
+import os
+import threading
+import time
+
+import certifi
+import party
+import requests
+from party.exceptions import UnknownQueryType
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .throttle import DEFAULT_RETRIES, Throttle, is_idempotent
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+QUERY_TYPES = ('get', 'put', 'delete', 'post')
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+_REQUEST_SLOTS = None
+_THROTTLE = Throttle()
+
+
+def get_session():
+    """Returns the process wide session shared by all Artifactory clients.
+
+    Connections are kept alive and pooled per host, so TCP and TLS handshakes
+    are only paid once per pooled connection. The pool size is read from
+    ``LAVATORY_POOL_SIZE`` and the CA bundle from ``LAVATORY_CERTBUNDLE_PATH``.
+
+    Returns:
+        requests.Session: Shared session.
+    """
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            pool_size = int(os.getenv('LAVATORY_POOL_SIZE', str(DEFAULT_POOL_SIZE)))
+            LOG.debug('Creating HTTP session with pool size %d', pool_size)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.verify = os.getenv('LAVATORY_CERTBUNDLE_PATH', certifi.where())
+            _SESSION = session
+    return _SESSION
+
+
+def reset_session():
+    """Drops the shared session so the next request opens connections of its own.
+
+    Worker processes call this first, a forked child would otherwise reuse the
+    pooled sockets of its parent.
+    """
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        _SESSION = None
+
+
+def set_request_limit(limit=None):
+    """Caps the number of requests in flight across every Artifactory client in the process.
+
+    Args:
+        limit (int): Maximum concurrent requests. None or 0 removes the cap.
+    """
+    global _REQUEST_SLOTS  # pylint: disable=global-statement
+    _REQUEST_SLOTS = threading.BoundedSemaphore(limit) if limit else None
+
+
+def configure_throttle(retries=DEFAULT_RETRIES, rate=None, adaptive_limit=None):
+    """Sets how every request in the process is rate limited and retried.
+
+    Args:
+        retries (int): Times a throttled, unavailable or failed request is retried.
+        rate (float): Maximum requests per second, None for unlimited.
+        adaptive_limit (int): Highest concurrency to adapt up to, None to not adapt concurrency.
+
+    Returns:
+        Throttle: The new throttle.
+    """
+    global _THROTTLE  # pylint: disable=global-statement
+    _THROTTLE = Throttle(retries=retries, rate=rate, adaptive_limit=adaptive_limit)
+    return _THROTTLE
+
+
+def send(method, url, **kwargs):
+    """Sends a request through the shared session, honoring the request limit and throttle.
+
+    Deletes and moves are not retried after gateway errors, see :func:`~.throttle.should_retry`.
+
+    Args:
+        method (str): HTTP method.
+        url (str): Full URL.
+        **kwargs: Extra arguments for :meth:`requests.Session.request`.
+
+    Returns:
+        requests.models.Response: Response.
+    """
+    return _THROTTLE.request(lambda: _send_once(method, url, **kwargs), idempotent=is_idempotent(method, url))
+
+
+def _send_once(method, url, **kwargs):
+    if metrics.current_metrics() is None:
+        return _send_limited(method, url, **kwargs)
+    start = time.perf_counter()
+    response = _send_limited(method, url, **kwargs)
+    metrics.observe('request_seconds', time.perf_counter() - start)
+    metrics.count('requests_{}'.format(method.lower()))
+    metrics.count('responses_{}xx'.format(response.status_code // 100))
+    metrics.count('response_bytes', len(response.content))
+    return response
+
+
+def _send_limited(method, url, **kwargs):
+    slots = _REQUEST_SLOTS
+    if slots is None:
+        return get_session().request(method, url, **kwargs)
+    with slots:
+        return get_session().request(method, url, **kwargs)
+
+
+def connection_stats():
+    """Counts connections opened and reused by the shared session.
+
+    Returns:
+        dict: Number of connections ``opened`` and requests that ``reused`` one.
+    """
+    opened = sent = 0
+    for adapter in set(get_session().adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            opened += pool.num_connections
+            sent += pool.num_requests
+    return {'opened': opened, 'reused': max(sent - opened, 0)}
+
+
+class SessionParty(party.Party):
+    """Party client sending every request through the shared session."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # party hands every instance the same headers dict and find_by_aql mutates it
+        self.headers = dict(self.headers)
+
+    def _auth(self):
+        return (self.username, base64.b64decode(self.password).decode())
+
+    def request(self, endpoint, method='get', **kwargs):
+        """Send request to Artifactory API.
+
+        Args:
+            endpoint (str): API endpoint to use, usually everything after ``api/``.
+            method (str): HTTP method to use, e.g. delete, get, head, options, patch, post.
+
+        Returns:
+            requests.models.Response: Artifactory response.
+
+        Raises:
+            requests.exceptions.HTTPError: Artifactory did not respond with a good status.
+        """
+        url = '/'.join([self.artifactory_url, endpoint])
+        kwargs.setdefault('verify', self.certbundle)
+        response = send(method.upper(), url, auth=self._auth(), headers=self.headers, **kwargs)
+        LOG.debug('Artifactory response: [%d] %s', response.status_code, response.text)
+        response.raise_for_status()
+        return response
+
+    def query_artifactory(self, query, query_type='get', dry=False, **kwargs):
+        """Send request to an Artifactory URL.
+
+        Args:
+            query (str): The full URL to send the request to.
+            query_type (str): One of get, put, delete or post.
+            dry (bool): Only log the request.
+
+        Returns:
+            requests.models.Response: Artifactory response, None if it was not successful.
+        """
+        if dry:
+            return super().query_artifactory(query, query_type=query_type, dry=dry, **kwargs)
+
+        query_type = query_type.lower()
+        if query_type not in QUERY_TYPES:
+            raise UnknownQueryType('Unsupported query type: %s' % query_type)
+        if query_type == 'put':
+            kwargs.setdefault('data', query.split('?', 1)[1])
+
+        response = send(
+            query_type.upper(), query, auth=self._auth(), headers=self.headers, verify=self.certbundle, **kwargs)
+        LOG.debug('Artifactory response: [%d] %s', response.status_code, response.text)
+
+        if not response.ok:
+            return None
+        return response
@@ -0,0 +1,138 @@
+"""Per repository and policy watermarks for incremental discovery."""
+import collections
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_WATERMARK_PATH = '.lavatory-watermarks.json'
+SAFETY_MARGIN = datetime.timedelta(hours=1)
+
+
+class WatermarkStore:
+    """Watermarks left by the retention searches of the previous run.
+
+    Searches read the watermarks loaded from ``path`` and record new ones for the
+    current run. The artifacts the policy of a repository returned are counted
+    through :meth:`track`, and the new watermarks only take effect through
+    :meth:`commit` once the purge removed all of them. Otherwise artifacts that
+    failed to delete would never be searched again. Artifacts a policy filtered
+    out of its search results are not waited for. Watermarks are only written by
+    :meth:`save`, so an interrupted or dry run leaves the previous ones in place.
+
+    Args:
+        path (str): Path of the JSON file holding the watermarks.
+    """
+
+    def __init__(self, path=DEFAULT_WATERMARK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._previous = {}
+        self._current = {}
+        self._pending = collections.defaultdict(dict)
+        self._candidates = collections.Counter()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as watermarks:
+                self._previous = json.load(watermarks)
+        self._current.update(self._previous)
+
+    def get(self, repo, search):
+        """Watermark of the previous run.
+
+        Args:
+            repo (str): Name of the repository.
+            search (str): Key of the search, see :func:`search_key`.
+
+        Returns:
+            dict: Watermark, None if this search did not run before.
+        """
+        return self._previous.get('{}::{}'.format(repo, search))
+
+    def update(self, repo, search, **marks):
+        """Records the watermark of the current run, pending until :meth:`commit`.
+
+        Args:
+            repo (str): Name of the repository.
+            search (str): Key of the search, see :func:`search_key`.
+            marks: Values of the watermark.
+        """
+        with self._lock:
+            self._pending[repo]['{}::{}'.format(repo, search)] = marks
+
+    def add_candidates(self, repo, count):
+        """Counts artifacts the policy of a repository returned for purging.
+
+        Args:
+            repo (str): Name of the repository.
+            count (int): Number of candidates.
+        """
+        with self._lock:
+            self._candidates[repo] += count
+
+    def track(self, repo, artifacts):
+        """Counts the artifacts returned by the policy of a repository as candidates.
+
+        Args:
+            repo (str): Name of the repository.
+            artifacts (iterable): Artifacts to purge. Other iterables than lists are counted as they are consumed.
+
+        Returns:
+            iterable: The same artifacts.
+        """
+        if isinstance(artifacts, list):
+            self.add_candidates(repo, len(artifacts))
+            return artifacts
+        return self._counting(repo, artifacts)
+
+    def _counting(self, repo, artifacts):
+        for artifact in artifacts:
+            self.add_candidates(repo, 1)
+            yield artifact
+
+    def commit(self, repo, purged):
+        """Takes the pending watermarks of a repository if its purge removed every tracked artifact.
+
+        Args:
+            repo (str): Name of the repository.
+            purged (int): Number of artifacts purged.
+
+        Returns:
+            bool: True if the watermarks advanced.
+        """
+        with self._lock:
+            pending = self._pending.pop(repo, {})
+            candidates = self._candidates.pop(repo, 0)
+            if (purged or 0) < candidates:
+                LOG.warning('Keeping the previous watermarks of %s, %d of the %d artifacts its policy returned were '
+                            'not purged. The next incremental run searches the same window again.', repo,
+                            candidates - (purged or 0), candidates)
+                return False
+            self._current.update(pending)
+        return True
+
+    def save(self):
+        """Writes the watermarks of the current run."""
+        with self._lock:
+            temporary_path = '{}.tmp'.format(self.path)
+            with open(temporary_path, 'w', encoding='utf-8') as watermarks:
+                json.dump(self._current, watermarks, indent=2, sort_keys=True)
+            os.replace(temporary_path, self.path)
+        LOG.info('Saved %d watermarks to %s', len(self._current), self.path)
+
+
+def search_key(name, **parameters):
+    """Identifies a retention search, so a changed policy starts from a full search.
+
+    Args:
+        name (str): Name of the retention helper.
+        parameters: Arguments of the search.
+
+    Returns:
+        str: Key of the search.
+    """
+    digest = hashlib.sha1(json.dumps(parameters, sort_keys=True).encode('utf-8')).hexdigest()
+    return '{}:{}'.format(name, digest[:12])
@@ -34,7 +34,7 @@ def artifactory(mock_credentials):
     return artifactory
 
 
-@mock.patch('lavatory.utils.artifactory.party.Party.request')
+@mock.patch('lavatory.utils.transport.SessionParty.request')
 def test_list(mock_party_request, artifactory):
     data = {'repositoriesSummaryList': [{'repoKey': 'test-local', 'repoType': 'LOCAL'}]}
     mock_party_request.return_value.json.return_value = data
@@ -43,17 +43,68 @@ def test_list(mock_party_request, artifactory):
     assert art['test-local'] == {'repoKey': 'test-local', 'repoType': 'LOCAL'}
 
 
-@mock.patch('lavatory.utils.artifactory.party.Party.get_properties')
+@mock.patch('lavatory.utils.transport.SessionParty.get_properties')
 def test_get_artifact_properties(mock_properties, artifactory):
     test_artifact = {"name": "test", "path": "path/to/test"}
     props = artifactory.get_artifact_properties(test_artifact)
     assert props == TEST_PROPS
 
 
-@mock.patch('lavatory.utils.artifactory.party.Party.post')
+@mock.patch('lavatory.utils.transport.SessionParty.post')
 def test_move_artifacts(artifactory):
     test_artifacts = [{"name": "test", "path": "path/to/test"},
                       {"name": "test2", "path": "path/to/test2"}]
     moved = artifactory.move_artifacts(artifacts=test_artifacts,
                                        dest_repository='test_repo')
     assert moved
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.request')
+def test_storage_info_is_cached(mock_party_request, artifactory):
+    data = {'repositoriesSummaryList': [{'repoKey': 'test-local', 'repoType': 'LOCAL'},
+                                        {'repoKey': 'test-virtual', 'repoType': 'VIRTUAL'}]}
+    mock_party_request.return_value.json.return_value = data
+
+    assert list(artifactory.repos()) == ['test-local']
+    assert list(artifactory.repos(repo_type='any')) == ['test-local', 'test-virtual']
+    assert mock_party_request.call_count == 1
+
+    artifactory.invalidate_storage_info()
+    artifactory.repos()
+    assert mock_party_request.call_count == 2
+
+
+def test_for_repo_reuses_credentials(artifactory, mock_credentials):
+    repo_client = artifactory.for_repo('test-local')
+
+    assert repo_client.repo_name == 'test-local'
+    assert repo_client.credentials is artifactory.credentials
+    assert mock_credentials.call_count == 1
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.get_properties')
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_get_artifacts_properties(mock_find_aql, mock_properties, artifactory):
+    test_artifacts = [{"name": "a", "path": "path/one"}, {"name": "b", "path": "path/one"},
+                      {"name": "c", "path": "path/two"}]
+    mock_find_aql.return_value = {'results': [
+        {"name": "a", "path": "path/one", "properties": [{"key": "build", "value": "1"},
+                                                          {"key": "env", "value": "dev"},
+                                                          {"key": "env", "value": "prod"}]},
+        {"name": "c", "path": "path/two", "properties": [{"key": "build", "value": "2"}]},
+    ]}
+
+    props = artifactory.get_artifacts_properties(test_artifacts, chunk_size=2)
+
+    assert props == {
+        'path/one/a': {'build': ['1'], 'env': ['dev', 'prod']},
+        'path/one/b': {},
+        'path/two/c': {'build': ['2']},
+    }
+    assert mock_find_aql.call_count == 2
+    assert mock_find_aql.call_args_list[0][1]['fields'] == ['repo', 'path', 'name', 'property.*']
+
+    assert artifactory.get_artifact_properties(test_artifacts[0]) == {'build': ['1'], 'env': ['dev', 'prod']}
+    artifactory.get_artifacts_properties(test_artifacts)
+    assert mock_find_aql.call_count == 2
+    assert not mock_properties.called
@@ -0,0 +1,194 @@
+"""Unit tests for purging artifacts against a stub Artifactory."""
+
+import threading
+from unittest import mock
+
+import pytest
+from requests.exceptions import ConnectionError  # pylint: disable=redefined-builtin
+
+from lavatory.utils import transport
+from lavatory.utils.artifactory import Artifactory
+
+TEST_ARTIFACTS = [{'name': 'test{}'.format(i), 'path': 'path/to/{}'.format(i)} for i in range(20)]
+
+
+@pytest.fixture
+def artifactory(stub_credentials):
+    return Artifactory(repo_name='test-local')
+
+
+def test_purge_dryrun_does_not_delete(artifactory, artifactory_server):
+    purged = artifactory.purge(True, TEST_ARTIFACTS, workers=4)
+
+    assert purged == len(TEST_ARTIFACTS)
+    assert artifactory_server.deleted == []
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_purge_deletes_every_artifact(artifactory, artifactory_server, workers):
+    purged = artifactory.purge(False, TEST_ARTIFACTS, workers=workers)
+
+    expected = ['/artifactory/test-local/{}/{}'.format(a['path'], a['name']) for a in TEST_ARTIFACTS]
+    assert purged == len(TEST_ARTIFACTS)
+    assert sorted(artifactory_server.deleted) == sorted(expected)
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_purge_does_not_count_failed_deletes(artifactory, artifactory_server, monkeypatch, workers):
+    monkeypatch.setattr(transport, '_SESSION', None)
+    purged_artifacts = []
+    artifacts = [{'name': 'missing.rpm', 'path': 'path/to'}, {'name': 'ok.rpm', 'path': 'path/to'}]
+
+    purged = artifactory.purge(False, artifacts, workers=workers, on_purged=purged_artifacts.append)
+
+    assert purged == 1
+    assert [artifact['name'] for artifact in purged_artifacts] == ['ok.rpm']
+    assert len(artifactory_server.deleted) == 2
+
+
+def test_purge_concurrent_handles_errors(artifactory, artifactory_server):
+    query_artifactory = artifactory.artifactory.query_artifactory
+
+    def _flaky_query(url, **kwargs):
+        if url.endswith('/bad'):
+            raise ConnectionError('connection reset')
+        return query_artifactory(url, **kwargs)
+
+    artifacts = TEST_ARTIFACTS + [{'name': 'bad', 'path': 'path/to/bad'}]
+    with mock.patch.object(artifactory.artifactory, 'query_artifactory', side_effect=_flaky_query):
+        purged = artifactory.purge(False, artifacts, workers=4)
+
+    assert purged == len(TEST_ARTIFACTS)
+    assert len(artifactory_server.deleted) == len(TEST_ARTIFACTS)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_purge_paged_artifacts(artifactory, workers):
+    """Deleting while paging must not skip artifacts shifted to earlier pages."""
+    remaining = [{'name': 'test{:02d}'.format(i), 'path': 'path/to'} for i in range(25)]
+
+    def _find_by_aql(offset_records=0, num_records=0, **_):
+        return {'results': list(remaining[offset_records:offset_records + num_records])}
+
+    def _delete(url, **_):
+        name = url.rsplit('/', 1)[1]
+        remaining[:] = [a for a in remaining if a['name'] != name]
+        return mock.Mock(ok=True)
+
+    with mock.patch.object(artifactory.artifactory, 'find_by_aql', side_effect=_find_by_aql), \
+            mock.patch.object(artifactory.artifactory, 'query_artifactory', side_effect=_delete):
+        purged = artifactory.purge(False, artifactory.iter_filter(page_size=4), workers=workers)
+
+    assert purged == 25
+    assert remaining == []
+
+
+def _children_lookup(tree):
+    """Fake AQL search returning direct children of the folders in an $or of paths."""
+
+    def _find_by_aql(criteria=None, **_):
+        folders = [term['path']['$eq'] for term in criteria['$and'][0]['$or']]
+        return {'results': [child for child in tree if child['path'] in folders]}
+
+    return _find_by_aql
+
+
+def test_collapse_folders(artifactory):
+    tree = [
+        {'path': 'app', 'name': '1.0', 'type': 'folder'},
+        {'path': 'app', 'name': '2.0', 'type': 'folder'},
+        {'path': 'app/1.0', 'name': 'a.rpm', 'type': 'file'},
+        {'path': 'app/1.0', 'name': 'b.rpm', 'type': 'file'},
+        {'path': 'app/2.0', 'name': 'a.rpm', 'type': 'file'},
+        {'path': 'app/2.0', 'name': 'b.rpm', 'type': 'file'},
+    ]
+    artifacts = tree[2:5]
+
+    with mock.patch.object(artifactory.artifactory, 'find_by_aql', side_effect=_children_lookup(tree)):
+        batched = artifactory.collapse_folders(artifacts)
+
+    assert sorted(batched, key=lambda a: a['path']) == [
+        {'repo': 'test-local', 'path': 'app', 'name': '1.0', 'type': 'folder', 'purge_count': 2},
+        {'path': 'app/2.0', 'name': 'a.rpm', 'type': 'file'},
+    ]
+
+
+def test_purge_batch_folders(artifactory, artifactory_server):
+    tree = [
+        {'path': '.', 'name': 'app', 'type': 'folder'},
+        {'path': 'app', 'name': '1.0', 'type': 'folder'},
+        {'path': 'app/1.0', 'name': 'a.rpm', 'type': 'file'},
+        {'path': 'app/1.0', 'name': 'b.rpm', 'type': 'file'},
+    ]
+
+    with mock.patch.object(artifactory.artifactory, 'find_by_aql', side_effect=_children_lookup(tree)):
+        purged = artifactory.purge(False, tree[2:], batch_folders=True)
+
+    assert purged == 2
+    assert artifactory_server.deleted == ['/artifactory/test-local/app']
+
+
+def test_purge_overlaps_discovery_and_deletes(artifactory, artifactory_server):
+    """Deletes start before the policy generator has finished discovering artifacts."""
+    first_deleted = threading.Event()
+    query_artifactory = artifactory.artifactory.query_artifactory
+
+    def _delete(url, **kwargs):
+        response = query_artifactory(url, **kwargs)
+        first_deleted.set()
+        return response
+
+    def _discover():
+        yield TEST_ARTIFACTS[0]
+        assert first_deleted.wait(timeout=5)
+        yield from TEST_ARTIFACTS[1:]
+
+    with mock.patch.object(artifactory.artifactory, 'query_artifactory', side_effect=_delete):
+        purged = artifactory.purge(False, _discover(), workers=2)
+
+    assert purged == len(TEST_ARTIFACTS)
+    assert len(artifactory_server.deleted) == len(TEST_ARTIFACTS)
+
+
+def test_purge_unsorted_keeps_order(artifactory, artifactory_server):
+    artifacts = list(reversed(TEST_ARTIFACTS))
+    artifactory.purge(False, artifacts, sort=False)
+
+    expected = ['/artifactory/test-local/{}/{}'.format(a['path'], a['name']) for a in artifacts]
+    assert artifactory_server.deleted == expected
+
+
+def test_purge_retries_throttled_deletes(artifactory, artifactory_server):
+    artifacts = [{'name': 'throttled{}'.format(i), 'path': 'path/to'} for i in range(3)]
+    purged = artifactory.purge(False, artifacts, workers=2)
+
+    assert purged == 3
+    assert len(artifactory_server.throttled) == 3
+    assert sorted(artifactory_server.deleted) == sorted(artifactory_server.throttled)
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_move_artifacts(artifactory, artifactory_server, workers):
+    artifacts = [
+        {'name': 'app', 'path': 'group', 'type': 'folder'},
+        {'name': 'a.rpm', 'path': 'group/app', 'type': 'file'},
+        {'name': 'b.rpm', 'path': 'other', 'type': 'file'},
+        {'name': 'missing.rpm', 'path': 'other', 'type': 'file'},
+    ]
+    results = artifactory.move_artifacts(artifacts, dest_repository='archive-local', workers=workers)
+
+    assert sorted(results['moved']) == ['group/app', 'other/b.rpm']
+    assert results['failed'] == ['other/missing.rpm']
+    assert results['skipped'] == ['group/app/a.rpm']
+    assert sorted(artifactory_server.posted) == [
+        '/artifactory/api/move/test-local/group/app?to=/archive-local/group/app',
+        '/artifactory/api/move/test-local/other/b.rpm?to=/archive-local/other/b.rpm',
+        '/artifactory/api/move/test-local/other/missing.rpm?to=/archive-local/other/missing.rpm',
+    ]
+
+
+def test_move_artifacts_dryrun(artifactory, artifactory_server):
+    results = artifactory.move_artifacts(TEST_ARTIFACTS, dest_repository='archive-local', dry_run=True)
+
+    assert len(results['moved']) == len(TEST_ARTIFACTS)
+    assert artifactory_server.posted == []
@@ -1,9 +1,13 @@
 """Unit tests for testing retention functions"""
 
-import pytest
+import datetime
 from unittest import mock
 
+import pytest
+
 from lavatory.utils.artifactory import Artifactory
+from lavatory.utils.snapshot_cache import SnapshotCache
+from lavatory.utils.watermarks import SAFETY_MARGIN, WatermarkStore, search_key
 
 TEST_ARTIFACT1 = {'name': 'test1', 'path': '/path/to/test/1'}
 TEST_ARTIFACT2 = {'name': 'test2', 'path': '/path/to/test/2'}
@@ -22,8 +26,8 @@ def artifactory(mock_credentials):
     return artifactory
 
 
-@mock.patch('lavatory.utils.artifactory.party.Party.find_by_aql')
-@mock.patch('lavatory.utils.artifactory.party.Party.get_properties')
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+@mock.patch('lavatory.utils.transport.SessionParty.get_properties')
 def test_get_all_artifacts(mock_properties, mock_find_aql, artifactory):
     """Tests get_all_repo_artifacts returns all artifacts."""
     test_artifacts = {'results': [TEST_ARTIFACT2, TEST_ARTIFACT1]}
@@ -34,7 +38,7 @@ def test_get_all_artifacts(mock_properties, mock_find_aql, artifactory):
     assert artifacts == expected_return
 
 
-@mock.patch('lavatory.utils.artifactory.party.Party.find_by_aql')
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
 def test_count_based_retention(mock_find_aql, artifactory):
     """Tests count base retention returns values"""
     test_artifacts = {'results': [TEST_ARTIFACT2, TEST_ARTIFACT1]}
@@ -46,7 +50,7 @@ def test_count_based_retention(mock_find_aql, artifactory):
     assert purgable == expected_return
 
 
-@mock.patch('lavatory.utils.artifactory.party.Party.find_by_aql')
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
 def test_time_based_retention(mock_find_aql, artifactory):
     """Tests count base retention returns values"""
     test_artifacts = {'results': [TEST_ARTIFACT2, TEST_ARTIFACT1]}
@@ -55,3 +59,172 @@ def test_time_based_retention(mock_find_aql, artifactory):
     expected_return = [TEST_ARTIFACT2, TEST_ARTIFACT1]
     purgable = artifactory.time_based_retention(keep_days=10)
     assert purgable == expected_return
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_count_based_retention_single_query(mock_find_aql, artifactory):
+    """Tests single query count based retention keeps the newest per project"""
+    test_artifacts = [
+        {'name': '3', 'path': 'group/one', 'created': '2018-03-01'},
+        {'name': '3', 'path': 'group/two', 'created': '2018-02-15'},
+        {'name': '2', 'path': 'group/one', 'created': '2018-02-01'},
+        {'name': '1', 'path': 'group/one', 'created': '2018-01-01'},
+        {'name': '1', 'path': 'repodata/x', 'created': '2018-01-01'},
+        {'name': '0', 'path': 'group/repodata/x', 'created': '2017-01-01'},
+    ]
+    mock_find_aql.return_value = {'results': test_artifacts}
+
+    purgable = artifactory.count_based_retention(retention_count=1, single_query=True)
+
+    assert mock_find_aql.call_count == 1
+    assert purgable == [test_artifacts[2], test_artifacts[3]]
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_count_based_retention_single_query_matches_per_project(mock_find_aql, artifactory):
+    """Tests both count based retention modes purge the same artifacts"""
+    projects = [{'name': 'one', 'path': 'group'}, {'name': 'two', 'path': 'group'}]
+    versions = {
+        'group/one': [{'name': str(v), 'path': 'group/one'} for v in range(5, 0, -1)],
+        'group/two': [{'name': str(v), 'path': 'group/two'} for v in range(2, 0, -1)],
+    }
+
+    def _find_by_aql(criteria=None, offset_records=0, **_):
+        terms = criteria['$and']
+        if {'depth': {'$eq': 2}} in terms:
+            return {'results': projects}
+        for path, artifacts in versions.items():
+            if {'path': path} in terms:
+                return {'results': artifacts[offset_records:]}
+        return {'results': versions['group/one'][:3] + versions['group/two'] + versions['group/one'][3:]}
+
+    mock_find_aql.side_effect = _find_by_aql
+
+    per_project = artifactory.count_based_retention(retention_count=2)
+    single_query = artifactory.count_based_retention(retention_count=2, single_query=True)
+
+    assert sorted(single_query, key=lambda a: (a['path'], a['name'])) == \
+        sorted(per_project, key=lambda a: (a['path'], a['name']))
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_iter_filter_pages(mock_find_aql, artifactory):
+    """Tests iter_filter lazily requests pages until a short page"""
+    artifacts = [{'name': str(i), 'path': 'path'} for i in range(5)]
+    mock_find_aql.side_effect = lambda offset_records=0, num_records=0, **_: {
+        'results': artifacts[offset_records:offset_records + num_records]}
+
+    pages = artifactory.iter_filter(page_size=2)
+    assert mock_find_aql.call_count == 0
+    assert list(pages) == artifacts
+    assert [c[1]['offset_records'] for c in mock_find_aql.call_args_list] == [0, 2, 4]
+    assert all(c[1]['num_records'] == 2 for c in mock_find_aql.call_args_list)
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_time_based_retention_incremental(mock_find_aql, artifactory, tmp_path):
+    """Incremental time based retention only searches artifacts changed since the previous run."""
+    mock_find_aql.return_value = {'results': [TEST_ARTIFACT1]}
+    artifactory.repo_name = 'test-local'
+    artifactory.watermarks = WatermarkStore(str(tmp_path / 'watermarks.json'))
+
+    assert artifactory.time_based_retention(keep_days=10) == [TEST_ARTIFACT1]
+    assert not any('$or' in term for term in mock_find_aql.call_args[1]['criteria']['$and'])
+    assert artifactory.watermarks.commit('test-local', 1)
+    artifactory.watermarks.save()
+
+    artifactory.watermarks = WatermarkStore(str(tmp_path / 'watermarks.json'))
+    artifactory.time_based_retention(keep_days=10)
+    delta = [term['$or'] for term in mock_find_aql.call_args[1]['criteria']['$and'] if '$or' in term]
+    assert [list(condition) for condition in delta[0]] == [['created'], ['created'], ['modified']]
+
+    artifactory.time_based_retention(keep_days=11)
+    assert not any('$or' in term for term in mock_find_aql.call_args[1]['criteria']['$and'])
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_incremental_watermarks_wait_for_every_candidate(mock_find_aql, artifactory, tmp_path, caplog):
+    """Watermarks only advance once the purge removed everything the policy returned, with a margin in UTC."""
+    mock_find_aql.return_value = {'results': [TEST_ARTIFACT1, TEST_ARTIFACT2]}
+    artifactory.repo_name = 'test-local'
+    path = str(tmp_path / 'watermarks.json')
+    artifactory.watermarks = WatermarkStore(path)
+    list(artifactory.watermarks.track('test-local', iter(artifactory.time_based_retention(keep_days=10))))
+    assert not artifactory.watermarks.commit('test-local', 1)
+    assert 'Keeping the previous watermarks of test-local' in caplog.text
+    artifactory.watermarks.save()
+
+    artifactory.watermarks = WatermarkStore(path)
+    candidates = artifactory.time_based_retention(keep_days=10)
+    assert not any('$or' in term for term in mock_find_aql.call_args[1]['criteria']['$and'])
+    # the policy keeps one of the artifacts it searched for
+    artifactory.watermarks.track('test-local', [artifact for artifact in candidates if artifact != TEST_ARTIFACT2])
+    start = datetime.datetime.now(datetime.timezone.utc)
+    assert artifactory.watermarks.commit('test-local', 1)
+    artifactory.watermarks.save()
+
+    watermark = next(iter(WatermarkStore(path)._previous.values()))  # pylint: disable=protected-access
+    since = datetime.datetime.strptime(watermark['since'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=datetime.timezone.utc)
+    assert start - since >= SAFETY_MARGIN - datetime.timedelta(seconds=5)
+    assert start - since < SAFETY_MARGIN + datetime.timedelta(seconds=5)
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_count_based_retention_incremental(mock_find_aql, artifactory, tmp_path):
+    """Incremental count based retention only searches projects with new artifacts."""
+    artifactory.repo_name = 'test-local'
+    artifactory.watermarks = WatermarkStore(str(tmp_path / 'watermarks.json'))
+    artifactory.watermarks.update('test-local', search_key(
+        'count_based_retention', retention_count=1, project_depth=2, artifact_depth=3, item_type='folder',
+        extra_aql=None), since='2020-01-01T00:00:00Z')
+    artifactory.watermarks.commit('test-local', 0)
+    artifactory.watermarks.save()
+    artifactory.watermarks = WatermarkStore(str(tmp_path / 'watermarks.json'))
+
+    new_artifact = {'name': '3', 'path': 'group/app'}
+    mock_find_aql.side_effect = [{'results': [new_artifact]}, {'results': [TEST_ARTIFACT1]}]
+    assert artifactory.count_based_retention(retention_count=1, single_query=True) == [TEST_ARTIFACT1]
+
+    changed_query, project_query = mock_find_aql.call_args_list
+    assert {"created": {"$gte": '2020-01-01T00:00:00Z'}} in changed_query[1]['criteria']['$and']
+    assert {"path": 'group/app'} in project_query[1]['criteria']['$and']
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_filter_cache(mock_find_aql, artifactory, tmp_path):
+    """Repeated searches are served from the snapshot until the repository is purged."""
+    mock_find_aql.return_value = {'results': [TEST_ARTIFACT1]}
+    artifactory.repo_name = 'test-local'
+    artifactory.cache = SnapshotCache(str(tmp_path / 'cache.sqlite'))
+
+    assert artifactory.time_based_retention(keep_days=10) == [TEST_ARTIFACT1]
+    assert artifactory.time_based_retention(keep_days=10) == [TEST_ARTIFACT1]
+    assert mock_find_aql.call_count == 1
+
+    list(artifactory.iter_filter(page_size=10))
+    assert mock_find_aql.call_count == 2
+
+    artifactory.purge(True, [TEST_ARTIFACT1])
+    artifactory.time_based_retention(keep_days=10)
+    assert mock_find_aql.call_count == 2
+    with mock.patch('lavatory.utils.transport.SessionParty.query_artifactory'):
+        artifactory.purge(False, [TEST_ARTIFACT1])
+    artifactory.time_based_retention(keep_days=10)
+    assert mock_find_aql.call_count == 3
+
+
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_destructive_lookups_bypass_cache(mock_find_aql, artifactory, tmp_path):
+    """Folder listings of batched deletes are fetched again, time based cutoffs are stable within the hour."""
+    artifact = {'path': 'app', 'name': 'a.rpm', 'type': 'file'}
+    mock_find_aql.return_value = {'results': [artifact]}
+    artifactory.repo_name = 'test-local'
+    artifactory.cache = SnapshotCache(str(tmp_path / 'cache.sqlite'))
+
+    assert artifactory.collapse_folders([artifact])[0]['name'] == 'app'
+    artifactory.collapse_folders([artifact])
+    assert mock_find_aql.call_count == 2
+
+    artifactory.time_based_retention(keep_days=10)
+    cutoff = mock_find_aql.call_args[1]['criteria']['$and'][0]['created']['$lt']
+    assert cutoff.endswith(':00:00Z')
@@ -21,8 +21,9 @@ def test_get_description(mock_get_policy):
     assert 'policy_description' in description.keys()
 
 
+@mock.patch('lavatory.commands.policies.RunContext.artifactory', new_callable=mock.PropertyMock)
 @mock.patch('lavatory.commands.policies.get_repos')
-def test_policies(mock_get_repos, runner):
+def test_policies(mock_get_repos, mock_run_context, runner):
     data = {
         'test-local': {
             'repoKey': 'test-local',
@@ -1,11 +1,15 @@
 """Unit tests for purge command."""
 
+import json
+import os
 from unittest import mock
 
 import pytest
 from click.testing import CliRunner
 
-from lavatory.commands.purge import apply_purge_policies, generate_purge_report, purge
+from lavatory.commands.purge import _init_shard_process, apply_purge_policies, generate_purge_report, purge
+from lavatory.utils import transport
+from lavatory.utils.journal import DEFAULT_JOURNAL_PATH, PurgeJournal
 
 
 @mock.patch('lavatory.commands.purge.Artifactory')
@@ -17,6 +21,54 @@ def test_apply_purge_policies(mock_artifactory):
     assert apply_purge is None
 
 
+@mock.patch('lavatory.commands.purge.Artifactory')
+def test_apply_purge_policies_parallel(mock_artifactory, caplog):
+    """Repositories purged concurrently are all processed and summarized"""
+    mock_artifactory.return_value.purge.return_value = 3
+    all_repos = ['yum-local', 'test_local', 'other-local']
+    with caplog.at_level('INFO'):
+        apply_purge_policies(all_repos, parallel_repos=3)
+
+    purged_repos = sorted(c[1]['repo_name'] for c in mock_artifactory.call_args_list)
+    assert purged_repos == sorted(all_repos)
+    assert '3 repositories processed, 0 skipped, 9 artifacts purged' in caplog.text
+
+
+@mock.patch('lavatory.commands.purge.Artifactory')
+def test_apply_purge_policies_resume(mock_artifactory, tmp_path):
+    """Resumed runs skip finished repositories and continue recorded purge lists"""
+    path = str(tmp_path / 'purge.journal')
+    with PurgeJournal(path) as journal:
+        journal.record_done('yum-local', 4)
+        journal.record_plan('test_local', [{'path': 'app', 'name': 'a.rpm'}, {'path': 'app', 'name': 'b.rpm'}])
+        journal.record_purged('test_local', {'path': 'app', 'name': 'a.rpm'})
+
+    mock_artifactory.return_value.purge.return_value = 1
+    mock_artifactory.return_value.watermarks = None
+    with PurgeJournal(path, resume=True) as journal:
+        apply_purge_policies(['yum-local', 'test_local'], dryrun=False, journal=journal)
+
+    assert mock_artifactory.call_args_list == [mock.call(repo_name='test_local')]
+    artifacts = mock_artifactory.return_value.purge.call_args[0][1]
+    assert artifacts == [{'repo': 'test_local', 'path': 'app', 'name': 'b.rpm'}]
+    with PurgeJournal(path, resume=True) as journal:
+        assert journal.completed('test_local') == 1
+
+
+@mock.patch('lavatory.commands.purge.Artifactory')
+def test_apply_purge_policies_shard(mock_artifactory, caplog):
+    """Sharded runs limit searches to the shard and skip repositories it has nothing in"""
+    mock_artifactory.return_value.purge.return_value = 2
+    shard = mock.Mock()
+    shard.scope.side_effect = [['app', '.'], []]
+    with caplog.at_level('INFO'):
+        apply_purge_policies(['yum-local', 'test_local'], shard=shard)
+
+    assert shard.scope.call_count == 2
+    assert mock_artifactory.return_value.purge.call_count == 1
+    assert '1 repositories processed, 1 skipped, 2 artifacts purged' in caplog.text
+
+
 @mock.patch('lavatory.commands.purge.Artifactory')
 def test_purge_report(mock_artifactory):
     """Unit test for purge report"""
@@ -33,11 +85,13 @@ def runner():
     return CliRunner()
 
 
+@mock.patch('lavatory.commands.purge.RunContext.artifactory', new_callable=mock.PropertyMock)
 @mock.patch('lavatory.commands.purge.get_storage')
 @mock.patch('lavatory.commands.purge.get_repos')
 @mock.patch('lavatory.commands.purge.apply_purge_policies')
 @mock.patch('lavatory.commands.purge.generate_purge_report')
-def test_policies(mock_purge_report, mock_purge_policies, mock_get_repos, mock_get_storage, runner):
+def test_policies(mock_purge_report, mock_purge_policies, mock_get_repos, mock_get_storage, mock_run_context,
+                  runner):
     data = {
         'test-local': {
             'repoKey': 'test-local',
@@ -58,3 +112,61 @@ def test_policies(mock_purge_report, mock_purge_policies, mock_get_repos, mock_g
 
     assert result_one.exit_code == 0
     assert result_one.output == ''
+
+
+@pytest.mark.parametrize('options', [['--workers', '4'], ['--parallel-repos', '2'], ['--adaptive-concurrency']])
+@mock.patch('lavatory.commands.purge.apply_purge_policies_async')
+def test_async_rejects_thread_options(mock_purge_policies_async, runner, options):
+    result = runner.invoke(purge, ['--async'] + options)
+    assert result.exit_code == 2
+    assert '--async cannot be combined with' in result.output
+    assert not mock_purge_policies_async.called
+
+
+@mock.patch('lavatory.commands.purge.RunContext.artifactory', new_callable=mock.PropertyMock)
+@mock.patch('lavatory.commands.purge.get_storage')
+@mock.patch('lavatory.commands.purge.get_repos')
+@mock.patch('lavatory.commands.purge.apply_purge_policies')
+@mock.patch('lavatory.commands.purge.generate_purge_report')
+def test_journal_is_opt_in(mock_purge_report, mock_purge_policies, mock_get_repos, mock_get_storage,
+                           mock_run_context, runner, tmp_path, monkeypatch):
+    mock_get_repos.return_value = {}
+    monkeypatch.chdir(tmp_path)
+    assert runner.invoke(purge, ['--nodryrun']).exit_code == 0
+    assert mock_purge_policies.call_args[1]['journal'] is None
+    assert not os.path.exists(DEFAULT_JOURNAL_PATH)
+
+    assert runner.invoke(purge, ['--nodryrun', '--resume']).exit_code == 0
+    assert mock_purge_policies.call_args[1]['journal'].path == DEFAULT_JOURNAL_PATH
+
+
+def test_shard_process_gets_its_own_transport(monkeypatch):
+    """Worker processes drop the parent's session and apply the throttle settings passed to them"""
+    parent_session = transport.get_session()
+    monkeypatch.setattr(transport, '_SESSION', parent_session)
+    monkeypatch.setattr(transport, '_REQUEST_SLOTS', None)
+    monkeypatch.setattr(transport, '_THROTTLE', transport.Throttle())
+
+    _init_shard_process(max_requests=4, throttle_options={'retries': 7, 'rate': 5.0, 'adaptive_limit': None})
+
+    assert transport._SESSION is None
+    assert transport.get_session() is not parent_session
+    assert transport._REQUEST_SLOTS is not None
+    assert transport._THROTTLE.retries == 7
+    assert transport._THROTTLE.bucket is not None
+
+
+@mock.patch('lavatory.commands.purge.RunContext.artifactory', new_callable=mock.PropertyMock)
+@mock.patch('lavatory.commands.purge.get_storage')
+@mock.patch('lavatory.commands.purge.get_repos')
+@mock.patch('lavatory.commands.purge.apply_purge_policies')
+def test_failed_runs_export_metrics(mock_purge_policies, mock_get_repos, mock_get_storage, mock_run_context, runner,
+                                    tmp_path):
+    mock_get_repos.return_value = {'test-local': {}}
+    mock_purge_policies.side_effect = KeyboardInterrupt
+    path = tmp_path / 'metrics.json'
+
+    result = runner.invoke(purge, ['--metrics-json', str(path)])
+
+    assert result.exit_code != 0
+    assert json.loads(path.read_text())['total']['counters']['runs_failed'] == 1
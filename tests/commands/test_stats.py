@@ -12,9 +12,10 @@ def runner():
     return CliRunner()
 
 
+@mock.patch('lavatory.commands.stats.RunContext.artifactory', new_callable=mock.PropertyMock)
 @mock.patch('lavatory.commands.stats.get_storage')
 @mock.patch('lavatory.commands.stats.get_repos')
-def test_command_stats(mock_get_repos, mock_get_storage, runner):
+def test_command_stats(mock_get_repos, mock_get_storage, mock_run_context, runner):
     data = {
         'test-local': {
             'repoKey': 'test-local',
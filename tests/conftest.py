@@ -1,6 +1,17 @@
+import http.server
+import socketserver
+import threading
+
 import pytest
 from unittest import mock
 
+try:
+    from http.server import ThreadingHTTPServer
+except ImportError:  # Python < 3.7
+    class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+        daemon_threads = True
+
+
 @pytest.fixture
 def mock_party():
     with mock.patch('lavatory.utils.artifactory.load_credentials') as m:
@@ -10,4 +21,62 @@ def mock_party():
 @pytest.fixture
 def mock_credentials(mock_party):
     with mock.patch('lavatory.utils.artifactory.load_credentials') as m:
-        yield m
\ No newline at end of file
+        yield m
+
+
+class StubArtifactoryHandler(http.server.BaseHTTPRequestHandler):
+    """Records DELETE requests and answers with 204, or 404 for missing paths.
+
+    Paths containing ``throttled`` are answered with 429 the first time.
+    POST requests, such as moves, are recorded the same way.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_DELETE(self):
+        if 'throttled' in self.path and self.path not in self.server.throttled:
+            self.server.throttled.append(self.path)
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.server.deleted.append(self.path)
+        status = 404 if 'missing' in self.path else 204
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        self.server.posted.append(self.path)
+        status = 404 if 'missing' in self.path else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def artifactory_server():
+    """Local stub HTTP server standing in for Artifactory."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubArtifactoryHandler)
+    server.deleted = []
+    server.throttled = []
+    server.posted = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stub_credentials(mock_credentials, artifactory_server):
+    host, port = artifactory_server.server_address
+    mock_credentials.return_value = {
+        'artifactory_password': 'test_password',
+        'artifactory_url': 'http://{}:{}/artifactory'.format(host, port),
+        'artifactory_username': 'test_username'
+    }
+    return mock_credentials
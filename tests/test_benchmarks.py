@@ -0,0 +1,66 @@
+"""Smoke tests for the benchmark suite and its mock Artifactory."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from mock_artifactory import MockArtifactory, generate_repository  # noqa: E402 pylint: disable=wrong-import-position
+import logging_overhead  # noqa: E402 pylint: disable=wrong-import-position
+import throughput  # noqa: E402 pylint: disable=wrong-import-position
+
+from lavatory.utils import transport  # noqa: E402 pylint: disable=wrong-import-position
+from lavatory.utils.artifactory import Artifactory  # noqa: E402 pylint: disable=wrong-import-position
+
+
+@pytest.fixture(autouse=True)
+def own_session(monkeypatch):
+    """Keeps the connection pools of the mock servers out of the shared session."""
+    monkeypatch.setattr(transport, '_SESSION', None)
+
+
+@pytest.fixture
+def mock_server():
+    with MockArtifactory(generate_repository('bench-local', projects=3, versions=4)) as server:
+        yield server
+
+
+def test_mock_server_answers_searches_and_deletes(mock_server):
+    client = Artifactory(repo_name='bench-local', credentials=mock_server.credentials())
+    assert client.repos()['bench-local']['filesCount'] == 24
+    newest = client.filter(depth=3, sort={"$desc": ["created"]}, limit=2)
+    assert [artifact['name'] for artifact in newest] == ['1.3', '1.3']
+
+    purgeable = client.count_based_retention(retention_count=3)
+    assert sorted(artifact['path'] for artifact in purgeable) == ['group/project-0', 'group/project-1',
+                                                                 'group/project-2']
+    assert client.purge(False, purgeable) == 3
+    assert client.count_based_retention(retention_count=3) == []
+    assert len(client.filter(item_type='file', depth=None)) == 18
+
+
+def test_mock_server_retries_errors():
+    with MockArtifactory(generate_repository('bench-local', projects=2, versions=2), error_rate=0.5, seed=1) as server:
+        client = Artifactory(repo_name='bench-local', credentials=server.credentials())
+        assert len(client.filter(item_type='file', depth=None)) == 8
+        assert server.requests['POST'] == 2
+
+
+def test_throughput_run():
+    results = throughput.run(artifacts=100, workers=(2, ), memory=False)
+    items = {result['scenario']: result['items'] for result in results}
+    assert items == {
+        'filter_files': 100,
+        'count_based_retention': 25,
+        'count_based_retention_single_query': 25,
+        'purge': 25,
+        'move_artifacts': 25,
+    }
+
+
+def test_logging_overhead_run():
+    results = logging_overhead.run(artifacts=50)
+    assert [result['mode'] for result in results] == ['console', 'jsonl', 'jsonl.gz']
+    assert all(result['artifacts'] == 50 for result in results)
+    assert results[1]['bytes'] > results[2]['bytes']
@@ -0,0 +1,64 @@
+"""Tests for the command line entry point."""
+import logging
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from lavatory.__main__ import root
+
+HEAVY_MODULES = ('aiohttp', 'coloredlogs', 'humanfriendly', 'numpy', 'party', 'pkg_resources', 'pluginbase',
+                 'requests')
+LAZY_MODULES = ('lavatory.commands.purge', 'lavatory.policies', 'lavatory.policy_plugins')
+
+
+@pytest.fixture(autouse=True)
+def restore_logging():
+    """Removes the console handlers the command installs, older click versions capture them in later tests."""
+    handlers, level = logging.root.handlers[:], logging.root.level
+    yield
+    logging.root.handlers[:] = handlers
+    logging.root.setLevel(level)
+
+
+def _imported_modules():
+    """Modules loaded by importing the entry point in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, '-c', 'import sys, lavatory.__main__; print(" ".join(sorted(sys.modules)))'],
+        check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    return set(result.stdout.split())
+
+
+def _installed_version():
+    try:
+        from importlib import metadata
+    except ImportError:  # Python < 3.8
+        import pkg_resources
+        return pkg_resources.get_distribution('lavatory').version
+    return metadata.version('lavatory')
+
+
+def test_version():
+    result = CliRunner().invoke(root, ['version'])
+    assert result.exit_code == 0
+    assert result.output.strip() == _installed_version()
+
+
+def test_artifact_log_is_closed_with_the_command(tmp_path):
+    from lavatory.utils.artifact_log import current_artifact_log
+
+    path = tmp_path / 'artifacts.jsonl.gz'
+    result = CliRunner().invoke(root, ['--artifact-log', str(path), 'version'])
+    assert result.exit_code == 0
+    assert path.exists()
+    assert current_artifact_log() is None
+
+
+def test_commands_are_listed_without_importing_them():
+    """Startup does not load HTTP clients, numpy, commands or policies, benchmarks/startup.py times it."""
+    modules = _imported_modules()
+    assert not set(HEAVY_MODULES) & modules
+    assert not set(LAZY_MODULES) & modules
+    output = CliRunner().invoke(root, ['--help']).output
+    assert all(command in output for command in ('policies', 'purge', 'stats', 'version'))
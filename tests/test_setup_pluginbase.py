@@ -1,9 +1,12 @@
 """Unit tests for testing setting up plugin base"""
 
+import re
+from unittest import mock
+
 import pytest
 
 from lavatory.exceptions import InvalidPoliciesDirectory
-from lavatory.utils.setup_pluginbase import get_policy, setup_pluginbase
+from lavatory.utils.setup_pluginbase import get_policy, read_patterns, setup_pluginbase
 
 
 def test_default_policy_load():
@@ -43,3 +46,57 @@ def test_get_custom_policy(tmpdir):
     repository = "test-repo"
     test_policy = get_policy(plugin_source, repository)
     assert test_policy.__name__.endswith(".test_repo")
+
+
+def test_get_policy_by_pattern(tmpdir):
+    """tests repositories mapped to a policy with globs and regular expressions."""
+    tmpdir.join('docker.py').write("import re\nREPO_PATTERNS = ['docker-*', re.compile(r'^registry-\\d+$')]\n")
+    tmpdir.join('docker_special.py').write(' ')
+    plugin_source = setup_pluginbase(extra_policies_path=str(tmpdir))
+
+    assert get_policy(plugin_source, 'docker-local').__name__.endswith('.docker')
+    assert get_policy(plugin_source, 'registry-2').__name__.endswith('.docker')
+    assert get_policy(plugin_source, 'docker-special').__name__.endswith('.docker_special')
+    assert get_policy(plugin_source, 'registry-two').__name__.endswith('.default')
+    assert get_policy(plugin_source, 'registry-two', default=False) is None
+
+
+def test_policies_are_loaded_once(tmpdir):
+    """tests policies are loaded once for every repository, and new policies are found by new sources."""
+    tmpdir.join('test_repo.py').write(' ')
+    plugin_source = setup_pluginbase(extra_policies_path=str(tmpdir))
+    tmpdir.join('new_repo.py').write(' ')
+    assert get_policy(setup_pluginbase(extra_policies_path=str(tmpdir)), 'new-repo').__name__.endswith('.new_repo')
+
+    with mock.patch.object(plugin_source, 'load_plugin', wraps=plugin_source.load_plugin) as load_plugin:
+        for number in range(50):
+            get_policy(plugin_source, 'repo-{}'.format(number))
+            get_policy(plugin_source, 'test-repo')
+    assert sorted(call[0][0] for call in load_plugin.call_args_list) == ['default', 'test_repo']
+
+
+def test_patterns_are_read_without_importing_policies(tmpdir, caplog):
+    """tests one broken policy only breaks its own repositories."""
+    tmpdir.join('broken.py').write("REPO_PATTERNS = ['broken-*']\nraise RuntimeError('boom')\n")
+    tmpdir.join('computed.py').write("REPO_PATTERNS = ['computed-{}'.format(n) for n in range(2)]\n")
+    tmpdir.join('computed_broken.py').write("REPO_PATTERNS = list(('never-*', ))\nraise RuntimeError('boom')\n")
+    plugin_source = setup_pluginbase(extra_policies_path=str(tmpdir))
+
+    with mock.patch.object(plugin_source, 'load_plugin', wraps=plugin_source.load_plugin) as load_plugin:
+        assert get_policy(plugin_source, 'other-local').__name__.endswith('.default')
+        assert get_policy(plugin_source, 'computed-1').__name__.endswith('.computed')
+    assert sorted(call[0][0] for call in load_plugin.call_args_list) == ['computed', 'computed_broken', 'default']
+    assert 'Ignoring REPO_PATTERNS of policy computed_broken' in caplog.text
+    with pytest.raises(RuntimeError):
+        get_policy(plugin_source, 'broken-local')
+
+
+def test_read_patterns():
+    source = b"import re\nREPO_PATTERNS = ['a-*', re.compile(r'^b-\\d+$', re.I | re.ASCII)]\n"
+    glob, regex = read_patterns(source)
+    assert glob == 'a-*'
+    assert regex.search('B-12') and regex.flags & re.IGNORECASE
+    assert read_patterns(b'def purgelist(artifactory):\n    return []\n') == []
+    for source in (b"REPO_PATTERNS = sorted(['a'])", b"REPO_PATTERNS = [1]", b"REPO_PATTERNS = [re.compile(x)]"):
+        with pytest.raises(ValueError):
+            read_patterns(source)
@@ -0,0 +1,109 @@
+"""Tests for composable AQL criteria."""
+from unittest import mock
+
+import pytest
+
+from lavatory.exceptions import LavatoryError
+from lavatory.utils import aql
+from lavatory.utils.artifactory import Artifactory
+from lavatory.utils.offline import ArtifactIndex, OfflineArtifactory
+from lavatory.utils.watermarks import WatermarkStore
+
+
+def _record(name, created, size=10, downloaded=None, deployed=None):
+    record = {'repo': 'yum-local', 'path': 'group/app/1.0', 'name': name, 'type': 'file', 'size': size,
+              'created': created}
+    if downloaded:
+        record['stats'] = [{'downloaded': downloaded, 'downloads': 1}]
+    if deployed:
+        record['properties'] = [{'key': 'deployed', 'value': deployed}]
+    return record
+
+
+RECORDS = [
+    _record('old-unused.rpm', '2017-01-01T00:00:00Z'),
+    _record('old-stale.rpm', '2017-01-01T00:00:00Z', downloaded='2017-02-01T00:00:00Z', deployed='dev'),
+    _record('old-used.rpm', '2017-01-01T00:00:00Z', downloaded='2099-01-01T00:00:00Z'),
+    _record('old-big.rpm', '2017-01-01T00:00:00Z', size=2 * 10**9, downloaded='2099-01-01T00:00:00Z'),
+    _record('new.rpm', '2099-01-01T00:00:00Z'),
+]
+
+
+@pytest.fixture
+def offline():
+    return OfflineArtifactory(ArtifactIndex(RECORDS), repo_name='yum-local')
+
+
+def test_predicates_compile_to_one_query():
+    stale = aql.older_than(90) & aql.not_downloaded_since(30)
+    predicate = stale & (aql.property_matches('deployed', 'dev') | aql.larger_than('1 GB'))
+
+    assert predicate.terms() == [
+        {'created': {'$before': '90d'}},
+        {'$or': [{'stat.downloaded': {'$before': '30d'}}, {'stat.downloads': {'$eq': None}}]},
+        {'$or': [{'@deployed': {'$match': 'dev'}}, {'size': {'$gt': 10**9}}]},
+    ]
+    assert aql.all_of(aql.name_matches('*.rpm')).terms() == [{'name': {'$match': '*.rpm'}}]
+    assert aql.any_of(aql.path_matches('a/*'), {'path': {'$match': 'b/*'}}) | aql.smaller_than(1) == aql.Predicate(
+        {'$or': [{'path': {'$match': 'a/*'}}, {'path': {'$match': 'b/*'}}, {'size': {'$lt': 1}}]})
+
+
+def test_unknown_time_field():
+    with pytest.raises(LavatoryError):
+        aql.older_than(10, field='deployed')
+
+
+def test_retention_needs_criteria(offline):
+    with pytest.raises(LavatoryError):
+        offline.time_based_retention()
+    with pytest.raises(LavatoryError):
+        offline.time_based_retention(extra_aql=[{'name': {'$match': '*.rpm'}}])
+
+
+def test_predicates_filter_offline(offline):
+    def names(predicate):
+        return sorted(artifact['name'] for artifact in offline.time_based_retention(where=predicate))
+
+    assert names(aql.older_than(90) & aql.not_downloaded_since(30)) == ['old-stale.rpm', 'old-unused.rpm']
+    assert names(aql.older_than(90) & aql.never_downloaded()) == ['old-unused.rpm']
+    assert names(aql.newer_than(90)) == ['new.rpm']
+    assert names(aql.larger_than('1 GB') | aql.property_equals('deployed', 'dev')) == ['old-big.rpm', 'old-stale.rpm']
+    assert names(aql.property_not_matches('deployed') & aql.path_matches('group/*')) == [
+        'new.rpm', 'old-big.rpm', 'old-unused.rpm', 'old-used.rpm']
+    assert [artifact['name'] for artifact in offline.time_based_retention(keep_days=90, where=aql.smaller_than(100))
+            ] == ['old-unused.rpm', 'old-stale.rpm', 'old-used.rpm']
+
+
+
+def test_where_is_never_incremental(tmp_path):
+    """Artifacts that start matching through their downloads are found by the next incremental run."""
+    path = str(tmp_path / 'watermarks.json')
+    stale = aql.not_downloaded_since(30)
+
+    def run(downloaded):
+        offline = OfflineArtifactory(
+            ArtifactIndex([_record('app.rpm', '2017-01-01T00:00:00Z', downloaded=downloaded)]), repo_name='yum-local')
+        offline.watermarks = WatermarkStore(path)
+        found = offline.watermarks.track('yum-local', offline.time_based_retention(keep_days=90, where=stale))
+        assert offline.watermarks.commit('yum-local', len(found))
+        offline.watermarks.save()
+        return [artifact['name'] for artifact in found]
+
+    assert run('2099-01-01T00:00:00Z') == []
+    assert run('2017-02-01T00:00:00Z') == ['app.rpm']
+
+@mock.patch('lavatory.utils.transport.SessionParty.find_by_aql')
+def test_time_based_retention_requests_only_search_fields(mock_find_aql, mock_credentials):
+    mock_credentials.return_value = {'artifactory_password': 'test_password', 'artifactory_url': 'test_url',
+                                     'artifactory_username': 'test_username'}
+    mock_find_aql.return_value = {'results': []}
+    artifactory = Artifactory(repo_name='yum-local')
+
+    artifactory.time_based_retention(where=aql.older_than(30) & aql.not_downloaded_since(7), fields=['size', 'name'])
+    criteria = mock_find_aql.call_args[1]['criteria']['$and']
+    assert criteria[:2] == [{'created': {'$before': '30d'}},
+                            {'$or': [{'stat.downloaded': {'$before': '7d'}}, {'stat.downloads': {'$eq': None}}]}]
+    assert mock_find_aql.call_args[1]['fields'] == ['repo', 'path', 'name', 'type', 'size']
+
+    artifactory.time_based_retention(keep_days=30)
+    assert mock_find_aql.call_args[1]['fields'] == []
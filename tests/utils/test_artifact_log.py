@@ -0,0 +1,72 @@
+"""Tests for the per-artifact log."""
+import gzip
+import json
+import logging
+import time
+
+import pytest
+
+from lavatory.utils import artifact_log, transport
+from lavatory.utils.artifactory import Artifactory
+
+TEST_ARTIFACTS = [{'name': 'test{}'.format(i), 'path': 'path/to/{}'.format(i)} for i in range(5)]
+
+
+@pytest.fixture
+def artifactory(stub_credentials, monkeypatch):
+    monkeypatch.setattr(transport, '_SESSION', None)
+    return Artifactory(repo_name='test-local')
+
+
+@pytest.mark.parametrize('name, opener', [('artifacts.jsonl', open), ('artifacts.jsonl.gz', gzip.open)])
+def test_records_are_written(tmp_path, name, opener):
+    path = str(tmp_path / name)
+    with artifact_log.ArtifactLog(path, progress_interval=0) as log:
+        log.record('purge', 'test-local', {'path': 'a/"quoted"', 'name': 'b'}, False)
+        log.record('move', 'test-local', {'path': 'a', 'name': 'c'}, True, ok=False, dest='archive')
+    with artifact_log.ArtifactLog(path, progress_interval=0) as log:
+        log.record('purge', 'test-local', {'path': 'a', 'name': 'd'}, False)
+
+    with opener(path, 'rt', encoding='utf-8') as records:
+        lines = [json.loads(line) for line in records]
+    assert [(line['action'], line['path'], line['name'], line['ok']) for line in lines] == [
+        ('purge', 'a/"quoted"', 'b', True),
+        ('move', 'a', 'c', False),
+        ('purge', 'a', 'd', True),
+    ]
+    assert lines[1]['dest'] == 'archive'
+    assert lines[1]['dry_run'] is True
+    assert 'dest' not in lines[0]
+
+
+def test_purge_writes_records_instead_of_lines(tmp_path, caplog, artifactory, artifactory_server):
+    caplog.set_level(logging.INFO)
+    path = str(tmp_path / 'artifacts.jsonl')
+    artifact_log.open_artifact_log(path, progress_interval=0)
+    try:
+        assert artifactory.purge(False, TEST_ARTIFACTS, workers=2) == 5
+        artifactory.move_artifacts(TEST_ARTIFACTS[:2] + [{'path': 'path', 'name': 'missing'}], 'archive-local')
+    finally:
+        artifact_log.close_artifact_log()
+
+    assert artifact_log.current_artifact_log() is None
+    assert not [record for record in caplog.records if 'LIVE purge' in record.getMessage()]
+    summaries = [record.getMessage() for record in caplog.records if 'written' in record.getMessage()]
+    assert 'test-local move 2 ok, 1 failed' in summaries[0]
+    assert 'test-local purge 5 ok, 0 failed' in summaries[1]
+    with open(path, encoding='utf-8') as records:
+        lines = [json.loads(line) for line in records]
+    assert len(lines) == 8
+    assert len(artifactory_server.deleted) == 5
+
+
+def test_progress_is_logged(tmp_path, caplog, monkeypatch):
+    monkeypatch.setattr(artifact_log, 'FLUSH_INTERVAL', 0.01)
+    caplog.set_level(logging.INFO)
+    log = artifact_log.ArtifactLog(str(tmp_path / 'artifacts.jsonl'), progress_interval=0.01)
+    log.record('purge', 'test-local', TEST_ARTIFACTS[0], True)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and 'Progress' not in caplog.text:
+        time.sleep(0.01)
+    log.close()
+    assert 'Progress: test-local purge 1 ok, 0 failed' in caplog.text
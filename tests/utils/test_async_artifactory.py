@@ -0,0 +1,86 @@
+"""Tests for the asyncio Artifactory client."""
+import asyncio
+import sys
+from unittest import mock
+
+import pytest
+
+pytest.importorskip('aiohttp')
+if sys.version_info < (3, 7):
+    pytest.skip('--async needs Python 3.7', allow_module_level=True)
+from lavatory.commands.purge import apply_purge_policies_async  # noqa: E402 pylint: disable=wrong-import-position
+from lavatory.utils.artifactory import Artifactory  # noqa: E402 pylint: disable=wrong-import-position
+from lavatory.utils.async_artifactory import AsyncArtifactory  # noqa: E402 pylint: disable=wrong-import-position
+from lavatory.utils.throttle import TokenBucket  # noqa: E402 pylint: disable=wrong-import-position
+
+ARTIFACTS = [
+    {'path': 'group/app', 'name': 'a.rpm'},
+    {'path': 'group/app', 'name': 'throttled.rpm'},
+    {'path': 'group/app', 'name': 'missing.rpm'},
+]
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_purge(stub_credentials, artifactory_server):
+    purged = []
+
+    async def _purge():
+        async with AsyncArtifactory(credentials=stub_credentials.return_value, max_requests=2) as client:
+            return await client.for_repo('test-local').purge(False, ARTIFACTS, on_purged=purged.append)
+
+    with mock.patch('lavatory.utils.async_artifactory.backoff_delay', return_value=0):
+        assert _run(_purge()) == 2
+    assert sorted(artifactory_server.deleted) == [
+        '/artifactory/test-local/group/app/a.rpm',
+        '/artifactory/test-local/group/app/missing.rpm',
+        '/artifactory/test-local/group/app/throttled.rpm',
+    ]
+    assert artifactory_server.throttled == ['/artifactory/test-local/group/app/throttled.rpm']
+    assert sorted(artifact['name'] for artifact in purged) == ['a.rpm', 'throttled.rpm']
+
+
+def test_rate_limit(stub_credentials, artifactory_server):
+    """Every request, retries included, waits for a token of the shared bucket"""
+
+    async def _purge():
+        async with AsyncArtifactory(credentials=stub_credentials.return_value, rate=5) as client:
+            return await client.for_repo('test-local').purge(False, ARTIFACTS)
+
+    waits = [0.01] + [0] * 10
+    with mock.patch.object(TokenBucket, 'take', side_effect=waits) as take, \
+            mock.patch('lavatory.utils.async_artifactory.backoff_delay', return_value=0):
+        assert _run(_purge()) == 2
+    # one wait, then a token for each of the three deletes and the retry of the throttled one
+    assert take.call_count == 5
+
+
+def test_purge_dryrun_and_move(stub_credentials, artifactory_server):
+
+    async def _purge_and_move():
+        async with AsyncArtifactory(credentials=stub_credentials.return_value) as client:
+            repo = client.for_repo('test-local')
+            return await repo.purge(True, ARTIFACTS), await repo.move_artifacts(ARTIFACTS[::2], 'archive-local')
+
+    purged, moved = _run(_purge_and_move())
+    assert purged == 3
+    assert artifactory_server.deleted == []
+    assert moved == {'moved': ['group/app/a.rpm'], 'failed': ['group/app/missing.rpm']}
+
+
+@mock.patch('lavatory.commands.purge.get_policy')
+def test_apply_purge_policies_async(mock_get_policy, stub_credentials, artifactory_server, caplog):
+    mock_get_policy.return_value.purgelist.side_effect = lambda artifactory: [
+        {'path': 'app', 'name': '{}.rpm'.format(artifactory.repo_name)}]
+
+    with caplog.at_level('INFO'):
+        apply_purge_policies_async(['yum-local', 'test-local'], dryrun=False, max_requests=4,
+                                   artifactory=Artifactory())
+
+    assert sorted(artifactory_server.deleted) == [
+        '/artifactory/test-local/app/test-local.rpm',
+        '/artifactory/yum-local/app/yum-local.rpm',
+    ]
+    assert '2 repositories processed, 0 skipped, 2 artifacts purged' in caplog.text
@@ -0,0 +1,54 @@
+"""Tests for vectorized retention rules."""
+import pytest
+
+from lavatory.utils.offline import parse_time
+
+numpy = pytest.importorskip('numpy')
+from lavatory.utils.columnar import ArtifactTable  # noqa: E402 pylint: disable=wrong-import-position
+
+NOW = parse_time('2020-01-31T00:00:00Z')
+ARTIFACTS = [
+    {'path': 'group/app/1.0', 'name': 'app.rpm', 'created': '2020-01-01T00:00:00Z', 'size': 10,
+     'stats': [{'downloaded': '2020-01-30T00:00:00.000Z'}]},
+    {'path': 'group/app/1.1', 'name': 'app.rpm', 'created': '2020-01-10T00:00:00Z', 'size': 20},
+    {'path': 'group/app/1.1', 'name': 'app-debug.rpm', 'created': '2020-01-11T00:00:00Z', 'size': 30},
+    {'path': 'group/lib/2.0', 'name': 'lib.rpm', 'created': '2020-01-29T00:00:00+00:00', 'size': 40,
+     'stats': [{'downloaded': '2019-12-01T00:00:00Z'}]},
+    {'path': '.', 'name': 'top.rpm', 'size': 50},
+]
+
+
+@pytest.fixture
+def table():
+    return ArtifactTable(ARTIFACTS)
+
+
+def _names(artifacts):
+    return ['{}/{}'.format(artifact['path'], artifact['name']) for artifact in artifacts]
+
+
+def test_age_and_download_cutoffs(table):
+    assert _names(table.select(table.older_than(15, now=NOW))) == [
+        'group/app/1.0/app.rpm', 'group/app/1.1/app.rpm', 'group/app/1.1/app-debug.rpm']
+    assert _names(table.select(table.not_downloaded_since(7, now=NOW))) == [
+        'group/app/1.1/app.rpm', 'group/app/1.1/app-debug.rpm', 'group/lib/2.0/lib.rpm', './top.rpm']
+    assert _names(table.select(table.not_downloaded_since(7, include_never=False, now=NOW))) == [
+        'group/lib/2.0/lib.rpm']
+
+
+def test_newest_per_group(table):
+    assert _names(table.select(~table.newest_per_group(1))) == ['group/app/1.1/app.rpm']
+    assert _names(table.select(~table.newest_per_group(1, group_depth=2))) == [
+        'group/app/1.0/app.rpm', 'group/app/1.1/app.rpm']
+
+
+def test_composed_rules(table):
+    mask = table.older_than(5, now=NOW) & ~table.newest_per_group(1, group_depth=2) & table.path_matches('group/*')
+    assert _names(table.select(mask)) == ['group/app/1.0/app.rpm', 'group/app/1.1/app.rpm']
+    assert list(table.depth) == [4, 4, 4, 4, 1]
+    assert _names(table.select(table.larger_than(35))) == ['group/lib/2.0/lib.rpm', './top.rpm']
+
+
+def test_empty_table():
+    table = ArtifactTable([])
+    assert table.select(table.older_than(1) & table.newest_per_group(1)) == []
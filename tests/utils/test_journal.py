@@ -0,0 +1,50 @@
+"""Tests for the purge checkpoint journal."""
+from lavatory.utils.journal import PurgeJournal
+
+ARTIFACTS = [
+    {'repo': 'yum-local', 'path': 'app/1.0', 'name': 'app.rpm'},
+    {'repo': 'yum-local', 'path': 'app/1.1', 'name': 'app.rpm'},
+    {'repo': 'yum-local', 'path': '.', 'name': 'top.rpm'},
+]
+
+
+def test_resume_skips_purged_artifacts(tmp_path):
+    path = str(tmp_path / 'purge.journal')
+    with PurgeJournal(path) as journal:
+        assert journal.record_plan('yum-local', list(ARTIFACTS)) == ARTIFACTS
+        journal.record_purged('yum-local', {'path': 'app', 'name': '1.0'})
+        journal.record_purged('yum-local', ARTIFACTS[2])
+
+    with PurgeJournal(path, resume=True) as journal:
+        assert journal.completed('yum-local') is None
+        assert journal.planned('yum-local') == [ARTIFACTS[1]]
+        journal.record_purged('yum-local', ARTIFACTS[1])
+        journal.record_done('yum-local', 1)
+
+    with PurgeJournal(path, resume=True) as journal:
+        assert journal.completed('yum-local') == 1
+
+
+def test_incomplete_plan_is_rediscovered(tmp_path):
+    path = str(tmp_path / 'purge.journal')
+    with PurgeJournal(path) as journal:
+        recording = journal.record_plan('yum-local', iter(ARTIFACTS))
+        next(recording)
+        journal.record_purged('yum-local', ARTIFACTS[0])
+    with open(path, 'a') as journal_file:
+        journal_file.write('["purged","yum-lo')
+
+    with PurgeJournal(path, resume=True) as journal:
+        assert journal.planned('yum-local') is None
+        assert list(journal.outstanding('yum-local', iter(ARTIFACTS))) == ARTIFACTS[1:]
+
+
+def test_new_run_truncates_journal(tmp_path):
+    path = str(tmp_path / 'purge.journal')
+    with PurgeJournal(path) as journal:
+        journal.record_done('yum-local', 3)
+
+    with PurgeJournal(path) as journal:
+        assert journal.completed('yum-local') is None
+    with PurgeJournal(path, resume=True) as journal:
+        assert journal.completed('yum-local') is None
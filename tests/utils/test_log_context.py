@@ -0,0 +1,16 @@
+"""Tests for per repository logging context."""
+import logging
+
+from lavatory.utils.log_context import RepoContextFilter, repo_context
+
+
+def test_repo_context_filter():
+    record = logging.LogRecord('lavatory', logging.INFO, __file__, 1, 'message', (), None)
+    log_filter = RepoContextFilter()
+
+    with repo_context('yum-local'):
+        assert log_filter.filter(record)
+        assert record.repo == ' [yum-local]'
+
+    log_filter.filter(record)
+    assert record.repo == ''
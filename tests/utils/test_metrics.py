@@ -0,0 +1,93 @@
+"""Tests for run metrics."""
+import json
+import pickle
+import socket
+
+import pytest
+
+from lavatory.utils import metrics, transport
+from lavatory.utils.artifactory import Artifactory
+from lavatory.utils.log_context import repo_context
+
+
+@pytest.fixture
+def run_metrics():
+    yield metrics.enable_metrics()
+    metrics.disable_metrics()
+
+
+def test_disabled_metrics_are_no_ops():
+    assert metrics.current_metrics() is None
+    assert metrics.timer('aql') is metrics.timer('purge')
+    metrics.count('requests_get')
+    metrics.observe('request_seconds', 0.1)
+
+
+def test_values_are_kept_per_repository(run_metrics):
+    with repo_context('yum-local'):
+        metrics.count('artifacts_purged', 6)
+        with metrics.timer('purge'):
+            pass
+        metrics.observe('request_seconds', 0.02)
+    metrics.count('artifacts_purged', 4, repo='docker-local')
+    metrics.observe('request_seconds', 20)
+    metrics.count('requests_get')
+
+    summary = run_metrics.summary()
+    assert summary['total']['counters'] == {'artifacts_purged': 10, 'requests_get': 1}
+    assert sorted(summary['repositories']) == ['docker-local', 'yum-local']
+    yum_local = summary['repositories']['yum-local']
+    assert yum_local['phases']['purge']['count'] == 1
+    assert yum_local['artifacts_per_second'] > 0
+    histogram = summary['total']['histograms']['request_seconds']
+    assert histogram['count'] == 2
+    assert histogram['buckets']['0.01'] == 0
+    assert histogram['buckets']['0.025'] == 1
+    assert histogram['buckets']['+Inf'] == 2
+
+
+def test_merge_pickled_metrics(run_metrics):
+    other = metrics.Metrics()
+    other.count('artifacts_purged', 2, repo='yum-local')
+    other.add_time('purge', 1.5, repo='yum-local')
+    run_metrics.count('artifacts_purged', 1, repo='yum-local')
+
+    run_metrics.merge(pickle.loads(pickle.dumps(other)))
+    merged = run_metrics.summary()['repositories']['yum-local']
+    assert merged['counters']['artifacts_purged'] == 3
+    assert merged['phases']['purge']['seconds'] == 1.5
+
+
+def test_exports(run_metrics, tmp_path):
+    run_metrics.count('artifacts_purged', 3, repo='yum-local')
+    run_metrics.add_time('aql', 0.5, repo='yum-local')
+    run_metrics.observe('request_seconds', 0.2)
+
+    run_metrics.write_json(str(tmp_path / 'metrics.json'))
+    assert json.loads((tmp_path / 'metrics.json').read_text())['total']['counters'] == {'artifacts_purged': 3}
+
+    run_metrics.write_prometheus(str(tmp_path / 'metrics.prom'))
+    lines = (tmp_path / 'metrics.prom').read_text().splitlines()
+    assert 'lavatory_artifacts_purged_total{repo="yum-local"} 3' in lines
+    assert 'lavatory_phase_seconds_total{phase="aql",repo="yum-local"} 0.5' in lines
+    assert 'lavatory_request_seconds_bucket{le="0.25"} 1' in lines
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server:
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        run_metrics.send_statsd('127.0.0.1:{}'.format(server.getsockname()[1]))
+        packets = {server.recv(1024).decode() for _ in range(2)}
+    assert packets == {'lavatory.phase.aql:500.000|ms', 'lavatory.artifacts_purged:3|c'}
+
+
+def test_requests_and_purges_are_recorded(run_metrics, stub_credentials, monkeypatch):
+    monkeypatch.setattr(transport, '_SESSION', None)
+    artifacts = [{'name': str(number), 'path': 'throttled'} for number in range(3)]
+    with repo_context('yum-local'):
+        Artifactory(repo_name='yum-local').purge(False, artifacts)
+
+    counters = run_metrics.summary()['repositories']['yum-local']['counters']
+    assert counters['artifacts_purged'] == 3
+    assert counters['requests_delete'] == 6
+    assert counters['retries'] == 3
+    assert counters['responses_4xx'] == 3
@@ -0,0 +1,72 @@
+"""Tests for offline policy evaluation."""
+import json
+
+import pytest
+
+from lavatory.utils.offline import OfflineArtifactory, OfflineQueryError
+
+RECORDS = [
+    {'repo': 'yum-local', 'path': 'group', 'name': 'app', 'type': 'folder', 'created': '2017-01-01T00:00:00.000Z'},
+    {'repo': 'yum-local', 'path': 'group/app', 'name': '1.0', 'type': 'folder', 'created': '2017-01-02T00:00:00Z'},
+    {'repo': 'yum-local', 'path': 'group/app', 'name': '1.1', 'type': 'folder', 'created': '2017-01-03T00:00:00Z'},
+    {'repo': 'yum-local', 'path': 'group/app', 'name': '1.2', 'type': 'folder', 'created': '2030-01-01T00:00:00Z'},
+    {'repo': 'yum-local', 'path': 'group/app/1.0', 'name': 'app.rpm', 'type': 'file', 'size': 10,
+     'created': '2017-01-02T00:00:00Z', 'properties': [{'key': 'deployed', 'value': 'dev'}]},
+    {'repo': 'yum-local', 'path': 'group/app/1.1', 'name': 'app.rpm', 'type': 'file', 'size': 20,
+     'created': '2017-01-03T00:00:00+00:00', 'properties': [{'key': 'deployed', 'value': 'prod'}]},
+    {'repo': 'yum-local', 'path': 'group/app/repodata', 'name': 'repomd.xml', 'type': 'file',
+     'created': '2017-01-03T00:00:00Z'},
+    {'repo': 'other-local', 'path': '.', 'name': 'top.rpm', 'type': 'file', 'created': '2017-01-01T00:00:00Z'},
+]
+
+
+@pytest.fixture
+def offline(tmp_path):
+    export = tmp_path / 'export.jsonl'
+    export.write_text('\n'.join(json.dumps(record) for record in RECORDS))
+    return OfflineArtifactory.from_export(str(export), repo_name='yum-local')
+
+
+def _names(artifacts):
+    return sorted('{}/{}'.format(artifact['path'], artifact['name']) for artifact in artifacts)
+
+
+def test_time_based_retention(offline):
+    assert _names(offline.time_based_retention(keep_days=30)) == ['group/app/1.0/app.rpm', 'group/app/1.1/app.rpm']
+    prod_only = offline.time_based_retention(keep_days=30, extra_aql=[{"@deployed": {"$nmatch": "dev"}}])
+    assert _names(prod_only) == ['group/app/1.1/app.rpm']
+    assert _names(offline.for_repo('other-local').time_based_retention(keep_days=30)) == ['./top.rpm']
+
+
+@pytest.mark.parametrize('single_query', [False, True])
+def test_count_based_retention(offline, single_query):
+    purgeable = offline.count_based_retention(retention_count=2, single_query=single_query)
+    assert _names(purgeable) == ['group/app/1.0']
+
+
+def test_filter_sort_and_paging(offline):
+    newest = offline.filter(depth=3, sort={"$desc": ["created"]}, limit=2)
+    assert [artifact['name'] for artifact in newest] == ['1.2', '1.1']
+    assert [artifact['name'] for artifact in offline.iter_filter(page_size=1)] == ['1.0', '1.1', '1.2']
+
+
+def test_properties_and_purge(offline):
+    artifact = {'path': 'group/app/1.0', 'name': 'app.rpm'}
+    assert offline.get_artifact_properties(artifact) == {'deployed': ['dev']}
+    assert offline.get_artifacts_properties([artifact]) == {'group/app/1.0/app.rpm': {'deployed': ['dev']}}
+    assert offline.purge(False, [artifact]) == 1
+    assert offline.repos()['yum-local']['filesCount'] == 3
+
+
+def test_unsupported_operator(offline):
+    with pytest.raises(OfflineQueryError):
+        offline.filter(terms=[{"name": {"$regex": "app"}}])
+
+
+def test_inherited_helpers_work_offline(offline):
+    assert offline.api_url == 'offline/api'
+    assert sorted(offline.repos()) == ['other-local', 'yum-local']
+    batched = offline.collapse_folders([{'path': 'group/app/1.0', 'name': 'app.rpm'}])
+    assert [(artifact['path'], artifact['name']) for artifact in batched] == [('group/app', '1.0')]
+    with pytest.raises(OfflineQueryError):
+        offline.artifactory.get('storageinfo')
@@ -0,0 +1,42 @@
+"""Tests for compact artifact records."""
+import sys
+
+import pytest
+
+from lavatory.utils.records import ArtifactRecord, compact
+
+ARTIFACT = {'repo': 'yum-local', 'path': 'group/app', 'name': 'app.rpm', 'type': 'file', 'size': 10,
+            'created': '2017-01-01T00:00:00.000Z'}
+
+
+def test_record_reads_like_dict():
+    record = ArtifactRecord.from_dict(ARTIFACT)
+
+    assert record['path'] == 'group/app'
+    assert record.get('purge_count', 1) == 1
+    assert 'size' not in record
+    with pytest.raises(KeyError):
+        record['size']
+    record['purge_count'] = 3
+    assert record == {'repo': 'yum-local', 'path': 'group/app', 'name': 'app.rpm', 'type': 'file', 'purge_count': 3}
+    assert not hasattr(record, '__dict__')
+
+
+def test_compact_interns_paths():
+    records = compact([dict(ARTIFACT), dict(ARTIFACT, path=''.join(['group/', 'app']))])
+
+    assert records[0]['path'] is records[1]['path']
+    assert sys.getsizeof(records[0]) < sys.getsizeof(ARTIFACT)
+
+
+def test_purge_sorts_lists_in_place(mock_credentials):
+    from lavatory.utils.artifactory import Artifactory
+    mock_credentials.return_value = {
+        'artifactory_password': 'test_password',
+        'artifactory_url': 'test_url',
+        'artifactory_username': 'test_username'
+    }
+    artifacts = compact([dict(ARTIFACT, path='b'), dict(ARTIFACT, path='a')])
+
+    assert Artifactory(repo_name='yum-local').purge(True, artifacts) == 2
+    assert [record['path'] for record in artifacts] == ['a', 'b']
@@ -0,0 +1,62 @@
+"""Tests for sharded purges."""
+import json
+
+import pytest
+
+from lavatory.utils.offline import OfflineArtifactory
+from lavatory.utils.sharding import Shard
+
+RECORDS = [
+    {'repo': 'yum-local', 'path': '.', 'name': 'top.rpm', 'type': 'file'},
+    {'repo': 'yum-local', 'path': '.', 'name': 'alpha', 'type': 'folder'},
+    {'repo': 'yum-local', 'path': 'alpha', 'name': '1.0', 'type': 'folder'},
+    {'repo': 'yum-local', 'path': 'alpha/1.0', 'name': 'alpha.rpm', 'type': 'file'},
+    {'repo': 'yum-local', 'path': '.', 'name': 'beta', 'type': 'folder'},
+    {'repo': 'yum-local', 'path': 'beta', 'name': '1.0', 'type': 'folder'},
+    {'repo': 'yum-local', 'path': 'beta/1.0', 'name': 'beta.rpm', 'type': 'file'},
+    {'repo': 'yum-local', 'path': '.', 'name': 'alphabet', 'type': 'folder'},
+    {'repo': 'yum-local', 'path': 'alphabet', 'name': 'alphabet.rpm', 'type': 'file'},
+]
+
+
+@pytest.fixture
+def offline(tmp_path):
+    export = tmp_path / 'export.jsonl'
+    export.write_text('\n'.join(json.dumps(record) for record in RECORDS))
+    return OfflineArtifactory.from_export(str(export), repo_name='yum-local')
+
+
+def test_parse():
+    assert str(Shard.parse('2/4')) == '2/4'
+    for text in ('0/4', '5/4', '2', 'a/b'):
+        with pytest.raises(ValueError):
+            Shard.parse(text)
+
+
+def test_every_unit_has_one_owner():
+    units = ['repo-{}/folder-{}'.format(repo, folder) for repo in range(5) for folder in range(200)]
+    owners = [[shard for shard in range(1, 5) if Shard(shard, 4).owns(unit)] for unit in units]
+    assert all(len(owner) == 1 for owner in owners)
+    assert {owner[0] for owner in owners} == {1, 2, 3, 4}
+    assert owners == [[shard for shard in range(1, 5) if Shard(shard, 4).owns(unit)] for unit in units]
+
+    split = [Shard(2 + 4 * process, 12) for process in range(3)]
+    assert [unit for unit in units if any(shard.owns(unit) for shard in split)] == [
+        unit for unit in units if Shard(2, 4).owns(unit)
+    ]
+
+
+def test_scope_limits_searches(offline):
+    everything = {'{}/{}'.format(item['path'], item['name']) for item in offline.filter(depth=None, item_type='any')}
+    assert len(everything) == len(RECORDS)
+    seen = set()
+    for index in (1, 2, 3):
+        offline.path_scope = None
+        offline.path_scope = Shard(index, 3).scope(offline)
+        found = {'{}/{}'.format(item['path'], item['name']) for item in offline.filter(depth=None, item_type='any')}
+        assert not found & seen
+        seen |= found
+    assert seen == everything
+
+    offline.path_scope = ['alpha']
+    assert sorted(item['name'] for item in offline.filter(depth=None, item_type='any')) == ['1.0', 'alpha', 'alpha.rpm']
@@ -0,0 +1,28 @@
+"""Tests for the local snapshot cache."""
+from unittest import mock
+
+from lavatory.utils.snapshot_cache import SnapshotCache
+
+QUERY = {'aql': {'$and': [{'repo': {'$eq': 'yum-local'}}]}, 'offset': 0}
+
+
+def test_cached_results_until_ttl(tmp_path):
+    cache = SnapshotCache(str(tmp_path / 'cache.sqlite'), ttl=60)
+    assert cache.get('yum-local', QUERY) is None
+    cache.put('yum-local', QUERY, [{'path': 'app', 'name': 'a.rpm'}])
+
+    reopened = SnapshotCache(str(tmp_path / 'cache.sqlite'), ttl=60)
+    assert reopened.get('yum-local', dict(reversed(list(QUERY.items())))) == [{'path': 'app', 'name': 'a.rpm'}]
+    assert reopened.get('other-local', QUERY) is None
+    with mock.patch('lavatory.utils.snapshot_cache.time.time', return_value=10**10):
+        assert reopened.get('yum-local', QUERY) is None
+
+
+def test_invalidate_repository(tmp_path):
+    cache = SnapshotCache(str(tmp_path / 'cache.sqlite'))
+    cache.put('yum-local', QUERY, [])
+    cache.put('other-local', QUERY, [])
+    cache.invalidate('yum-local')
+
+    assert cache.get('yum-local', QUERY) is None
+    assert cache.get('other-local', QUERY) == []
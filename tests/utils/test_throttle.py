@@ -0,0 +1,107 @@
+"""Tests for rate limiting, retries and adaptive concurrency."""
+from unittest import mock
+
+import pytest
+from requests.exceptions import ConnectionError, ConnectTimeout  # pylint: disable=redefined-builtin
+
+from lavatory.utils import throttle
+
+
+@pytest.fixture(autouse=True)
+def no_sleep():
+    with mock.patch('lavatory.utils.throttle.time.sleep') as sleep:
+        yield sleep
+
+
+def _response(status_code, headers=None):
+    return mock.Mock(status_code=status_code, headers=headers or {})
+
+
+def test_retries_throttled_requests(no_sleep):
+    responses = [_response(429, {'Retry-After': '3'}), _response(503), _response(200)]
+    response = throttle.Throttle(retries=3).request(lambda: responses.pop(0))
+
+    assert response.status_code == 200
+    assert no_sleep.call_count == 2
+    assert no_sleep.call_args_list[0][0][0] == 3
+
+
+def test_gives_up_after_retries():
+    responses = [_response(503), _response(503)]
+    response = throttle.Throttle(retries=1).request(lambda: responses.pop(0))
+
+    assert response.status_code == 503
+    assert not responses
+
+
+def test_retries_connection_errors():
+    send_once = mock.Mock(side_effect=[ConnectionError('reset'), _response(204)])
+    assert throttle.Throttle(retries=1).request(send_once).status_code == 204
+
+    send_once = mock.Mock(side_effect=ConnectionError('reset'))
+    with pytest.raises(ConnectionError):
+        throttle.Throttle(retries=2).request(send_once)
+    assert send_once.call_count == 3
+
+
+def test_non_idempotent_requests_are_only_retried_when_turned_away():
+    for status, headers in ((502, None), (504, None), (503, None)):
+        responses = [_response(status, headers), _response(204)]
+        assert throttle.Throttle(retries=3).request(lambda: responses.pop(0), idempotent=False).status_code == status
+
+    responses = [_response(429), _response(503, {'Retry-After': '1'}), _response(204)]
+    assert throttle.Throttle(retries=3).request(lambda: responses.pop(0), idempotent=False).status_code == 204
+
+    send_once = mock.Mock(side_effect=ConnectionError('reset'))
+    with pytest.raises(ConnectionError):
+        throttle.Throttle(retries=2).request(send_once, idempotent=False)
+    assert send_once.call_count == 1
+
+    send_once = mock.Mock(side_effect=[ConnectTimeout('connect'), _response(204)])
+    assert throttle.Throttle(retries=1).request(send_once, idempotent=False).status_code == 204
+
+
+def test_is_idempotent():
+    assert throttle.is_idempotent('get', 'http://test/api/storageinfo')
+    assert throttle.is_idempotent('POST', 'http://test/api/search/aql')
+    assert not throttle.is_idempotent('DELETE', 'http://test/yum-local/a/b.rpm')
+    assert not throttle.is_idempotent('POST', 'http://test/api/move/yum-local/a?to=/archive/a')
+
+
+def test_backoff_delay_is_capped_with_jitter():
+    delays = [throttle.backoff_delay(attempt, base=1, cap=4) for attempt in range(10) for _ in range(20)]
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert throttle.backoff_delay(5, retry_after='not-a-number', cap=0) == 0
+
+
+def test_adaptive_limiter_aimd():
+    limiter = throttle.AdaptiveLimiter(maximum=8, initial=4, target_latency=1)
+    for _ in range(20):
+        with limiter.slot() as outcome:
+            outcome['congested'] = False
+    assert limiter.limit > 6
+
+    before = limiter.limit
+    with limiter.slot():
+        pass
+    assert limiter.limit == before / 2
+
+    with limiter.slot():
+        pass
+    assert limiter.limit == before / 2
+    assert limiter.in_flight == 0
+
+
+def test_token_bucket_limits_rate():
+    clock = [0.0]
+
+    def _sleep(wait):
+        clock[0] += wait
+
+    with mock.patch('lavatory.utils.throttle.time.monotonic', side_effect=lambda: clock[0]), \
+            mock.patch('lavatory.utils.throttle.time.sleep', side_effect=_sleep):
+        bucket = throttle.TokenBucket(rate=10)
+        for _ in range(30):
+            bucket.acquire()
+
+    assert clock[0] == pytest.approx(2.0)
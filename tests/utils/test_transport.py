@@ -0,0 +1,82 @@
+"""Tests for the shared HTTP transport."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from lavatory.utils import throttle, transport
+from lavatory.utils.artifactory import Artifactory
+
+
+def test_session_is_shared():
+    assert transport.get_session() is transport.get_session()
+
+
+def test_clients_reuse_connections(stub_credentials, artifactory_server):
+    artifacts = [{'name': str(i), 'path': 'path'} for i in range(10)]
+    before = transport.connection_stats()
+
+    Artifactory(repo_name='one-local').purge(False, artifacts[:5])
+    Artifactory(repo_name='two-local').purge(False, artifacts[5:])
+
+    after = transport.connection_stats()
+    assert len(artifactory_server.deleted) == 10
+    assert after['opened'] - before['opened'] == 1
+    assert after['reused'] - before['reused'] == 9
+
+
+def test_request_limit_caps_requests_in_flight(monkeypatch):
+    lock = threading.Lock()
+    in_flight = []
+    peak = []
+
+    def _request(*_, **__):
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.pop()
+        return mock.Mock(status_code=200)
+
+    monkeypatch.setattr(transport.get_session(), 'request', _request)
+    transport.set_request_limit(2)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: transport.send('GET', 'http://test'), range(16)))
+    finally:
+        transport.set_request_limit(None)
+
+    assert len(peak) == 16
+    assert max(peak) == 2
+
+
+def test_clients_do_not_share_headers(stub_credentials):
+    one, two = Artifactory(repo_name='one-local'), Artifactory(repo_name='two-local')
+    one.artifactory.headers['Content-type'] = 'text/plain'
+    assert two.artifactory.headers['Content-type'] == 'application/json'
+
+
+def test_deletes_and_moves_are_not_retried_after_gateway_errors(monkeypatch, stub_credentials):
+    """A delete or move that timed out at the gateway may have been carried out, so it is not sent again"""
+    sent = []
+
+    def _request(method, url, **_):
+        sent.append(method)
+        return mock.Mock(status_code=502 if len(sent) == 1 else 200, ok=len(sent) > 1, headers={}, text='')
+
+    monkeypatch.setattr(transport, '_THROTTLE', throttle.Throttle(retries=3))
+    monkeypatch.setattr(throttle.time, 'sleep', lambda _: None)
+    monkeypatch.setattr(transport.get_session(), 'request', _request)
+    artifactory = Artifactory(repo_name='one-local')
+
+    assert not artifactory._delete({'path': 'a', 'name': 'b.rpm'})
+    assert sent == ['DELETE']
+
+    sent.clear()
+    assert not artifactory._move('a/b.rpm', 'archive-local')
+    assert sent == ['POST']
+
+    sent.clear()
+    assert artifactory.artifactory.find_by_aql(criteria={'repo': 'one-local'}) is not None
+    assert sent == ['POST', 'POST']